@@ -1,10 +1,15 @@
 """Dashboard API routes for Nanobot"""
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pathlib import Path
-import json
-import os
 from app.utils import get_logger
+from app.cloud.session_catalog import SessionCatalog
+from app.cloud.session_search import SessionSearchIndex
+from app.cloud.session_writer import session_writer_stats
+from app.cloud.sessions import EXPORT_FORMATS
+from app.cloud.telegram_bot import coalescing_stats, stream_stats as telegram_stream_stats
+from app.core.skills import SkillRegistry
 
 logger = get_logger(__name__)
 
@@ -12,39 +17,71 @@ logger = get_logger(__name__)
 def create_dashboard_routes() -> APIRouter:
     """Create dashboard API routes"""
     router = APIRouter()
+    fallback_skills = SkillRegistry()
+
+    def _skill_registry() -> SkillRegistry:
+        # Share the agent's registry; without lifespan (tests) use our own
+        from app.main import _agent_loop
+
+        return _agent_loop.skills if _agent_loop else fallback_skills
     
     @router.get("/sessions")
-    async def get_sessions():
-        """Get all sessions"""
-        # Use plural and specific directory
-        sessions_dir = Path("./data/sessions")
-        if not sessions_dir.exists():
+    async def get_sessions(limit: int = 50):
+        """Get most recent sessions from the session catalog"""
+        from app.main import _session_manager
+
+        if _session_manager is not None:
+            return await _session_manager.list_sessions(limit=limit)
+
+        # App started without lifespan (e.g. tests): read the catalog directly
+        data_dir = Path("./data")
+        if not (data_dir / "sessions").exists():
+            return []
+
+        catalog = SessionCatalog(data_dir / "catalog.db", data_dir / "sessions")
+        try:
+            return catalog.recent(limit)
+        finally:
+            catalog.close()
+    
+    @router.get("/sessions/{session_id}/export")
+    async def export_session(session_id: str, format: str = "json"):
+        """Stream a session export as a JSON array or CSV"""
+        from app.main import _session_manager
+
+        if _session_manager is None:
+            raise HTTPException(status_code=503, detail="Session manager not initialized")
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+
+        chunks = await _session_manager.stream_export(session_id, format)
+        if chunks is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        media_type = "application/json" if format == "json" else "text/csv"
+        return StreamingResponse(
+            chunks,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{session_id}.{format}"'},
+        )
+    
+    @router.get("/search")
+    async def search(q: str, limit: int = 20):
+        """Full-text search over conversation history"""
+        from app.main import _session_manager
+
+        if _session_manager is not None:
+            return await _session_manager.search(q, limit=limit)
+
+        data_dir = Path("./data")
+        if not (data_dir / "sessions").exists():
             return []
-        
-        sessions = []
-        # Check for both .json and .jsonl
-        for session_file in list(sessions_dir.glob("*.json")) + list(sessions_dir.glob("*.jsonl")):
-            try:
-                # If it's a small JSON file, read it directly
-                content = session_file.read_text(encoding="utf-8")
-                if session_file.suffix == ".jsonl":
-                    # Read the last line of JSONL for current state
-                    lines = content.strip().split('\n')
-                    data = json.loads(lines[-1])
-                else:
-                    data = json.loads(content)
-                
-                # Add file info
-                data["session_id"] = session_file.stem
-                data["last_modified"] = os.path.getmtime(session_file)
-                sessions.append(data)
-            except Exception as e:
-                logger.error(f"Error reading session {session_file}: {e}")
-                continue
-        
-        # Sort by last modified
-        sessions.sort(key=lambda x: x.get("last_modified", 0), reverse=True)
-        return sessions[:50]
+
+        index = SessionSearchIndex(data_dir / "search.db", data_dir / "sessions")
+        try:
+            return index.search(q, limit)
+        finally:
+            index.close()
     
     @router.get("/memory")
     async def get_memory():
@@ -66,22 +103,64 @@ def create_dashboard_routes() -> APIRouter:
     
     @router.get("/skills")
     async def get_skills():
-        """List available skills"""
-        skills_dir = Path("./workspace/skills")
-        if not skills_dir.exists():
+        """List available skills (name and description from the registry)"""
+        return _skill_registry().list()
+
+    @router.get("/skills/{name}")
+    async def get_skill(name: str):
+        """Full content of one skill"""
+        body = _skill_registry().load(name)
+        if body is None:
+            raise HTTPException(status_code=404, detail="Skill not found")
+        return {"name": name, "content": body}
+    
+    @router.get("/jobs")
+    async def get_jobs(limit: int = 20):
+        """Recent background jobs"""
+        from app.main import _job_queue
+
+        if not _job_queue:
             return []
-        
-        skills = []
-        for skill_dir in skills_dir.iterdir():
-            if skill_dir.is_dir():
-                skill_md = skill_dir / "SKILL.md"
-                if skill_md.exists():
-                    skills.append({
-                        "name": skill_dir.name,
-                        "content": skill_md.read_text(encoding="utf-8")
-                    })
-        
-        return skills
+        return [job.to_dict() for job in await _job_queue.list(limit=limit)]
+
+    @router.post("/jobs/{job_id}/cancel")
+    async def cancel_job(job_id: int):
+        """Cancel a queued or running job"""
+        from app.main import _job_queue
+
+        if not _job_queue or not await _job_queue.cancel(job_id):
+            raise HTTPException(status_code=404, detail="Job not found or already finished")
+        return {"success": True}
+    
+    @router.get("/metrics")
+    async def get_metrics():
+        """Runtime counters of the persistence and agent pipeline"""
+        from app.main import _agent_loop, _job_queue, _session_retention, _summarizer
+
+        return {
+            "session_writers": session_writer_stats(),
+            "session_retention": _session_retention.last_report if _session_retention else None,
+            "agent_loop": _agent_loop.loop_stats if _agent_loop else None,
+            "llm_scheduler": _agent_loop.scheduler.stats() if _agent_loop else None,
+            "context": _agent_loop.context_stats if _agent_loop else None,
+            "tools": _agent_loop.tool_executor.stats if _agent_loop else None,
+            "jobs": _job_queue.report() if _job_queue else None,
+            "providers": _agent_loop.provider_manager.stats() if _agent_loop else None,
+            "llm_http": (
+                _agent_loop.provider_manager.http_pool.stats()
+                if _agent_loop and _agent_loop.provider_manager.http_pool else None
+            ),
+            "llm_cache": (
+                _agent_loop.provider_manager.cache.report()
+                if _agent_loop and _agent_loop.provider_manager.cache else None
+            ),
+            "system_prompt": _agent_loop.prompt_compiler.stats() if _agent_loop else None,
+            "memory_index": _agent_loop.memory_index.report() if _agent_loop else None,
+            "skills": _agent_loop.skills.report() if _agent_loop else None,
+            "summarizer": _summarizer.stats if _summarizer else None,
+            "telegram_streaming": telegram_stream_stats(),
+            "telegram_coalescing": coalescing_stats(),
+        }
     
     @router.get("/logs")
     async def get_logs(limit: int = 50):
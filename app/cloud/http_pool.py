@@ -0,0 +1,80 @@
+"""Pooled async HTTP clients shared by the LLM providers"""
+
+import importlib
+from typing import Any, Dict
+
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class HTTPPool:
+    """One keep-alive ``AsyncClient`` per HTTP library, shared by providers
+
+    Created once in the lifespan and closed on shutdown. Each SDK is handed
+    a client built from its own ``DefaultAsyncHttpxClient`` class, so SDKs
+    on the same httpx package share a single connection pool. HTTP/2 is
+    used when the ``h2`` package is installed.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 64,
+        max_keepalive: int = 16,
+        keepalive_seconds: float = 30,
+        timeout: float = 120,
+        http2: bool = True,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_seconds = keepalive_seconds
+        self.timeout = timeout
+        self.http2 = http2
+        self._clients: Dict[str, Any] = {}
+        self._protocols: Dict[str, str] = {}
+
+    def client_for(self, sdk_client_class: type) -> Any:
+        """Shared client for an SDK, given its ``DefaultAsyncHttpxClient``"""
+        # The SDK subclasses the AsyncClient of the httpx package it runs on
+        module_name = sdk_client_class.__mro__[1].__module__.split(".")[0]
+        client = self._clients.get(module_name)
+        if client is None:
+            client = self._clients[module_name] = self._create(sdk_client_class, module_name)
+        return client
+
+    def _create(self, sdk_client_class: type, module_name: str) -> Any:
+        httpx = importlib.import_module(module_name)
+        options = dict(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_seconds,
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=10),
+        )
+        client = None
+        if self.http2:
+            try:
+                client = sdk_client_class(http2=True, **options)
+                self._protocols[module_name] = "HTTP/2"
+            except ImportError:
+                logger.info("h2 not installed, shared LLM client uses HTTP/1.1")
+        if client is None:
+            client = sdk_client_class(**options)
+            self._protocols[module_name] = "HTTP/1.1"
+        logger.info(f"✅ Shared {module_name} client ({self._protocols[module_name]})")
+        return client
+
+    def stats(self) -> Dict[str, Any]:
+        """Protocol of each shared client and the pool limits"""
+        return {
+            "clients": dict(self._protocols),
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive,
+        }
+
+    async def aclose(self) -> None:
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        self._protocols.clear()
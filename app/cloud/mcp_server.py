@@ -5,9 +5,10 @@
 
 """
 MCP Server Tools:
-- read_nanobot_memory(key: str) -> Get memory content
+- read_nanobot_memory(key: str) -> Memory sections relevant to key
 - add_nanobot_skill(name: str, content: str) -> Create/update skill
 - list_sessions() -> List conversations
+- search_sessions(query: str) -> Ranked message hits with snippets
 - send_telegram_message(user_id: str, msg: str) -> Send message
 - get_nanobot_status() -> Health check
 
@@ -15,24 +16,39 @@ Usage:
     mcp connect app/cloud/mcp_server.py
 """
 
-from pathlib import Path
 import json
+from pathlib import Path
 from typing import Any
 
+from app.cloud.session_catalog import SessionCatalog  # noqa: E402
+from app.cloud.session_search import SessionSearchIndex  # noqa: E402
+from app.core.memory_index import MemoryIndex, format_chunks  # noqa: E402
+
 
-def read_nanobot_memory(key: str = "profile") -> dict:
-    """Read Nanobot memory by key"""
-    memory_file = Path("./workspace/memory/MEMORY.md")
-    if memory_file.exists():
-        return {"content": memory_file.read_text(encoding="utf-8")}
-    return {"error": "Memory not found"}
+def read_nanobot_memory(key: str = "profile", limit: int = 4) -> dict:
+    """Memory sections relevant to ``key`` (searched by relevance)"""
+    index = MemoryIndex(Path("./workspace"))
+    results = index.search(key, limit)
+    if not results:
+        return {"error": "Memory not found"}
+    return {
+        "content": format_chunks(results),
+        "sections": [
+            {"path": chunk.path, "heading": chunk.heading, "score": round(score, 3)}
+            for score, chunk in results
+        ],
+    }
 
 
-def add_nanobot_skill(name: str, content: str) -> dict:
-    """Add or update a skill"""
+def add_nanobot_skill(name: str, content: str, description: str = "") -> dict:
+    """Add or update a skill (``description`` is what the agent matches on)"""
     skill_dir = Path(f"./workspace/skills/{name}")
     skill_dir.mkdir(parents=True, exist_ok=True)
-    
+
+    if description and not content.startswith("---"):
+        front_matter = f"description: {json.dumps(description, ensure_ascii=False)}"
+        content = f"---\n{front_matter}\n---\n\n{content}"
+
     skill_file = skill_dir / "SKILL.md"
     skill_file.write_text(content, encoding="utf-8")
     
@@ -40,25 +56,29 @@ def add_nanobot_skill(name: str, content: str) -> dict:
 
 
 def list_sessions(limit: int = 50) -> dict:
-    """List recent sessions"""
-    sessions_dir = Path("./data/sessions")
-    if not sessions_dir.exists():
+    """List recent sessions from the session catalog"""
+    data_dir = Path("./data")
+    if not (data_dir / "sessions").exists():
         return {"sessions": []}
     
-    sessions = []
-    for session_file in sorted(
-        sessions_dir.glob("*.jsonl"),
-        key=lambda x: x.stat().st_mtime,
-        reverse=True
-    )[:limit]:
-        with open(session_file, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    sessions.append(json.loads(line))
-                except json.JSONDecodeError:
-                    continue
+    catalog = SessionCatalog(data_dir / "catalog.db", data_dir / "sessions")
+    try:
+        return {"sessions": catalog.recent(limit)}
+    finally:
+        catalog.close()
+
+
+def search_sessions(query: str, limit: int = 20) -> dict:
+    """Full-text search over conversation history"""
+    data_dir = Path("./data")
+    if not (data_dir / "sessions").exists():
+        return {"results": []}
     
-    return {"sessions": sessions}
+    index = SessionSearchIndex(data_dir / "search.db", data_dir / "sessions")
+    try:
+        return {"results": index.search(query, limit)}
+    finally:
+        index.close()
 
 
 def send_telegram_message(user_id: str, msg: str) -> dict:
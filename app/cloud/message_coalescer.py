@@ -0,0 +1,95 @@
+"""Debounce bursts of incoming messages into one batch per chat"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Set
+
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class MessageCoalescer:
+    """Merge messages of a chat that arrive within ``window`` seconds
+
+    Each new message restarts the chat's timer; when it fires, everything
+    pending is handed to ``handler(key, items)`` as one batch. A burst never
+    waits more than ``max_wait`` seconds after its first message. Batches of
+    the same chat run one at a time and in arrival order, so replies do not
+    overtake each other.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, List[Any]], Awaitable[None]],
+        window: float = 1.0,
+        max_wait: float = 4.0,
+    ):
+        self.handler = handler
+        self.window = window
+        self.max_wait = max(max_wait, window)
+        self._pending: Dict[str, List[Any]] = {}
+        self._first_at: Dict[str, float] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {"messages": 0, "batches": 0, "llm_calls_saved": 0, "largest_batch": 0}
+
+    def submit(self, key: str, item: Any) -> bool:
+        """
+        Queue an item for its chat
+
+        Returns:
+            True if it starts a new batch (the first message of a burst)
+        """
+        self.stats["messages"] += 1
+        pending = self._pending.setdefault(key, [])
+        pending.append(item)
+
+        now = time.monotonic()
+        first_at = self._first_at.setdefault(key, now)
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        delay = max(min(self.window, first_at + self.max_wait - now), 0)
+        self._timers[key] = asyncio.get_running_loop().call_later(delay, self._fire, key)
+        return len(pending) == 1
+
+    def _fire(self, key: str) -> None:
+        self._timers.pop(key, None)
+        self._first_at.pop(key, None)
+        items = self._pending.pop(key, None)
+        if not items:
+            return
+        task = asyncio.create_task(self._run(key, items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: str, items: List[Any]) -> None:
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            self.stats["batches"] += 1
+            self.stats["llm_calls_saved"] += len(items) - 1
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(items))
+            if len(items) > 1:
+                logger.info(f"Coalesced {len(items)} messages for {key}")
+            try:
+                await self.handler(key, items)
+            except Exception as e:
+                logger.error(f"Error handling batch for {key}: {e}", exc_info=True)
+
+    def discard(self, key: str) -> int:
+        """Drop a chat's batch that has not been dispatched; returns its size"""
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        self._first_at.pop(key, None)
+        return len(self._pending.pop(key, None) or ())
+
+    async def close(self) -> None:
+        """Dispatch pending batches now and wait for all of them"""
+        for key in list(self._timers):
+            self._timers[key].cancel()
+            self._fire(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -1,106 +1,494 @@
 """LLM Provider management - Groq primary, Anthropic fallback"""
 
 import asyncio
-from typing import List, Dict, Any, Optional
-from tenacity import retry, stop_after_attempt, wait_exponential
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    retry_if_not_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
 
-from app.config import Settings
+from app.config import Settings, load_providers_config
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.cloud.http_pool import HTTPPool
+from app.cloud.response_cache import CachedProvider, ResponseCache
 from app.utils import get_logger
 
 logger = get_logger(__name__)
 
 
+# Below this much time left, a failed call is not retried
+_MIN_RETRY_SECONDS = 2
+
+
+def _deadline_near(retry_state: Any) -> bool:
+    """tenacity stop: no retry once the caller's deadline is too close"""
+    deadline = retry_state.kwargs.get("deadline")
+    return deadline is not None and deadline.bound(float("inf")) < _MIN_RETRY_SECONDS
+
+
+# Up to 3 attempts with backoff, never past the request deadline. Only
+# errors are retried: tenacity also sees CancelledError (a BaseException),
+# which must propagate so /cancel and the turn timeout stop the call.
+_retry = retry(
+    stop=stop_after_attempt(3) | _deadline_near,
+    wait=wait_exponential(multiplier=1, min=2, max=10),
+    retry=retry_if_exception_type(Exception) & retry_if_not_exception_type(DeadlineExceeded),
+)
+
+
+async def _bounded(coro: Any, deadline: Optional[Deadline]) -> Any:
+    """Await coro within the deadline, raising DeadlineExceeded past it"""
+    try:
+        async with asyncio.timeout(deadline.remaining() if deadline else None):
+            return await coro
+    except TimeoutError:
+        raise DeadlineExceeded(f"deadline of {deadline.seconds:g}s exceeded") from None
+
+
+def _usage_stats() -> Dict[str, int]:
+    """Counters of prompt tokens and provider-side prompt cache use"""
+    return {
+        "calls": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_hits": 0,
+        "cache_read_tokens": 0,
+        "cache_write_tokens": 0,
+    }
+
+
+def _answered_tool_calls(messages: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Tool calls of each assistant message (by position) that have a result
+
+    A call without a result (turn interrupted while its tool ran) would make
+    providers reject every later request of the session, so it is dropped.
+    """
+    answered = {msg.get("tool_call_id") for msg in messages if msg["role"] == "tool"}
+    return {
+        i: [call for call in msg["tool_calls"] if call["id"] in answered]
+        for i, msg in enumerate(messages)
+        if msg["role"] == "assistant" and msg.get("tool_calls")
+    }
+
+
+def to_openai_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Chat messages in the OpenAI-compatible shape Groq expects
+
+    Assistant tool calls become ``tool_calls`` entries with JSON arguments.
+    Tool results whose call is not in the window (trimmed away, or saved
+    before tool calling existed) are sent as plain user text; calls without
+    a result are left out.
+    """
+    calls_by_message = _answered_tool_calls(messages)
+    known = {call["id"] for calls in calls_by_message.values() for call in calls}
+    converted = []
+    for i, msg in enumerate(messages):
+        role = msg["role"]
+        if i in calls_by_message:
+            calls = calls_by_message[i]
+            if not calls:
+                if msg["content"]:
+                    converted.append({"role": "assistant", "content": msg["content"]})
+                continue
+            converted.append({
+                "role": "assistant",
+                "content": msg["content"] or None,
+                "tool_calls": [
+                    {
+                        "id": call["id"],
+                        "type": "function",
+                        "function": {"name": call["name"], "arguments": json.dumps(call["args"])},
+                    }
+                    for call in calls
+                ],
+            })
+        elif role == "tool":
+            if msg.get("tool_call_id") in known:
+                converted.append(
+                    {"role": "tool", "tool_call_id": msg["tool_call_id"], "content": msg["content"]}
+                )
+            else:
+                converted.append(
+                    {"role": "user", "content": f"[Resultado de herramienta]\n{msg['content']}"}
+                )
+        else:
+            converted.append({"role": role, "content": msg["content"]})
+    return converted
+
+
+def to_anthropic_request(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Split chat messages into Anthropic ``system`` blocks and ``messages``
+
+    The first system message is the static prompt and gets a cache
+    breakpoint, as does the last conversation message, so each turn reads
+    the prompt and the previous history from the provider's prompt cache.
+    Tool calls become ``tool_use`` blocks and their results ``tool_result``
+    blocks in a user turn; results without a matching call are plain text
+    and calls without a result are left out.
+    """
+    calls_by_message = _answered_tool_calls(messages)
+    known = {call["id"] for calls in calls_by_message.values() for call in calls}
+    system: List[Dict[str, Any]] = []
+    chat: List[Dict[str, Any]] = []
+
+    def append(role: str, block: Dict[str, Any]) -> None:
+        # Consecutive blocks of the same role (e.g. parallel tool results) share one turn
+        if chat and chat[-1]["role"] == role:
+            chat[-1]["content"].append(block)
+        else:
+            chat.append({"role": role, "content": [block]})
+
+    for i, msg in enumerate(messages):
+        role = msg["role"]
+        if role == "system":
+            system.append({"type": "text", "text": msg["content"]})
+        elif role == "tool" and msg.get("tool_call_id") in known:
+            append("user", {
+                "type": "tool_result",
+                "tool_use_id": msg["tool_call_id"],
+                "content": msg["content"],
+            })
+        elif role == "assistant":
+            calls = calls_by_message.get(i, ())
+            if msg["content"] or not msg.get("tool_calls"):
+                append("assistant", {"type": "text", "text": msg["content"]})
+            for call in calls:
+                append("assistant", {
+                    "type": "tool_use",
+                    "id": call["id"],
+                    "name": call["name"],
+                    "input": call["args"],
+                })
+        else:
+            append("user", {"type": "text", "text": msg["content"]})
+
+    if system:
+        system[0]["cache_control"] = {"type": "ephemeral"}
+    if chat:
+        chat[-1]["content"][-1]["cache_control"] = {"type": "ephemeral"}
+    return {"system": system, "messages": chat}
+
+
 class GroqProvider:
     """Groq LLM provider (primary)"""
 
-    def __init__(self, api_key: str, model: str = "llama-3.3-70b-versatile"):
-        from groq import Groq
-        self.client = Groq(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "llama-3.3-70b-versatile",
+        max_input_tokens: Optional[int] = None,
+        http_pool: Optional[HTTPPool] = None,
+    ):
+        from groq import AsyncGroq, DefaultAsyncHttpxClient
+        http_client = http_pool.client_for(DefaultAsyncHttpxClient) if http_pool else None
+        self.client = AsyncGroq(api_key=api_key, http_client=http_client)
         self.model = model
+        self.max_input_tokens = max_input_tokens
         self.name = "groq"
+        self.stats = _usage_stats()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    @_retry
     async def call(
-        self, messages: List[Dict[str, str]], max_tokens: int = 8192, temperature: float = 0.7
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int = 8192,
+        temperature: float = 0.7,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: str = "auto",
+        deadline: Optional[Deadline] = None,
     ) -> Dict[str, Any]:
-        """Call Groq API"""
+        """Call Groq API (``tool_choice`` is "auto" or "none")"""
         try:
             logger.info(f"Calling Groq ({self.model})")
 
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
-                model=self.model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-            )
+            response = await _bounded(self.client.chat.completions.create(
+                **self._request(messages, max_tokens, temperature, tools, tool_choice),
+            ), deadline)
 
-            content = response.choices[0].message.content
-            logger.info(f"Groq response: {len(content)} chars")
+            message = response.choices[0].message
+            content = message.content or ""
+            tool_calls = [
+                {
+                    "id": call.id,
+                    "name": call.function.name,
+                    "args": json.loads(call.function.arguments or "{}"),
+                }
+                for call in message.tool_calls or ()
+            ]
+            self._record_usage(response.usage)
+            logger.info(f"Groq response: {len(content)} chars, {len(tool_calls)} tool calls")
 
-            return {"text": content, "tool_calls": []}
+            return {"text": content, "tool_calls": tool_calls}
 
         except Exception as e:
             logger.error(f"Groq error: {e}")
             raise
 
+    async def stream(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int = 8192,
+        temperature: float = 0.7,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: str = "auto",
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a Groq completion
+
+        Yields ``{"type": "text", "text": delta}`` as tokens arrive and ends
+        with ``{"type": "done", "text": ..., "tool_calls": [...]}``, the same
+        result ``call`` returns. Not retried: deltas may already be shown.
+        """
+        logger.info(f"Streaming Groq ({self.model})")
+        request = self._request(messages, max_tokens, temperature, tools, tool_choice)
+
+        parts: List[str] = []
+        calls: Dict[int, Dict[str, str]] = {}
+        usage = None
+        stream = None
+        try:
+            stream = await self.client.chat.completions.create(stream=True, **request)
+            async for chunk in stream:
+                # Groq reports usage on the last chunk, under x_groq
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    parts.append(delta.content)
+                    yield {"type": "text", "text": delta.content}
+                # Tool calls may arrive in fragments keyed by index
+                for fragment in delta.tool_calls or ():
+                    call = calls.setdefault(fragment.index, {"id": "", "name": "", "arguments": ""})
+                    call["id"] = fragment.id or call["id"]
+                    if fragment.function:
+                        call["name"] += fragment.function.name or ""
+                        call["arguments"] += fragment.function.arguments or ""
+        except Exception as e:
+            logger.error(f"Groq stream error: {e}")
+            raise
+        finally:
+            if stream is not None:
+                # Closes the connection when the consumer stopped early
+                await stream.close()
+
+        content = "".join(parts)
+        tool_calls = [
+            {"id": call["id"], "name": call["name"], "args": json.loads(call["arguments"] or "{}")}
+            for _, call in sorted(calls.items())
+        ]
+        self._record_usage(usage)
+        logger.info(f"Groq stream: {len(content)} chars, {len(tool_calls)} tool calls")
+        yield {"type": "done", "text": content, "tool_calls": tool_calls}
+
+    def _request(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        temperature: float,
+        tools: Optional[List[Dict[str, Any]]],
+        tool_choice: str,
+    ) -> Dict[str, Any]:
+        request: Dict[str, Any] = {
+            "model": self.model,
+            "messages": to_openai_messages(messages),
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        if tools:
+            request["tools"] = [
+                {
+                    "type": "function",
+                    "function": {
+                        "name": tool["name"],
+                        "description": tool["description"],
+                        "parameters": tool["parameters"],
+                    },
+                }
+                for tool in tools
+            ]
+            request["tool_choice"] = tool_choice
+        return request
+
+    def _record_usage(self, usage: Any) -> None:
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or 0
+        self.stats["calls"] += 1
+        self.stats["input_tokens"] += usage.prompt_tokens or 0
+        self.stats["output_tokens"] += usage.completion_tokens or 0
+        self.stats["cache_read_tokens"] += cached
+        self.stats["cache_hits"] += 1 if cached else 0
+
 
 class AnthropicProvider:
     """Anthropic Claude provider (fallback)"""
 
-    def __init__(self, api_key: str, model: str = "claude-opus-4-5"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-opus-4-5",
+        max_input_tokens: Optional[int] = None,
+        http_pool: Optional[HTTPPool] = None,
+    ):
         import anthropic
-        self.client = anthropic.Anthropic(api_key=api_key)
+        http_client = http_pool.client_for(anthropic.DefaultAsyncHttpxClient) if http_pool else None
+        self.client = anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client)
         self.model = model
+        self.max_input_tokens = max_input_tokens
         self.name = "anthropic"
+        self.stats = _usage_stats()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    @_retry
     async def call(
-        self, messages: List[Dict[str, str]], max_tokens: int = 8192, temperature: float = 0.7
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int = 8192,
+        temperature: float = 0.7,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: str = "auto",
+        deadline: Optional[Deadline] = None,
     ) -> Dict[str, Any]:
-        """Call Anthropic API"""
+        """Call Anthropic API (``tool_choice`` is "auto" or "none")"""
         try:
             logger.info(f"Calling Anthropic ({self.model})")
 
-            response = await asyncio.to_thread(
-                self.client.messages.create,
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                messages=messages,
+            response = await _bounded(self.client.messages.create(
+                **self._request(messages, max_tokens, temperature, tools, tool_choice),
+            ), deadline)
+
+            result = self._parse(response)
+            logger.info(
+                f"Anthropic response: {len(result['text'])} chars, "
+                f"{len(result['tool_calls'])} tool calls"
             )
+            return result
 
-            content = response.content[0].text
-            logger.info(f"Anthropic response: {len(content)} chars")
+        except Exception as e:
+            logger.error(f"Anthropic error: {e}")
+            raise
 
-            return {"text": content, "tool_calls": []}
+    async def stream(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int = 8192,
+        temperature: float = 0.7,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: str = "auto",
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream an Anthropic completion (same events as ``GroqProvider.stream``)"""
+        logger.info(f"Streaming Anthropic ({self.model})")
+        request = self._request(messages, max_tokens, temperature, tools, tool_choice)
 
+        try:
+            async with self.client.messages.stream(**request) as stream:
+                async for text in stream.text_stream:
+                    yield {"type": "text", "text": text}
+                final = await stream.get_final_message()
         except Exception as e:
-            logger.error(f"Anthropic error: {e}")
+            logger.error(f"Anthropic stream error: {e}")
             raise
 
+        result = self._parse(final)
+        logger.info(
+            f"Anthropic stream: {len(result['text'])} chars, "
+            f"{len(result['tool_calls'])} tool calls"
+        )
+        yield {"type": "done", **result}
+
+    def _request(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        temperature: float,
+        tools: Optional[List[Dict[str, Any]]],
+        tool_choice: str,
+    ) -> Dict[str, Any]:
+        request = to_anthropic_request(messages)
+        request.update(model=self.model, max_tokens=max_tokens, temperature=temperature)
+        if tools:
+            request["tools"] = [
+                {
+                    "name": tool["name"],
+                    "description": tool["description"],
+                    "input_schema": tool["parameters"],
+                }
+                for tool in tools
+            ]
+            request["tool_choice"] = {"type": tool_choice}
+        return request
+
+    def _parse(self, response: Any) -> Dict[str, Any]:
+        """Text and tool calls of a message, recording its usage"""
+        content = "".join(block.text for block in response.content if block.type == "text")
+        tool_calls = [
+            {"id": block.id, "name": block.name, "args": block.input}
+            for block in response.content
+            if block.type == "tool_use"
+        ]
+        self._record_usage(response.usage)
+        return {"text": content, "tool_calls": tool_calls}
+
+    def _record_usage(self, usage: Any) -> None:
+        if usage is None:
+            return
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        self.stats["calls"] += 1
+        # input_tokens excludes cached tokens; count the full prompt
+        self.stats["input_tokens"] += (usage.input_tokens or 0) + cache_read + cache_write
+        self.stats["output_tokens"] += usage.output_tokens or 0
+        self.stats["cache_read_tokens"] += cache_read
+        self.stats["cache_write_tokens"] += cache_write
+        self.stats["cache_hits"] += 1 if cache_read else 0
+
 
 class ProviderManager:
     """Manage LLM providers with fallback logic"""
 
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, http_pool: Optional[HTTPPool] = None):
         self.settings = settings
+        self.http_pool = http_pool
+        self.config = load_providers_config()
         self.groq_provider = None
         self.anthropic_provider = None
+        self.cache: Optional[ResponseCache] = None
+        if settings.llm_cache_enabled:
+            self.cache = ResponseCache(
+                db_path=settings.llm_cache_path or None,
+                max_entries=settings.llm_cache_max_entries,
+                ttl_seconds=settings.llm_cache_ttl_seconds,
+            )
         self._init_providers()
 
     def _init_providers(self):
         """Initialize providers"""
         try:
             if self.settings.groq_api_key:
-                self.groq_provider = GroqProvider(self.settings.groq_api_key)
+                self.groq_provider = GroqProvider(
+                    self.settings.groq_api_key,
+                    max_input_tokens=self.config.get("groq", {}).get("max_input_tokens"),
+                    http_pool=self.http_pool,
+                )
                 logger.info("✅ Groq provider initialized")
         except Exception as e:
             logger.warning(f"Failed to initialize Groq: {e}")
 
         try:
             if self.settings.anthropic_api_key:
-                self.anthropic_provider = AnthropicProvider(self.settings.anthropic_api_key)
+                self.anthropic_provider = AnthropicProvider(
+                    self.settings.anthropic_api_key,
+                    max_input_tokens=self.config.get("anthropic", {}).get("max_input_tokens"),
+                    http_pool=self.http_pool,
+                )
                 logger.info("✅ Anthropic provider initialized")
         except Exception as e:
             logger.warning(f"Failed to initialize Anthropic: {e}")
@@ -108,6 +496,29 @@ class ProviderManager:
         if not self.groq_provider and not self.anthropic_provider:
             logger.error("❌ No LLM providers available!")
 
+        if self.cache:
+            max_history = self.settings.llm_cache_max_history
+            if self.groq_provider:
+                self.groq_provider = CachedProvider(self.groq_provider, self.cache, max_history)
+            if self.anthropic_provider:
+                self.anthropic_provider = CachedProvider(
+                    self.anthropic_provider, self.cache, max_history
+                )
+            logger.info("✅ LLM response cache enabled")
+
+    def close(self) -> None:
+        """Release the response cache database"""
+        if self.cache:
+            self.cache.close()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Token and prompt-cache counters per initialized provider"""
+        return {
+            provider.name: provider.stats
+            for provider in (self.groq_provider, self.anthropic_provider)
+            if provider is not None
+        }
+
     def get_provider(self):
         """Get provider (Groq first, fallback to Anthropic)"""
         if self.groq_provider:
@@ -119,25 +530,63 @@ class ProviderManager:
 
     async def call(
         self,
-        messages: List[Dict[str, str]],
+        messages: List[Dict[str, Any]],
         max_tokens: int = 8192,
         temperature: float = 0.7,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: str = "auto",
+        deadline: Optional[Deadline] = None,
     ) -> Dict[str, Any]:
-        """Call LLM with fallback logic"""
+        """Call LLM with fallback logic (no fallback once ``deadline`` passed)"""
         provider = self.get_provider()
 
         try:
-            return await provider.call(messages, max_tokens, temperature)
+            return await provider.call(
+                messages, max_tokens, temperature, tools, tool_choice, deadline=deadline
+            )
         except Exception as e:
             logger.error(f"{provider.name} failed: {e}")
 
             # Try fallback
-            if provider.name == "groq" and self.anthropic_provider:
+            has_time = not (deadline and deadline.expired)
+            if provider.name == "groq" and self.anthropic_provider and has_time:
                 logger.info("Trying Anthropic fallback...")
                 try:
-                    return await self.anthropic_provider.call(messages, max_tokens, temperature)
+                    return await self.anthropic_provider.call(
+                        messages, max_tokens, temperature, tools, tool_choice, deadline=deadline
+                    )
                 except Exception as fallback_err:
                     logger.error(f"Anthropic fallback also failed: {fallback_err}")
                     raise
 
             raise
+
+    async def stream(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int = 8192,
+        temperature: float = 0.7,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: str = "auto",
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream with fallback, only while nothing has been yielded yet"""
+        provider = self.get_provider()
+        yielded = False
+
+        try:
+            async for event in provider.stream(
+                messages, max_tokens, temperature, tools, tool_choice
+            ):
+                yielded = True
+                yield event
+            return
+        except Exception as e:
+            logger.error(f"{provider.name} stream failed: {e}")
+            if yielded or provider.name != "groq" or not self.anthropic_provider:
+                raise
+
+        logger.info("Trying Anthropic fallback...")
+        async for event in self.anthropic_provider.stream(
+            messages, max_tokens, temperature, tools, tool_choice
+        ):
+            yield event
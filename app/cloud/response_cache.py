@@ -0,0 +1,295 @@
+"""LLM response cache - memory LRU in front of an SQLite tier"""
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    latency REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used);
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Case and whitespace-insensitive form of a prompt"""
+    return _WHITESPACE.sub(" ", text or "").strip().casefold()
+
+
+def has_tool_output(messages: List[Dict[str, Any]]) -> bool:
+    """Whether the conversation carries tool calls or results (never cached)"""
+    return any(msg["role"] == "tool" or msg.get("tool_calls") for msg in messages)
+
+
+def _latest_user_turn(messages: List[Dict[str, Any]]) -> int:
+    """Position of the last user message, or -1"""
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i]["role"] == "user":
+            return i
+    return -1
+
+
+def history_length(messages: List[Dict[str, Any]]) -> int:
+    """Conversation messages sent before the latest user turn (system text excluded)"""
+    latest = _latest_user_turn(messages)
+    return sum(1 for msg in messages[:max(latest, 0)] if msg["role"] != "system")
+
+
+def cache_key(
+    provider: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    max_tokens: int,
+    temperature: float,
+    tools: Optional[List[Dict[str, Any]]] = None,
+    tool_choice: str = "auto",
+) -> str:
+    """
+    Hash of the static prompt, the latest user turn, model and sampling parameters
+
+    The static prompt is the leading system message. Per-call system text
+    (user id, channel) and earlier history are left out, so the same question
+    asked from different chats shares one entry. The latest user turn carries
+    the memory retrieved for it, so workspace edits change the key.
+    """
+    static = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+    latest = _latest_user_turn(messages)
+    payload = {
+        "provider": provider,
+        "model": model,
+        "system": hashlib.sha256(static.encode("utf-8")).hexdigest(),
+        "prompt": normalize_text(messages[latest]["content"]) if latest >= 0 else "",
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "tools": sorted(tool["name"] for tool in tools or ()),
+        "tool_choice": tool_choice if tools else None,
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Provider responses by prompt hash, with TTL and LRU eviction
+
+    ``max_entries`` responses are kept in memory; with a ``db_path`` every
+    response is also written to SQLite (up to ``max_disk_entries``, least
+    recently used evicted first) so the cache survives restarts. Each entry
+    remembers how long the original call took, to report latency saved.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str | Path] = None,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600,
+        max_disk_entries: int = 10_000,
+    ):
+        self.max_entries = max(max_entries, 1)
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, Tuple[float, float, Dict[str, Any]]]" = OrderedDict()
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "evictions": 0,
+            "latency_saved_seconds": 0.0,
+        }
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached response for a key, or None (counts the lookup)"""
+        self.stats["lookups"] += 1
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry and entry[0] > now:
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return self._hit(entry)
+        if entry:
+            del self._memory[key]
+
+        if self._conn is not None:
+            entry = await asyncio.to_thread(self._disk_get, key, now)
+            if entry:
+                self._remember(key, entry)
+                self.stats["disk_hits"] += 1
+                return self._hit(entry)
+        return None
+
+    async def put(self, key: str, response: Dict[str, Any], latency: float) -> None:
+        """Store a response that took ``latency`` seconds to produce"""
+        entry = (time.time() + self.ttl_seconds, latency, response)
+        self._remember(key, entry)
+        self.stats["stores"] += 1
+        if self._conn is not None:
+            await asyncio.to_thread(self._disk_put, key, entry)
+
+    def _hit(self, entry: Tuple[float, float, Dict[str, Any]]) -> Dict[str, Any]:
+        self.stats["hits"] += 1
+        self.stats["latency_saved_seconds"] = round(
+            self.stats["latency_saved_seconds"] + entry[1], 3
+        )
+        return json.loads(json.dumps(entry[2]))
+
+    def _remember(self, key: str, entry: Tuple[float, float, Dict[str, Any]]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, float, Dict[str, Any]]]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, latency, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[2] <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        return row[2], row[1], json.loads(row[0])
+
+    def _disk_put(self, key: str, entry: Tuple[float, float, Dict[str, Any]]) -> None:
+        expires_at, latency, response = entry
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, latency, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(response, ensure_ascii=False), latency, expires_at, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_disk_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (count - self.max_disk_entries,),
+                )
+
+    def report(self) -> Dict[str, Any]:
+        """Counters plus hit rate over cacheable lookups"""
+        report = dict(self.stats)
+        report["entries"] = len(self._memory)
+        lookups = self.stats["lookups"]
+        report["hit_rate"] = round(self.stats["hits"] / lookups, 3) if lookups else None
+        return report
+
+    def close(self) -> None:
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
+
+
+class CachedProvider:
+    """Provider wrapper answering repeated prompts from a ResponseCache
+
+    Conversations that contain tool calls or tool output bypass the cache:
+    their answer depends on live results. So do those with more than
+    ``max_history`` messages before the latest user turn, since the key
+    leaves the history out. A cached response that requests tools still
+    runs them, so only the model call is skipped.
+    """
+
+    def __init__(self, provider: Any, cache: ResponseCache, max_history: int = 2):
+        self.provider = provider
+        self.cache = cache
+        self.max_history = max_history
+
+    def __getattr__(self, name: str) -> Any:
+        # name, model, max_input_tokens, stats... come from the provider
+        return getattr(self.provider, name)
+
+    def _key(self, messages, max_tokens, temperature, tools, tool_choice) -> Optional[str]:
+        if has_tool_output(messages) or history_length(messages) > self.max_history:
+            self.cache.stats["bypassed"] += 1
+            return None
+        return cache_key(
+            self.provider.name, self.provider.model, messages,
+            max_tokens, temperature, tools, tool_choice,
+        )
+
+    async def call(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int = 8192,
+        temperature: float = 0.7,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: str = "auto",
+        deadline: Any = None,
+    ) -> Dict[str, Any]:
+        key = self._key(messages, max_tokens, temperature, tools, tool_choice)
+        if key:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                logger.info(f"LLM cache hit ({self.provider.name})")
+                return cached
+
+        started = time.perf_counter()
+        response = await self.provider.call(
+            messages, max_tokens, temperature, tools, tool_choice, deadline=deadline
+        )
+        if key:
+            await self.cache.put(key, response, time.perf_counter() - started)
+        return response
+
+    async def stream(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int = 8192,
+        temperature: float = 0.7,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: str = "auto",
+    ) -> AsyncIterator[Dict[str, Any]]:
+        key = self._key(messages, max_tokens, temperature, tools, tool_choice)
+        if key:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                logger.info(f"LLM cache hit ({self.provider.name}, streamed)")
+                if cached["text"]:
+                    yield {"type": "text", "text": cached["text"]}
+                yield {"type": "done", **cached}
+                return
+
+        started = time.perf_counter()
+        async for event in self.provider.stream(
+            messages, max_tokens, temperature, tools, tool_choice
+        ):
+            if event["type"] == "done" and key:
+                response = {"text": event["text"], "tool_calls": event["tool_calls"]}
+                await self.cache.put(key, response, time.perf_counter() - started)
+            yield event
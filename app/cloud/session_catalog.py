@@ -0,0 +1,154 @@
+"""Session catalog - indexed summary of every session log for fast listing"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.cloud.sessions import (
+    COMPRESSED_SUFFIX,
+    LOG_SUFFIX,
+    read_session_summary,
+    session_id_from_path,
+)
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog (
+    session_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    message_count INTEGER NOT NULL,
+    started_at TEXT,
+    last_modified REAL NOT NULL,
+    size_bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_catalog_last_modified ON catalog (last_modified);
+CREATE INDEX IF NOT EXISTS idx_catalog_user_id ON catalog (user_id);
+"""
+
+_COLUMNS = (
+    "session_id", "user_id", "channel", "message_count",
+    "started_at", "last_modified", "size_bytes",
+)
+
+
+class SessionCatalog:
+    """SQLite index of session summaries, kept in sync by SessionManager
+
+    Listing recent sessions is a single indexed query instead of a directory
+    walk. ``rebuild`` re-derives the catalog from the session logs; it runs
+    automatically the first time the catalog database is created.
+    """
+
+    def __init__(self, db_path: str | Path, sessions_dir: str | Path):
+        self.db_path = Path(db_path)
+        self.sessions_dir = Path(sessions_dir)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.db_path.exists()
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        if is_new:
+            self.rebuild()
+
+    def upsert(self, entry: Dict[str, Any]) -> None:
+        """Insert or replace the catalog entry for one session"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO catalog ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                tuple(entry.get(column) for column in _COLUMNS),
+            )
+
+    def update_size(self, session_id: str, size_bytes: int) -> None:
+        """Record a new on-disk size for a session (after compaction)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE catalog SET size_bytes = ? WHERE session_id = ?", (size_bytes, session_id)
+            )
+
+    def remove(self, *session_ids: str) -> None:
+        """Drop sessions from the catalog"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM catalog WHERE session_id = ?", ((sid,) for sid in session_ids)
+            )
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Catalog entry for one session"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM catalog WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def user_ids(self) -> Dict[str, str]:
+        """Owner of every cataloged session, by session id"""
+        with self._lock:
+            rows = self._conn.execute("SELECT session_id, user_id FROM catalog").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recently modified sessions, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM catalog ORDER BY last_modified DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def rebuild(self) -> int:
+        """
+        Re-derive the catalog from the session logs on disk
+
+        Returns:
+            Number of sessions indexed
+        """
+        started = time.perf_counter()
+        entries = []
+
+        if self.sessions_dir.exists():
+            with os.scandir(self.sessions_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith((LOG_SUFFIX, COMPRESSED_SUFFIX)):
+                        continue
+                    try:
+                        session_file = Path(entry.path)
+                        summary = read_session_summary(session_file)
+                        if summary is None:
+                            continue
+                        stat = entry.stat()
+                        summary["session_id"] = session_id_from_path(session_file)
+                        summary["last_modified"] = stat.st_mtime
+                        summary["size_bytes"] = stat.st_size
+                        entries.append(tuple(summary.get(column) for column in _COLUMNS))
+                    except Exception as e:
+                        logger.warning(f"Skipping session {entry.name} in catalog: {e}")
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM catalog")
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO catalog ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                entries,
+            )
+
+        logger.info(
+            f"Session catalog rebuilt: {len(entries)} sessions "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return len(entries)
+
+    def close(self) -> None:
+        """Close the catalog database"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,166 @@
+"""Session compaction - shrink session logs to their live state and compress cold ones"""
+
+import asyncio
+import gzip
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.cloud.session_retention import _SessionEntry, scan_sessions
+from app.cloud.sessions import (
+    COMPRESSED_SUFFIX,
+    LOG_SUFFIX,
+    SessionManager,
+    encode_session_log,
+    log_serializer,
+    read_records,
+    replay_records,
+    session_id_from_path,
+)
+from app.core.context import AgentContext
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def _needs_compaction(session_file: Path) -> bool:
+    """A log is compact when it is one header followed only by message records"""
+    for i, record in enumerate(read_records(session_file)):
+        kind = record.get("kind")
+        if (i == 0) != (kind == "header") or kind not in ("header", "message"):
+            return True
+    return False
+
+
+def _rewrite_to_temp(session_file: Path, compress: bool, serializer) -> Optional[Path]:
+    """
+    Write the live state of a session log to a temp file
+
+    Returns:
+        Temp file path, or None when the log is already compact, in the same
+        on-disk encoding as ``serializer`` and does not need compressing
+    """
+    if (
+        not compress
+        and log_serializer(session_file).preamble == serializer.preamble
+        and not _needs_compaction(session_file)
+    ):
+        return None
+
+    state = replay_records(read_records(session_file))
+    if state is None:
+        return None
+    ctx = AgentContext.from_dict(state)
+
+    session_id = session_id_from_path(session_file)
+    suffix = COMPRESSED_SUFFIX if compress else LOG_SUFFIX
+    tmp_file = session_file.with_name(f"{session_id}{suffix}.tmp")
+
+    opener = gzip.open if compress else open
+    with opener(tmp_file, "wb") as f:
+        f.writelines(encode_session_log(ctx, serializer))
+
+    return tmp_file
+
+
+def _swap(entry: _SessionEntry, tmp_file: Path, compress: bool) -> Optional[int]:
+    """
+    Replace a log with its rewritten temp file unless it changed since the scan
+
+    Returns:
+        Size of the new file, or None when the log was modified and the temp
+        file was discarded
+    """
+    session_file = Path(entry.path)
+    target = tmp_file.with_name(tmp_file.name[: -len(".tmp")])
+    after = session_file.stat()
+    if (after.st_size, after.st_mtime_ns) != (entry.size, entry.mtime_ns):
+        tmp_file.unlink()
+        return None
+
+    os.replace(tmp_file, target)
+    # Keep the original mtime so age-based policies still see the session as idle
+    os.utime(target, ns=(after.st_atime_ns, entry.mtime_ns))
+    if compress:
+        session_file.unlink()
+    return target.stat().st_size
+
+
+class SessionCompactor:
+    """Rewrite session logs down to their live state and gzip idle sessions
+
+    Heavy work (the directory scan, reading, rewriting, compressing) runs in
+    worker threads. The final swap happens with the session writer paused,
+    and only if the log was not modified since the scan. Sessions currently held in the
+    SessionManager cache are skipped.
+    """
+
+    def __init__(self, session_manager: SessionManager, compress_after_days: float = 7):
+        self.session_manager = session_manager
+        self.compress_after_days = compress_after_days
+
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Compact and compress every eligible session log
+
+        Returns:
+            Report with counts, bytes reclaimed and elapsed seconds
+        """
+        started = time.perf_counter()
+        report = {"compacted": 0, "compressed": 0, "bytes_reclaimed": 0, "seconds": 0.0}
+
+        await self.session_manager.flush()
+        cutoff_ns = (time.time() - self.compress_after_days * 86400) * 1e9
+
+        entries = await asyncio.to_thread(scan_sessions, self.session_manager.sessions_dir)
+        for entry in entries:
+            if not entry.path.endswith(LOG_SUFFIX) or self.session_manager.is_cached(
+                entry.session_id
+            ):
+                continue
+            session_file = Path(entry.path)
+
+            try:
+                compress = entry.mtime_ns < cutoff_ns
+
+                tmp_file = await asyncio.to_thread(
+                    _rewrite_to_temp, session_file, compress, self.session_manager.serializer
+                )
+                if tmp_file is None:
+                    continue
+
+                # Swap only if nothing was appended while we were rewriting
+                async with self.session_manager.writer().paused():
+                    new_size = await asyncio.to_thread(_swap, entry, tmp_file, compress)
+                    if new_size is None:
+                        continue
+                    self.session_manager.invalidate_log(entry.session_id)
+
+                report["compressed" if compress else "compacted"] += 1
+                report["bytes_reclaimed"] += entry.size - new_size
+                if self.session_manager.catalog is not None:
+                    self.session_manager.catalog.update_size(entry.session_id, new_size)
+
+            except Exception as e:
+                logger.warning(f"Compaction failed for {session_file.name}: {e}")
+
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(
+            f"Session compaction: {report['compacted']} compacted, "
+            f"{report['compressed']} compressed, {report['bytes_reclaimed']} bytes reclaimed "
+            f"in {report['seconds']}s"
+        )
+        return report
+
+    async def scheduled_compaction(self, interval_hours: float = 6):
+        """Run compaction on schedule"""
+        while True:
+            try:
+                await asyncio.sleep(interval_hours * 3600)
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduled compaction error: {e}")
+                await asyncio.sleep(60)
@@ -0,0 +1,247 @@
+"""Session retention - evict session logs by age, per-user quota and disk budget"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.cloud.sessions import (
+    COMPRESSED_SUFFIX,
+    LOG_SUFFIX,
+    SUMMARY_SUFFIX,
+    SessionManager,
+    read_first_record,
+)
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+
+
+@dataclass(slots=True)
+class _SessionEntry:
+    """One session log as seen by the retention scan"""
+    session_id: str
+    path: str
+    size: int
+    mtime_ns: int
+    user_id: str = ""
+    pinned: bool = False  # live in the cache: counts toward usage, never evicted
+
+
+def scan_sessions(sessions_dir: Path) -> List[_SessionEntry]:
+    """
+    Stat every session log in one directory pass
+
+    ``os.scandir`` returns the stat data cached from the directory read on
+    most platforms, so this is one syscall per file at most. Blocking - call
+    it from a worker thread.
+    """
+    entries = []
+    with os.scandir(sessions_dir) as it:
+        for entry in it:
+            name = entry.name
+            if name.endswith(LOG_SUFFIX):
+                session_id = name[: -len(LOG_SUFFIX)]
+            elif name.endswith(COMPRESSED_SUFFIX):
+                session_id = name[: -len(COMPRESSED_SUFFIX)]
+            else:
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append(_SessionEntry(session_id, entry.path, st.st_size, st.st_mtime_ns))
+    return entries
+
+
+def select_evictions(
+    entries: List[_SessionEntry],
+    now: float,
+    max_age_days: Optional[float] = None,
+    user_quota_bytes: Optional[int] = None,
+    disk_budget_bytes: Optional[int] = None,
+) -> Dict[str, List[_SessionEntry]]:
+    """
+    Pick the sessions to evict, oldest first, policy by policy
+
+    1. ``age``: sessions not modified in ``max_age_days``
+    2. ``user_quota``: a user's oldest sessions until they fit in
+       ``user_quota_bytes``; their most recent session is always kept
+    3. ``disk_budget``: the oldest remaining sessions until the total fits
+       in ``disk_budget_bytes``
+
+    A policy set to None is skipped. Pinned sessions count toward quotas
+    and the budget but are never selected.
+
+    Returns:
+        Sessions to evict, keyed by the policy that selected them
+    """
+    evictions: Dict[str, List[_SessionEntry]] = {"age": [], "user_quota": [], "disk_budget": []}
+    remaining = sorted(entries, key=lambda e: e.mtime_ns)
+
+    if max_age_days is not None:
+        cutoff_ns = int((now - max_age_days * 86400) * 1e9)
+        evictions["age"] = [e for e in remaining if e.mtime_ns < cutoff_ns and not e.pinned]
+        remaining = [e for e in remaining if e.mtime_ns >= cutoff_ns or e.pinned]
+
+    if user_quota_bytes is not None:
+        by_user: Dict[str, List[_SessionEntry]] = {}
+        for e in remaining:
+            by_user.setdefault(e.user_id, []).append(e)
+
+        evicted = set()
+        for user_entries in by_user.values():
+            used = sum(e.size for e in user_entries)
+            for e in user_entries[:-1]:
+                if used <= user_quota_bytes:
+                    break
+                if e.pinned:
+                    continue
+                evictions["user_quota"].append(e)
+                evicted.add(e.session_id)
+                used -= e.size
+        remaining = [e for e in remaining if e.session_id not in evicted]
+
+    if disk_budget_bytes is not None:
+        used = sum(e.size for e in remaining)
+        for e in remaining:
+            if used <= disk_budget_bytes:
+                break
+            if e.pinned:
+                continue
+            evictions["disk_budget"].append(e)
+            used -= e.size
+
+    return evictions
+
+
+def _delete_unchanged(
+    evictions: Dict[str, List[_SessionEntry]]
+) -> List[Tuple[str, _SessionEntry]]:
+    """Unlink selected logs not modified since the scan; returns (policy, entry) pairs"""
+    deleted = []
+    for policy, victims in evictions.items():
+        for e in victims:
+            try:
+                if os.stat(e.path).st_mtime_ns != e.mtime_ns:
+                    continue
+                os.unlink(e.path)
+                summary_file = os.path.join(os.path.dirname(e.path), e.session_id + SUMMARY_SUFFIX)
+                if os.path.exists(summary_file):
+                    os.unlink(summary_file)
+            except FileNotFoundError:
+                continue
+            except Exception as ex:
+                logger.warning(f"Retention failed for {e.session_id}: {ex}")
+                continue
+            deleted.append((policy, e))
+    return deleted
+
+
+class SessionRetention:
+    """Evict session logs by age, per-user byte quota and total disk budget
+
+    The directory scan and policy selection run in a worker thread. Each
+    deletion happens with the session writer paused, and only if the log was
+    not modified since the scan. Sessions held in the SessionManager cache
+    are live and never evicted.
+    """
+
+    def __init__(
+        self,
+        session_manager: SessionManager,
+        max_age_days: Optional[float] = 30,
+        user_quota_mb: Optional[float] = None,
+        disk_budget_mb: Optional[float] = None,
+    ):
+        self.session_manager = session_manager
+        self.max_age_days = max_age_days
+        self.user_quota_bytes = int(user_quota_mb * MB) if user_quota_mb else None
+        self.disk_budget_bytes = int(disk_budget_mb * MB) if disk_budget_mb else None
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    def _scan(self) -> List[_SessionEntry]:
+        """Stat all logs and attach their owner (from the catalog when available)"""
+        entries = scan_sessions(self.session_manager.sessions_dir)
+        if self.user_quota_bytes is None:
+            return entries
+
+        catalog = self.session_manager.catalog
+        owners = catalog.user_ids() if catalog is not None else {}
+        for e in entries:
+            user_id = owners.get(e.session_id)
+            if user_id is None:
+                header = read_first_record(Path(e.path)) or {}
+                user_id = header.get("user_id", "")
+            e.user_id = user_id
+        return entries
+
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Apply all retention policies once
+
+        Returns:
+            Report with sessions scanned, evictions per policy, bytes freed,
+            bytes remaining, scan seconds and total elapsed seconds
+        """
+        started = time.perf_counter()
+        await self.session_manager.flush()
+
+        entries = await asyncio.to_thread(self._scan)
+        for e in entries:
+            e.pinned = self.session_manager.is_cached(e.session_id)
+        scan_seconds = time.perf_counter() - started
+
+        evictions = await asyncio.to_thread(
+            select_evictions,
+            entries,
+            time.time(),
+            self.max_age_days,
+            self.user_quota_bytes,
+            self.disk_budget_bytes,
+        )
+
+        report = {
+            "scanned": len(entries),
+            "evicted": {policy: 0 for policy in evictions},
+            "bytes_freed": 0,
+            "bytes_remaining": sum(e.size for e in entries),
+            "scan_seconds": round(scan_seconds, 3),
+            "seconds": 0.0,
+        }
+
+        async with self.session_manager.writer().paused():
+            deleted = await asyncio.to_thread(_delete_unchanged, evictions)
+            # Only the deletes run in the thread: forget() mutates the manager's
+            # cache, which belongs to the event loop
+            self.session_manager.forget(*(e.session_id for _, e in deleted))
+
+        for policy, e in deleted:
+            report["evicted"][policy] += 1
+            report["bytes_freed"] += e.size
+            report["bytes_remaining"] -= e.size
+
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        self.last_report = report
+        logger.info(
+            f"Session retention: {report['scanned']} scanned in {report['scan_seconds']}s, "
+            f"evicted {report['evicted']}, {report['bytes_freed']} bytes freed, "
+            f"{report['bytes_remaining']} bytes remaining"
+        )
+        return report
+
+    async def scheduled_retention(self, interval_hours: float = 24):
+        """Run retention on startup and then on schedule"""
+        while True:
+            try:
+                await self.run_once()
+                await asyncio.sleep(interval_hours * 3600)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduled retention error: {e}")
+                await asyncio.sleep(60)
@@ -0,0 +1,208 @@
+"""Full-text search over conversation history (SQLite FTS5 inverted index)"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+from app.cloud.sessions import (
+    COMPRESSED_SUFFIX,
+    LOG_SUFFIX,
+    iter_live_records,
+    session_id_from_path,
+)
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+# unicode61 with remove_diacritics folds case and accents ("acción" == "accion")
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content,
+    session_id UNINDEXED,
+    seq UNINDEXED,
+    role UNINDEXED,
+    timestamp UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS message_sessions (
+    fts_rowid INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_message_sessions ON message_sessions (session_id);
+"""
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 query
+
+    Every word must match; the last word also matches as a prefix so
+    partially typed queries still find results.
+    """
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return ""
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SessionSearchIndex:
+    """Inverted index over message contents, kept in sync by SessionManager
+
+    Messages are indexed as they are saved; ``rebuild`` re-derives the index
+    from the session logs and runs automatically for a new index database.
+    FTS5 cannot index the ``session_id`` column, so ``message_sessions``
+    maps each session to its FTS rows and removals do not scan the table.
+    """
+
+    def __init__(self, db_path: str | Path, sessions_dir: str | Path):
+        self.db_path = Path(db_path)
+        self.sessions_dir = Path(sessions_dir)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.db_path.exists()
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        has_map = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'message_sessions'"
+        ).fetchone()
+        self._conn.executescript(_SCHEMA)
+        if not has_map:
+            # Index created before the session map existed: fill it once
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO message_sessions (fts_rowid, session_id) "
+                    "SELECT rowid, session_id FROM messages_fts"
+                )
+
+        if is_new:
+            self.rebuild()
+
+    def add_messages(self, session_id: str, start_seq: int, messages: Iterable[Any]) -> None:
+        """Index messages of a session starting at sequence number start_seq"""
+        rows = [
+            (data["content"], session_id, seq, data["role"], data["timestamp"])
+            for seq, data in enumerate((msg.to_dict() for msg in messages), start=start_seq)
+        ]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._insert(rows)
+
+    def _insert(self, rows: Iterable[tuple]) -> int:
+        """Insert (content, session_id, seq, role, timestamp) rows and map them"""
+        (last,) = self._conn.execute("SELECT MAX(fts_rowid) FROM message_sessions").fetchone()
+        numbered = [(rowid, *row) for rowid, row in enumerate(rows, start=(last or 0) + 1)]
+        self._conn.executemany(
+            "INSERT INTO messages_fts (rowid, content, session_id, seq, role, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            numbered,
+        )
+        self._conn.executemany(
+            "INSERT INTO message_sessions (fts_rowid, session_id) VALUES (?, ?)",
+            ((row[0], row[2]) for row in numbered),
+        )
+        return len(numbered)
+
+    def remove_session(self, session_id: str) -> None:
+        """Drop every indexed message of a session"""
+        self.remove_sessions([session_id])
+
+    def remove_sessions(self, session_ids: Iterable[str]) -> None:
+        """Drop every indexed message of many sessions (sessions never indexed cost a lookup)"""
+        with self._lock, self._conn:
+            for session_id in session_ids:
+                rowids = self._conn.execute(
+                    "SELECT fts_rowid FROM message_sessions WHERE session_id = ?", (session_id,)
+                ).fetchall()
+                if not rowids:
+                    continue
+                self._conn.executemany("DELETE FROM messages_fts WHERE rowid = ?", rowids)
+                self._conn.execute(
+                    "DELETE FROM message_sessions WHERE session_id = ?", (session_id,)
+                )
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Ranked message hits for a free-text query
+
+        Returns:
+            Dicts with session_id, seq, role, timestamp, snippet and score
+            (higher is better), best first
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, seq, role, timestamp, "
+                "snippet(messages_fts, 0, '[', ']', '…', 12) AS snippet, "
+                "bm25(messages_fts) AS rank "
+                "FROM messages_fts WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit),
+            ).fetchall()
+
+        return [
+            {
+                "session_id": row["session_id"],
+                "seq": row["seq"],
+                "role": row["role"],
+                "timestamp": row["timestamp"],
+                "snippet": row["snippet"],
+                "score": round(-row["rank"], 4),
+            }
+            for row in rows
+        ]
+
+    def rebuild(self) -> int:
+        """
+        Re-index every session log on disk
+
+        Returns:
+            Number of messages indexed
+        """
+        started = time.perf_counter()
+        indexed = 0
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages_fts")
+            self._conn.execute("DELETE FROM message_sessions")
+
+            if self.sessions_dir.exists():
+                with os.scandir(self.sessions_dir) as it:
+                    for entry in it:
+                        if not entry.name.endswith((LOG_SUFFIX, COMPRESSED_SUFFIX)):
+                            continue
+                        session_file = Path(entry.path)
+                        session_id = session_id_from_path(session_file)
+                        try:
+                            records = iter_live_records(session_file)
+                            next(records, None)
+                            rows = (
+                                (m["content"], session_id, seq, m["role"], m.get("timestamp"))
+                                for seq, m in enumerate(records)
+                            )
+                            indexed += self._insert(rows)
+                        except Exception as e:
+                            logger.warning(f"Skipping session {entry.name} in search index: {e}")
+
+        logger.info(
+            f"Search index rebuilt: {indexed} messages in {time.perf_counter() - started:.2f}s"
+        )
+        return indexed
+
+    def close(self) -> None:
+        """Close the index database"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,288 @@
+"""Group-commit writer - one task per sessions directory owns all log appends"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from app.utils import get_logger
+from app.utils.serializer import MSGPACK_MAGIC
+
+logger = get_logger(__name__)
+
+FSYNC_POLICIES = ("none", "interval", "always")
+
+
+def _ends_mid_line(path: Path) -> bool:
+    """Whether a JSONL log ends in a partial line (e.g. a crash mid-append)"""
+    with open(path, "rb") as f:
+        if f.read(len(MSGPACK_MAGIC)) == MSGPACK_MAGIC:
+            return False
+        f.seek(-1, 2)
+        return f.read(1) != b"\n"
+
+
+@dataclass
+class _Append:
+    session_id: str
+    data: bytes
+    future: asyncio.Future
+    preamble: bytes = b""
+
+
+@dataclass
+class _WriterStats:
+    commits: int = 0
+    appends: int = 0
+    bytes_written: int = 0
+    fsyncs: int = 0
+    last_commit_ms: float = 0.0
+    max_commit_ms: float = 0.0
+    total_commit_ms: float = 0.0
+    largest_batch: int = 0
+    errors: int = 0
+
+
+class SessionWriter:
+    """Serialize and batch appends to the session logs of one directory
+
+    Callers ``await append(session_id, text)``; the writer task drains every
+    pending append into a single group commit, written in a worker thread
+    with one write per session file. File handles stay open between commits
+    (bounded by ``max_open_files``).
+
+    Fsync policies:
+        none      - flush to the OS only
+        interval  - fsync touched files at most every ``fsync_interval`` seconds
+        always    - fsync touched files on every commit
+
+    Use ``paused()`` around operations that replace or delete log files
+    (compaction, cleanup) so no commit runs and no stale handle is kept.
+    """
+
+    def __init__(
+        self,
+        sessions_dir: str | Path,
+        fsync_policy: str = "interval",
+        fsync_interval: float = 1.0,
+        max_batch: int = 512,
+        max_open_files: int = 64,
+    ):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+
+        self.sessions_dir = Path(sessions_dir)
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.max_batch = max_batch
+        self.max_open_files = max_open_files
+
+        self.loop = asyncio.get_running_loop()
+        self._queue: "asyncio.Queue[_Append]" = asyncio.Queue()
+        self._commit_lock = asyncio.Lock()
+        self._handles: "OrderedDict[str, Any]" = OrderedDict()
+        self._unsynced: set = set()
+        self._torn: set = set()
+        self._last_fsync = time.monotonic()
+        self._stats = _WriterStats()
+        self.closed = False
+        self._task = asyncio.create_task(self._run())
+
+    async def append(self, session_id: str, data: bytes, preamble: bytes = b"") -> int:
+        """
+        Append bytes to a session log and wait for its group commit
+
+        ``preamble`` is written first if the log is still empty at commit
+        time (e.g. a binary format's magic bytes).
+
+        Returns:
+            Size of the log file after the commit
+        """
+        if self.closed:
+            raise RuntimeError(f"Session writer for {self.sessions_dir} is closed")
+        future = self.loop.create_future()
+        await self._queue.put(_Append(session_id, data, future, preamble))
+        return await future
+
+    @property
+    def queue_depth(self) -> int:
+        """Appends waiting for the next commit"""
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and commit latency counters"""
+        s = self._stats
+        return {
+            "sessions_dir": str(self.sessions_dir),
+            "fsync_policy": self.fsync_policy,
+            "queue_depth": self.queue_depth,
+            "open_files": len(self._handles),
+            "commits": s.commits,
+            "appends": s.appends,
+            "bytes_written": s.bytes_written,
+            "fsyncs": s.fsyncs,
+            "largest_batch": s.largest_batch,
+            "errors": s.errors,
+            "last_commit_ms": round(s.last_commit_ms, 3),
+            "max_commit_ms": round(s.max_commit_ms, 3),
+            "avg_commit_ms": round(s.total_commit_ms / s.commits, 3) if s.commits else 0.0,
+        }
+
+    @asynccontextmanager
+    async def paused(self):
+        """Block commits and close all handles while log files are swapped"""
+        async with self._commit_lock:
+            await asyncio.to_thread(self._close_handles)
+            yield
+
+    async def close(self) -> None:
+        """Commit everything still queued, fsync and close all handles"""
+        if self.closed:
+            return
+        self.closed = True
+        await self._queue.join()
+        async with self._commit_lock:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            await asyncio.to_thread(self._close_handles)
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            async with self._commit_lock:
+                started = time.perf_counter()
+                try:
+                    sizes = await asyncio.to_thread(self._commit, batch)
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_result(sizes[item.session_id])
+                except Exception as e:
+                    self._stats.errors += 1
+                    logger.error(f"Session commit failed ({len(batch)} appends): {e}")
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+
+                for _ in batch:
+                    self._queue.task_done()
+
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self._stats.commits += 1
+                self._stats.appends += len(batch)
+                self._stats.last_commit_ms = elapsed_ms
+                self._stats.total_commit_ms += elapsed_ms
+                self._stats.max_commit_ms = max(self._stats.max_commit_ms, elapsed_ms)
+                self._stats.largest_batch = max(self._stats.largest_batch, len(batch))
+
+    def _commit(self, batch: List[_Append]) -> Dict[str, int]:
+        """Write one group commit (runs in a worker thread)"""
+        # Keep per-session order; one write per file
+        pending: Dict[str, List[_Append]] = {}
+        for item in batch:
+            pending.setdefault(item.session_id, []).append(item)
+
+        sizes: Dict[str, int] = {}
+        touched: List[Tuple[str, Any]] = []
+        for session_id, items in pending.items():
+            handle = self._handle(session_id)
+            data = b"".join(item.data for item in items)
+            if handle.tell() == 0:
+                data = items[0].preamble + data
+            elif session_id in self._torn:
+                # Don't glue the first record onto a partial last line
+                data = b"\n" + data
+            self._torn.discard(session_id)
+            handle.write(data)
+            handle.flush()
+            sizes[session_id] = handle.tell()
+            self._stats.bytes_written += len(data)
+            touched.append((session_id, handle))
+
+        if self.fsync_policy == "always":
+            for _, handle in touched:
+                os.fsync(handle.fileno())
+                self._stats.fsyncs += 1
+        elif self.fsync_policy == "interval":
+            self._unsynced.update(session_id for session_id, _ in touched)
+            if time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._fsync_unsynced()
+
+        return sizes
+
+    def _handle(self, session_id: str):
+        handle = self._handles.get(session_id)
+        if handle is None:
+            while len(self._handles) >= self.max_open_files:
+                old_id, old_handle = self._handles.popitem(last=False)
+                self._close_handle(old_id, old_handle)
+            self.sessions_dir.mkdir(parents=True, exist_ok=True)
+            path = self.sessions_dir / f"{session_id}.jsonl"
+            handle = open(path, "ab")
+            self._handles[session_id] = handle
+            if handle.tell() > 0 and _ends_mid_line(path):
+                self._torn.add(session_id)
+        else:
+            self._handles.move_to_end(session_id)
+        return handle
+
+    def _fsync_unsynced(self) -> None:
+        for session_id in self._unsynced:
+            handle = self._handles.get(session_id)
+            if handle is not None:
+                os.fsync(handle.fileno())
+                self._stats.fsyncs += 1
+        self._unsynced.clear()
+        self._last_fsync = time.monotonic()
+
+    def _close_handle(self, session_id: str, handle: Any) -> None:
+        if self.fsync_policy != "none" and session_id in self._unsynced:
+            os.fsync(handle.fileno())
+            self._stats.fsyncs += 1
+            self._unsynced.discard(session_id)
+        handle.close()
+
+    def _close_handles(self) -> None:
+        while self._handles:
+            session_id, handle = self._handles.popitem()
+            self._close_handle(session_id, handle)
+        self._unsynced.clear()
+
+
+_writers: Dict[Path, SessionWriter] = {}
+
+
+def get_session_writer(sessions_dir: str | Path, **options) -> SessionWriter:
+    """
+    Writer owning a sessions directory (created on first use)
+
+    ``options`` are passed to SessionWriter when the writer is created. Must
+    be called from a running event loop.
+    """
+    key = Path(sessions_dir).resolve()
+    writer = _writers.get(key)
+    if writer is None or writer.closed or writer.loop is not asyncio.get_running_loop():
+        writer = _writers[key] = SessionWriter(key, **options)
+    return writer
+
+
+async def close_session_writers() -> None:
+    """Flush and close every session writer (call on shutdown)"""
+    for key, writer in list(_writers.items()):
+        if writer.loop is asyncio.get_running_loop():
+            await writer.close()
+        _writers.pop(key, None)
+
+
+def session_writer_stats() -> List[Dict[str, Any]]:
+    """Stats of all live session writers"""
+    return [writer.stats() for writer in _writers.values()]
@@ -1,69 +1,578 @@
-"""Session management - persist and load conversations"""
+"""Session management - persist and load conversations
 
+Sessions are stored as append-only JSONL logs in ``data/sessions``. Each file
+starts with a small header record and is followed by one record per message,
+so a save only writes the messages added since the previous save:
+
+    {"kind": "header", "format": 2, "session_id": ..., "user_id": ..., ...}
+    {"kind": "message", "seq": 0, "role": "user", "content": ..., ...}
+    {"kind": "message", "seq": 1, "role": "assistant", "content": ..., ...}
+
+A later header record resets the session (used when a context is rewritten
+from scratch). Files written before this format contain one full
+``AgentContext.to_dict()`` snapshot per line; they are still readable and can
+be converted with ``migrate_session_file`` / ``scripts/migrate_sessions.py``.
+
+Records are encoded with the serializer selected by ``session_serializer``
+(see ``app.utils.serializer``): JSON lines via stdlib json or orjson, or
+length-framed msgpack. The format is detected per file on read, and appends
+always keep the format a file was created with.
+
+Cold sessions may be gzip-compressed to ``<session_id>.jsonl.gz`` by the
+compaction job; every reader here accepts either form, and the next save of a
+compressed session restores the plain log before appending.
+
+The rolling summary of older turns (see ``app.core.summarizer``) lives next
+to the log in ``<session_id>.summary.json`` and is attached to
+``ctx.state["summary"]`` on load.
+"""
+
+import asyncio
+import gzip
 import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import TYPE_CHECKING, BinaryIO, Optional, Dict, Any, List, Iterable, Iterator
 
+from app.config import Settings
+from app.cloud.session_writer import SessionWriter, get_session_writer
 from app.core.context import AgentContext
 from app.utils import get_logger
+from app.utils.serializer import JsonSerializer, detect_serializer, get_serializer, json_loads
+
+if TYPE_CHECKING:
+    from app.cloud.session_catalog import SessionCatalog
+    from app.cloud.session_search import SessionSearchIndex
 
 logger = get_logger(__name__)
 
+SESSION_FORMAT = 2
+
+LOG_SUFFIX = ".jsonl"
+COMPRESSED_SUFFIX = ".jsonl.gz"
+SUMMARY_SUFFIX = ".summary.json"
+
+
+def session_id_from_path(session_file: Path) -> str:
+    """Session id for a plain or compressed session log"""
+    name = session_file.name
+    for suffix in (COMPRESSED_SUFFIX, LOG_SUFFIX):
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return session_file.stem
+
+
+def is_compressed(session_file: Path) -> bool:
+    """Check whether a session log is gzip-compressed"""
+    return session_file.name.endswith(COMPRESSED_SUFFIX)
+
+
+def open_session_log(session_file: Path) -> BinaryIO:
+    """Open a plain or gzip-compressed session log for binary reading"""
+    if is_compressed(session_file):
+        return gzip.open(session_file, "rb")
+    return open(session_file, "rb")
+
+
+def log_serializer(session_file: Path):
+    """Serializer an existing session log was written with"""
+    with open_session_log(session_file) as f:
+        return detect_serializer(f)
+
+
+def _header_record(ctx: AgentContext) -> Dict[str, Any]:
+    """Header written at the start of a session log (or on reset)"""
+    return {
+        "kind": "header",
+        "format": SESSION_FORMAT,
+        "session_id": ctx.session_id,
+        "user_id": ctx.user_id,
+        "channel": ctx.channel,
+        "started_at": ctx.started_at.isoformat(),
+    }
+
+
+def _message_record(msg: Any, seq: int) -> Dict[str, Any]:
+    """Delta record for a single message"""
+    return {"kind": "message", "seq": seq, **msg.to_dict()}
 
-class SessionManager:
-    """Manage conversation sessions"""
 
-    def __init__(self, data_dir: str = "./data"):
+def encode_session_log(ctx: AgentContext, serializer=None) -> Iterable[bytes]:
+    """Yield the bytes of a compact delta-format log holding the whole context"""
+    serializer = serializer or JsonSerializer()
+    yield serializer.preamble
+    yield serializer.encode([_header_record(ctx)])
+    for seq, msg in enumerate(ctx.messages):
+        yield serializer.encode([_message_record(msg, seq)])
+
+
+def replay_records(records: Iterable[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Rebuild the live session state from log records
+
+    Accepts both delta records and legacy full snapshots, so files that mix
+    the two formats replay correctly.
+
+    Returns:
+        Dict shaped like ``AgentContext.to_dict()``, or None if empty
+    """
+    state: Optional[Dict[str, Any]] = None
+
+    for record in records:
+        kind = record.get("kind")
+
+        if kind == "header":
+            state = {
+                "session_id": record["session_id"],
+                "user_id": record["user_id"],
+                "channel": record["channel"],
+                "messages": [],
+                "started_at": record.get("started_at"),
+            }
+        elif kind == "message":
+            if state is None:
+                raise ValueError("message record before session header")
+            msg = {k: v for k, v in record.items() if k not in ("kind", "seq")}
+            state["messages"].append(msg)
+        elif kind is None and "session_id" in record:
+            # Legacy snapshot line: the full context at save time
+            state = dict(record)
+            state["messages"] = list(record.get("messages", []))
+        else:
+            logger.warning(f"Skipping unknown session record: {kind}")
+
+    return state
+
+
+def read_records(session_file: Path) -> Iterator[Dict[str, Any]]:
+    """Yield parsed records from a session log in any supported format"""
+    with open_session_log(session_file) as f:
+        yield from detect_serializer(f).iter_records(f)
+
+
+def read_first_record(session_file: Path) -> Optional[Dict[str, Any]]:
+    """Read the first record of a session log"""
+    records = read_records(session_file)
+    try:
+        return next(records, None)
+    finally:
+        records.close()
+
+
+def read_last_record(session_file: Path) -> Optional[Dict[str, Any]]:
+    """
+    Read the last record of a session log by seeking backwards from the end
+
+    Cost is bounded by the size of the last record, not the file. Compressed
+    logs cannot be seeked and are streamed instead.
+    """
+    if is_compressed(session_file):
+        last = None
+        for last in read_records(session_file):
+            pass
+        return last
+
+    with open(session_file, "rb") as f:
+        return detect_serializer(f).read_last(f)
+
+
+def read_session_state(session_file: Path) -> Optional[Dict[str, Any]]:
+    """Read a session log (any format) and return its live state"""
+    last = read_last_record(session_file)
+    if last is None:
+        return None
+
+    # A trailing legacy snapshot already is the live state
+    if last.get("kind") is None and "session_id" in last:
+        return last
+
+    return replay_records(read_records(session_file))
+
+
+def read_session_summary(session_file: Path) -> Optional[Dict[str, Any]]:
+    """
+    Summarize a session log from its first and last records only
+
+    Delta records carry their sequence number, so the message count comes
+    from the tail without replaying the file.
+
+    Returns:
+        Dict with session_id, user_id, channel, message_count and started_at
+    """
+    last = read_last_record(session_file)
+    if last is None:
+        return None
+
+    kind = last.get("kind")
+    if kind is None:
+        head = last
+        message_count = len(last.get("messages", []))
+    else:
+        head = last if kind == "header" else read_first_record(session_file)
+        message_count = last["seq"] + 1 if kind == "message" else 0
+
+    return {
+        "session_id": head["session_id"],
+        "user_id": head["user_id"],
+        "channel": head["channel"],
+        "message_count": message_count,
+        "started_at": head.get("started_at"),
+    }
+
+
+def migrate_session_file(session_file: Path, serializer=None) -> bool:
+    """
+    Convert a snapshot-style session log to the delta format in place
+
+    The file is rewritten to a temp file and atomically renamed, so a crash
+    mid-migration leaves the original intact.
+
+    Returns:
+        True if the file was rewritten, False if it was already migrated
+    """
+    first = read_first_record(session_file)
+    if first is None or first.get("kind") == "header":
+        return False
+
+    state = read_session_state(session_file)
+    ctx = AgentContext.from_dict(state)
+
+    tmp_file = session_file.with_name(session_file.name + ".tmp")
+    with open(tmp_file, "wb") as f:
+        f.writelines(encode_session_log(ctx, serializer))
+
+    os.replace(tmp_file, session_file)
+    return True
+
+
+EXPORT_FORMATS = ("json", "csv")
+
+# Target size of the text chunks yielded by iter_export
+_EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def _live_segment_start(session_file: Path) -> int:
+    """Index of the record the live state starts at (last header or snapshot)"""
+    start = 0
+    for index, record in enumerate(read_records(session_file)):
+        if record.get("kind") != "message":
+            start = index
+    return start
+
+
+def iter_live_records(session_file: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the live state of a session log with constant memory
+
+    Yields the session head (session_id, user_id, channel, started_at) first,
+    then one dict per message. Records before the last reset are skipped.
+    """
+    start = _live_segment_start(session_file)
+
+    for index, record in enumerate(read_records(session_file)):
+        if index < start:
+            continue
+
+        kind = record.get("kind")
+        if kind == "message":
+            yield {k: v for k, v in record.items() if k not in ("kind", "seq")}
+        elif kind == "header":
+            yield {k: record.get(k) for k in ("session_id", "user_id", "channel", "started_at")}
+        elif kind is None and "session_id" in record:
+            yield {k: record.get(k) for k in ("session_id", "user_id", "channel", "started_at")}
+            yield from record.get("messages", [])
+
+
+def iter_export(records: Iterator[Dict[str, Any]], format: str = "json") -> Iterator[str]:
+    """
+    Render streamed session records as a JSON array or CSV, chunk by chunk
+
+    ``records`` is the head followed by messages, as yielded by
+    ``iter_live_records``. Output is produced incrementally, so memory use
+    does not depend on the session size.
+    """
+    head = next(records, None)
+    if head is None:
+        return
+
+    def render() -> Iterator[str]:
+        if format == "json":
+            yield "[" + json.dumps(head)[:-1] + ', "messages": ['
+            separator = "\n"
+            for msg in records:
+                yield separator + json.dumps(msg)
+                separator = ",\n"
+            yield "\n]}]\n"
+
+        elif format == "csv":
+            import csv
+            import io
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(["timestamp", "role", "content"])
+
+            for msg in records:
+                timestamp = msg.get("timestamp", head.get("started_at"))
+                writer.writerow([timestamp, msg["role"], msg["content"][:100]])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+
+        else:
+            raise ValueError(f"Unknown export format: {format}")
+
+    pending: List[str] = []
+    pending_size = 0
+    for piece in render():
+        pending.append(piece)
+        pending_size += len(piece)
+        if pending_size >= _EXPORT_CHUNK_SIZE:
+            yield "".join(pending)
+            pending, pending_size = [], 0
+    if pending:
+        yield "".join(pending)
+
+
+def create_session_manager(settings: Settings, data_dir: str = "./data") -> "SessionManager":
+    """Build the session backend selected by ``settings.session_backend``"""
+    backend = settings.session_backend.lower()
+    options = {
+        "cache_size": settings.session_cache_size,
+        "cache_idle_seconds": settings.session_cache_idle_seconds,
+        "flush_interval": settings.session_flush_interval,
+        "fsync_policy": settings.session_fsync_policy,
+        "fsync_interval": settings.session_fsync_interval,
+        "serializer": settings.session_serializer,
+    }
+
+    if backend == "sqlite":
+        from app.cloud.sessions_sqlite import SqliteSessionManager
+        return SqliteSessionManager(
+            data_dir=data_dir, db_path=settings.sessions_db_path, **options
+        )
+    if backend != "jsonl":
+        raise ValueError(f"Unknown session backend: {settings.session_backend}")
+
+    return SessionManager(data_dir=data_dir, **options)
+
+
+@dataclass
+class _CachedSession:
+    """Live context held in the session cache"""
+
+    ctx: AgentContext
+    dirty: bool = False
+    last_access: float = 0.0
+
+
+class SessionManager:
+    """Manage conversation sessions
+
+    With ``cache_size > 0`` live contexts are kept in a bounded LRU cache:
+    ``load_session`` is served from memory and ``save_session`` only marks the
+    session dirty. ``run_flusher`` writes dirty sessions in batches every
+    ``flush_interval`` seconds and evicts sessions idle for longer than
+    ``cache_idle_seconds``; ``close`` flushes whatever is left.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "./data",
+        cache_size: int = 0,
+        cache_idle_seconds: float = 1800,
+        flush_interval: float = 5,
+        fsync_policy: str = "interval",
+        fsync_interval: float = 1.0,
+        serializer: str = "orjson",
+    ):
         self.data_dir = Path(data_dir)
         self.sessions_dir = self.data_dir / "sessions"
         self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        # Messages already on disk per session, so saves only append the delta
+        self._persisted: Dict[str, int] = {}
+
+        self.cache_size = cache_size
+        self.cache_idle_seconds = cache_idle_seconds
+        self.flush_interval = flush_interval
+        self._cache: "OrderedDict[str, _CachedSession]" = OrderedDict()
+
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+
+        # New logs use the configured serializer; existing logs keep theirs
+        self.serializer = get_serializer(serializer)
+        self._serializers: Dict[str, Any] = {}
+        self._index_lock = asyncio.Lock()
+
+        self.catalog = self._open_catalog()
+        self.search_index = self._open_search_index()
 
     async def save_session(self, ctx: AgentContext) -> bool:
-        """Save session to JSONL file"""
+        """Save session (deferred to the flusher when the cache is enabled)"""
+        if self.cache_size <= 0:
+            return await self._write_session(ctx)
+
+        self._cache_put(ctx, dirty=True)
+        await self._evict_overflow()
+        return True
+
+    async def load_session(self, session_id: str) -> Optional[AgentContext]:
+        """Load session from the cache, falling back to storage"""
+        cached = self._cache.get(session_id)
+        if cached is not None:
+            cached.last_access = time.monotonic()
+            self._cache.move_to_end(session_id)
+            return cached.ctx
+
+        ctx = await self._read_session(session_id)
+        if ctx is None:
+            return None
+
+        summary = await self.load_summary(session_id)
+        if summary is not None:
+            ctx.state["summary"] = summary
+        if self.cache_size > 0:
+            self._cache_put(ctx, dirty=False)
+            await self._evict_overflow()
+        return ctx
+
+    async def load_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Rolling summary of a session (text, upto, updated_at), if any"""
         try:
-            session_file = self.sessions_dir / f"{ctx.session_id}.jsonl"
+            return await asyncio.to_thread(self._read_summary, session_id)
+        except Exception as e:
+            logger.error(f"Error loading summary: {e}")
+            return None
+
+    async def save_summary(self, session_id: str, summary: Dict[str, Any]) -> bool:
+        """Replace the rolling summary of a session"""
+        try:
+            await asyncio.to_thread(self._write_summary, session_id, summary)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving summary: {e}")
+            return False
 
-            # Append session context as JSON line
-            with open(session_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(ctx.to_dict()) + "\n")
+    async def flush(self) -> int:
+        """
+        Write all dirty cached sessions to storage
+
+        Returns:
+            Number of sessions written
+        """
+        written = 0
+
+        for session_id, entry in list(self._cache.items()):
+            if not entry.dirty:
+                continue
+            entry.dirty = False
+            if await self._write_session(entry.ctx):
+                written += 1
+            else:
+                entry.dirty = True
+
+        if written:
+            logger.debug(f"Flushed {written} sessions")
+        return written
+
+    async def run_flusher(self) -> None:
+        """Periodically flush dirty sessions and evict idle ones"""
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+                await self._evict_idle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Session flusher error: {e}")
+
+    async def _write_session(self, ctx: AgentContext) -> bool:
+        """Append messages added since the last save to the session log"""
+        try:
+            session_file = self.sessions_dir / f"{ctx.session_id}{LOG_SUFFIX}"
+            compressed_file = self.sessions_dir / f"{ctx.session_id}{COMPRESSED_SUFFIX}"
+            if not session_file.exists() and compressed_file.exists():
+                self._decompress(compressed_file, session_file)
+
+            persisted = self._persisted.get(ctx.session_id)
+            reset = persisted is None or persisted > len(ctx.messages)
+            start = 0 if reset else persisted
+
+            records = [_header_record(ctx)] if reset else []
+            records.extend(
+                _message_record(ctx.messages[seq], seq) for seq in range(start, len(ctx.messages))
+            )
 
-            logger.info(f"Session saved: {ctx.session_id}")
+            # Claim the delta before awaiting the commit so a concurrent save
+            # of the same context does not append it twice
+            self._persisted[ctx.session_id] = len(ctx.messages)
+
+            if records:
+                serializer = self._log_serializer(ctx.session_id, session_file)
+                size_bytes = await self.writer().append(
+                    ctx.session_id, serializer.encode(records), preamble=serializer.preamble
+                )
+
+                entry = {
+                    "session_id": ctx.session_id,
+                    "user_id": ctx.user_id,
+                    "channel": ctx.channel,
+                    "message_count": len(ctx.messages),
+                    "started_at": ctx.started_at.isoformat(),
+                    "last_modified": time.time(),
+                    "size_bytes": size_bytes,
+                }
+                # SQLite work stays off the event loop; the lock keeps saves in order
+                async with self._index_lock:
+                    await asyncio.to_thread(
+                        self._record_save, entry, start, ctx.messages[start:], reset
+                    )
+
+            logger.info(f"Session saved: {ctx.session_id} (+{len(ctx.messages) - start} messages)")
             return True
 
         except Exception as e:
+            # Unknown on-disk state: the next save rewrites the session from a header
+            self._persisted.pop(ctx.session_id, None)
             logger.error(f"Error saving session: {e}")
             return False
 
-    async def load_session(self, session_id: str) -> Optional[AgentContext]:
+    def _record_save(
+        self, entry: Dict[str, Any], start: int, messages: List[Any], replace: bool
+    ) -> None:
+        """Update the catalog and search index after a save (runs in a thread)"""
+        self.catalog.upsert(entry)
+        if self.search_index is not None:
+            if replace:
+                # Rewritten from a header: drop earlier rows (a new session has none)
+                self.search_index.remove_session(entry["session_id"])
+            self.search_index.add_messages(entry["session_id"], start, messages)
+
+    async def _read_session(self, session_id: str) -> Optional[AgentContext]:
         """Load session from file"""
         try:
-            session_file = self.sessions_dir / f"{session_id}.jsonl"
+            session_file = self._session_file(session_id)
 
             if not session_file.exists():
                 logger.info(f"No existing session: {session_id}")
                 return None
 
-            # Read last line (most recent state)
-            with open(session_file, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-
-            if not lines:
+            data = read_session_state(session_file)
+            if not data:
                 return None
 
-            last_line = lines[-1].strip()
-            data = json.loads(last_line)
-
-            # Reconstruct context
-            ctx = AgentContext(
-                session_id=data["session_id"],
-                user_id=data["user_id"],
-                channel=data["channel"],
-            )
+            ctx = AgentContext.from_dict(data)
 
-            # Restore messages
-            for msg_data in data.get("messages", []):
-                ctx.add_message(msg_data["role"], msg_data["content"])
+            # Only trust the on-disk count for delta-format logs; legacy files
+            # get a fresh header on the next save
+            if self._is_delta_log(session_file):
+                self._persisted[session_id] = len(ctx.messages)
 
             logger.info(f"Session loaded: {session_id} ({len(ctx.messages)} messages)")
             return ctx
@@ -72,34 +581,88 @@ class SessionManager:
             logger.error(f"Error loading session: {e}")
             return None
 
+    def writer(self) -> SessionWriter:
+        """Group-commit writer owning this sessions directory"""
+        return get_session_writer(
+            self.sessions_dir,
+            fsync_policy=self.fsync_policy,
+            fsync_interval=self.fsync_interval,
+        )
+
+    def is_cached(self, session_id: str) -> bool:
+        """Check whether a session is currently held in the live cache"""
+        return session_id in self._cache
+
+    def invalidate_log(self, session_id: str) -> None:
+        """Forget the remembered encoding of a log that was rewritten on disk"""
+        self._serializers.pop(session_id, None)
+
+    def _log_serializer(self, session_id: str, session_file: Path):
+        """Serializer to append to a session log with (the one it was created with)"""
+        serializer = self._serializers.get(session_id)
+        if serializer is None:
+            if session_file.exists() and session_file.stat().st_size > 0:
+                serializer = log_serializer(session_file)
+            else:
+                serializer = self.serializer
+            self._serializers[session_id] = serializer
+        return serializer
+
+    def forget(self, *session_ids: str) -> None:
+        """Drop all in-memory and index state of deleted sessions"""
+        for session_id in session_ids:
+            self._persisted.pop(session_id, None)
+            self._serializers.pop(session_id, None)
+            self._cache.pop(session_id, None)
+        if self.catalog is not None:
+            self.catalog.remove(*session_ids)
+        if self.search_index is not None:
+            self.search_index.remove_sessions(session_ids)
+
+    def _cache_put(self, ctx: AgentContext, dirty: bool) -> None:
+        entry = self._cache.get(ctx.session_id)
+        if entry is None:
+            entry = self._cache[ctx.session_id] = _CachedSession(ctx=ctx)
+        entry.ctx = ctx
+        entry.dirty = entry.dirty or dirty
+        entry.last_access = time.monotonic()
+        self._cache.move_to_end(ctx.session_id)
+
+    async def _evict_overflow(self) -> None:
+        """
+        Drop least recently used sessions beyond cache_size, writing dirty ones
+
+        A session whose write fails stays cached and dirty, so the flusher
+        retries it instead of losing its unsaved messages.
+        """
+        overflow = len(self._cache) - self.cache_size
+        for session_id, entry in list(self._cache.items())[:max(overflow, 0)]:
+            last_access = entry.last_access
+            if entry.dirty:
+                entry.dirty = False
+                if not await self._write_session(entry.ctx):
+                    entry.dirty = True
+                    continue
+            # Skip sessions saved or loaded again while the write was in flight
+            if (
+                self._cache.get(session_id) is entry
+                and not entry.dirty
+                and entry.last_access == last_access
+            ):
+                del self._cache[session_id]
+
+    async def _evict_idle(self) -> None:
+        """Drop sessions not accessed within cache_idle_seconds"""
+        cutoff = time.monotonic() - self.cache_idle_seconds
+        for session_id, entry in list(self._cache.items()):
+            if entry.last_access < cutoff and not entry.dirty:
+                del self._cache[session_id]
+
     async def list_sessions(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """List recent sessions"""
+        """List recent sessions from the catalog"""
         try:
-            sessions = []
-
-            for session_file in sorted(
-                self.sessions_dir.glob("*.jsonl"),
-                key=lambda x: x.stat().st_mtime,
-                reverse=True,
-            )[:limit]:
-                try:
-                    with open(session_file, "r", encoding="utf-8") as f:
-                        lines = f.readlines()
-
-                    if lines:
-                        last_line = json.loads(lines[-1])
-                        sessions.append(
-                            {
-                                "session_id": last_line["session_id"],
-                                "user_id": last_line["user_id"],
-                                "channel": last_line["channel"],
-                                "message_count": len(last_line.get("messages", [])),
-                                "started_at": last_line["started_at"],
-                            }
-                        )
-                except (json.JSONDecodeError, KeyError) as e:
-                    logger.warning(f"Invalid session file {session_file}: {e}")
-
+            await self.flush()
+            sessions = self.catalog.recent(limit)
             logger.info(f"Listed {len(sessions)} sessions")
             return sessions
 
@@ -107,22 +670,29 @@ class SessionManager:
             logger.error(f"Error listing sessions: {e}")
             return []
 
-    async def cleanup_old_sessions(self, days: int = 30) -> int:
-        """Delete sessions older than N days"""
+    async def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Ranked full-text hits over all saved messages"""
+        if self.search_index is None:
+            return []
         try:
-            cutoff_time = datetime.now() - timedelta(days=days)
-            deleted_count = 0
+            await self.flush()
+            return await asyncio.to_thread(self.search_index.search, query, limit)
+        except Exception as e:
+            logger.error(f"Error searching sessions: {e}")
+            return []
 
-            for session_file in self.sessions_dir.glob("*.jsonl"):
-                file_time = datetime.fromtimestamp(session_file.stat().st_mtime)
+    async def rebuild_catalog(self) -> int:
+        """Rebuild the session catalog from the logs on disk"""
+        await self.flush()
+        return await asyncio.to_thread(self.catalog.rebuild)
 
-                if file_time < cutoff_time:
-                    session_file.unlink()
-                    deleted_count += 1
-                    logger.info(f"Deleted old session: {session_file.name}")
+    async def cleanup_old_sessions(self, days: int = 30) -> int:
+        """Delete sessions older than N days (age-only retention pass)"""
+        from app.cloud.session_retention import SessionRetention
 
-            logger.info(f"Cleaned up {deleted_count} old sessions")
-            return deleted_count
+        try:
+            report = await SessionRetention(self, max_age_days=days).run_once()
+            return report["evicted"]["age"]
 
         except Exception as e:
             logger.error(f"Error cleaning up sessions: {e}")
@@ -131,43 +701,93 @@ class SessionManager:
     async def export_session(self, session_id: str, format: str = "json") -> Optional[str]:
         """Export session to JSON or CSV"""
         try:
-            session_file = self.sessions_dir / f"{session_id}.jsonl"
-
-            if not session_file.exists():
+            chunks = await self.stream_export(session_id, format)
+            if chunks is None:
                 return None
 
-            if format == "json":
-                with open(session_file, "r", encoding="utf-8") as f:
-                    lines = f.readlines()
-
-                # Convert JSONL to JSON array
-                sessions_data = [json.loads(line) for line in lines]
-                return json.dumps(sessions_data, indent=2)
-
-            elif format == "csv":
-                import csv
-                import io
-
-                with open(session_file, "r", encoding="utf-8") as f:
-                    lines = f.readlines()
-
-                sessions_data = [json.loads(line) for line in lines]
+            return await asyncio.to_thread("".join, chunks) or None
 
-                output = io.StringIO()
-                writer = csv.writer(output)
-                writer.writerow(["timestamp", "role", "content"])
+        except Exception as e:
+            logger.error(f"Error exporting session: {e}")
+            return None
 
-                for session in sessions_data:
-                    for msg in session.get("messages", []):
-                        writer.writerow(
-                            [session.get("started_at"), msg["role"], msg["content"][:100]]
-                        )
+    async def stream_export(self, session_id: str, format: str = "json") -> Optional[Iterator[str]]:
+        """
+        Export session as a stream of JSON or CSV text chunks
 
-                return output.getvalue()
+        Returns:
+            Blocking iterator of chunks (iterate it off the event loop), or
+            None if the session or format is unknown
+        """
+        if format not in EXPORT_FORMATS:
+            return None
 
-            else:
-                return None
+        await self.flush()
+        session_file = self._session_file(session_id)
+        if not session_file.exists():
+            return None
 
-        except Exception as e:
-            logger.error(f"Error exporting session: {e}")
+        return iter_export(iter_live_records(session_file), format)
+
+    async def close(self) -> None:
+        """Flush cached sessions and release resources held by the backend"""
+        await self.flush()
+        await self.writer().close()
+        if self.catalog is not None:
+            self.catalog.close()
+        if self.search_index is not None:
+            self.search_index.close()
+
+    def _open_catalog(self) -> Optional["SessionCatalog"]:
+        """Open the listing catalog for the JSONL logs"""
+        from app.cloud.session_catalog import SessionCatalog
+        return SessionCatalog(self.data_dir / "catalog.db", self.sessions_dir)
+
+    def _session_file(self, session_id: str) -> Path:
+        """Path of a session log, preferring the plain file over a compressed one"""
+        session_file = self.sessions_dir / f"{session_id}{LOG_SUFFIX}"
+        if not session_file.exists():
+            compressed_file = self.sessions_dir / f"{session_id}{COMPRESSED_SUFFIX}"
+            if compressed_file.exists():
+                return compressed_file
+        return session_file
+
+    def _read_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        summary_file = self.sessions_dir / f"{session_id}{SUMMARY_SUFFIX}"
+        if not summary_file.exists():
             return None
+        return json_loads(summary_file.read_bytes())
+
+    def _write_summary(self, session_id: str, summary: Dict[str, Any]) -> None:
+        summary_file = self.sessions_dir / f"{session_id}{SUMMARY_SUFFIX}"
+        tmp_file = summary_file.with_name(summary_file.name + ".tmp")
+        tmp_file.write_text(json.dumps(summary, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_file, summary_file)
+
+    def _session_files(self) -> List[Path]:
+        """All plain and compressed session logs"""
+        return list(self.sessions_dir.glob(f"*{LOG_SUFFIX}")) + list(
+            self.sessions_dir.glob(f"*{COMPRESSED_SUFFIX}")
+        )
+
+    @staticmethod
+    def _decompress(compressed_file: Path, session_file: Path) -> None:
+        """Restore a compressed session log so it can be appended to again"""
+        tmp_file = session_file.with_name(session_file.name + ".tmp")
+        with gzip.open(compressed_file, "rb") as src, open(tmp_file, "wb") as dst:
+            while chunk := src.read(1024 * 1024):
+                dst.write(chunk)
+        os.replace(tmp_file, session_file)
+        compressed_file.unlink()
+        logger.info(f"Session reactivated from {compressed_file.name}")
+
+    def _open_search_index(self) -> Optional["SessionSearchIndex"]:
+        """Open the full-text index over the JSONL logs"""
+        from app.cloud.session_search import SessionSearchIndex
+        return SessionSearchIndex(self.data_dir / "search.db", self.sessions_dir)
+
+    @staticmethod
+    def _is_delta_log(session_file: Path) -> bool:
+        """Check whether a session log starts with a delta-format header"""
+        first = read_first_record(session_file)
+        return first is not None and first.get("kind") == "header"
@@ -0,0 +1,357 @@
+"""SQLite session backend - same API as SessionManager, stored in one WAL database"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.cloud.sessions import (
+    COMPRESSED_SUFFIX,
+    EXPORT_FORMATS,
+    LOG_SUFFIX,
+    SessionManager,
+    iter_export,
+    read_session_state,
+)
+from app.core.context import AgentContext
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Messages fetched per query when streaming an export
+_EXPORT_PAGE_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    metadata TEXT,
+    PRIMARY KEY (session_id, seq)
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_channel ON sessions (channel);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_started_at ON sessions (started_at);
+CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp);
+"""
+
+
+class SqliteSessionManager(SessionManager):
+    """Session manager backed by stdlib sqlite3 in WAL mode
+
+    Blocking database work runs in worker threads via ``asyncio.to_thread``;
+    a lock serializes access to the shared connection.
+    """
+
+    def __init__(self, data_dir: str = "./data", db_path: Optional[str] = None, **options):
+        super().__init__(data_dir=data_dir, **options)
+        self.db_path = Path(db_path) if db_path else self.data_dir / "sessions.db"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        logger.info(f"SQLite session store: {self.db_path}")
+
+    def _open_catalog(self) -> None:
+        """The sessions table already serves as the listing catalog"""
+        return None
+
+    def _open_search_index(self) -> None:
+        """Full-text search is only maintained for the JSONL logs"""
+        return None
+
+    async def _write_session(self, ctx: AgentContext) -> bool:
+        """Insert messages added since the last save and update the session row"""
+        try:
+            added = await asyncio.to_thread(self._save_sync, ctx)
+            logger.info(f"Session saved: {ctx.session_id} (+{added} messages)")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving session: {e}")
+            return False
+
+    async def _read_session(self, session_id: str) -> Optional[AgentContext]:
+        """Load session from the database"""
+        try:
+            state = await asyncio.to_thread(self._load_state_sync, session_id)
+            if state is None:
+                logger.info(f"No existing session: {session_id}")
+                return None
+
+            ctx = AgentContext.from_dict(state)
+            logger.info(f"Session loaded: {session_id} ({len(ctx.messages)} messages)")
+            return ctx
+
+        except Exception as e:
+            logger.error(f"Error loading session: {e}")
+            return None
+
+    async def list_sessions(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """List recent sessions"""
+        try:
+            await self.flush()
+            sessions = await asyncio.to_thread(self._list_sync, limit)
+            logger.info(f"Listed {len(sessions)} sessions")
+            return sessions
+        except Exception as e:
+            logger.error(f"Error listing sessions: {e}")
+            return []
+
+    async def cleanup_old_sessions(self, days: int = 30) -> int:
+        """Delete sessions not updated in the last N days"""
+        try:
+            cutoff = (datetime.now() - timedelta(days=days)).timestamp()
+            deleted_count = await asyncio.to_thread(self._cleanup_sync, cutoff)
+            logger.info(f"Cleaned up {deleted_count} old sessions")
+            return deleted_count
+        except Exception as e:
+            logger.error(f"Error cleaning up sessions: {e}")
+            return 0
+
+    async def stream_export(self, session_id: str, format: str = "json") -> Optional[Iterator[str]]:
+        """Export session as a stream of JSON or CSV text chunks"""
+        if format not in EXPORT_FORMATS:
+            return None
+
+        await self.flush()
+        exists = await asyncio.to_thread(self._exists_sync, session_id)
+        if not exists:
+            return None
+
+        return iter_export(self._iter_live_records_sync(session_id), format)
+
+    async def import_jsonl(self, sessions_dir: Optional[str] = None) -> int:
+        """
+        Import JSONL session logs (any format) into the database
+
+        Sessions already in the database with at least as many messages are
+        left untouched, so the import can be re-run safely.
+
+        Returns:
+            Number of sessions imported
+        """
+        source = Path(sessions_dir) if sessions_dir else self.sessions_dir
+        return await asyncio.to_thread(self._import_jsonl_sync, source)
+
+    async def rebuild_catalog(self) -> int:
+        """The sessions table is the catalog; report how many sessions it holds"""
+        await self.flush()
+        return await asyncio.to_thread(self._count_sync)
+
+    async def close(self) -> None:
+        """Flush cached sessions and close the database connection"""
+        await self.flush()
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # Blocking helpers (run in worker threads)
+    # ------------------------------------------------------------------
+
+    def _save_sync(self, ctx: AgentContext, updated_at: Optional[float] = None) -> int:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT message_count FROM sessions WHERE session_id = ?", (ctx.session_id,)
+            ).fetchone()
+            start = row["message_count"] if row else 0
+
+            if start > len(ctx.messages):
+                # Context was rewritten with fewer messages: replace the history
+                self._conn.execute("DELETE FROM messages WHERE session_id = ?", (ctx.session_id,))
+                start = 0
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO messages "
+                "(session_id, seq, role, content, timestamp, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        ctx.session_id,
+                        seq,
+                        data["role"],
+                        data["content"],
+                        data["timestamp"],
+                        json.dumps(data["metadata"]) if data["metadata"] else None,
+                    )
+                    for seq, data in enumerate(
+                        (msg.to_dict() for msg in ctx.messages[start:]), start=start
+                    )
+                ],
+            )
+            self._conn.execute(
+                "INSERT INTO sessions "
+                "(session_id, user_id, channel, started_at, updated_at, message_count) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET "
+                "user_id = excluded.user_id, channel = excluded.channel, "
+                "started_at = excluded.started_at, updated_at = excluded.updated_at, "
+                "message_count = excluded.message_count",
+                (
+                    ctx.session_id,
+                    ctx.user_id,
+                    ctx.channel,
+                    ctx.started_at.isoformat(),
+                    updated_at if updated_at is not None else time.time(),
+                    len(ctx.messages),
+                ),
+            )
+            return len(ctx.messages) - start
+
+    def _load_state_sync(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id, user_id, channel, started_at FROM sessions "
+                "WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            messages = self._conn.execute(
+                "SELECT role, content, timestamp, metadata FROM messages "
+                "WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+
+        return {
+            "session_id": row["session_id"],
+            "user_id": row["user_id"],
+            "channel": row["channel"],
+            "messages": [
+                {
+                    "role": m["role"],
+                    "content": m["content"],
+                    "timestamp": m["timestamp"],
+                    "metadata": json.loads(m["metadata"]) if m["metadata"] else {},
+                }
+                for m in messages
+            ],
+            "started_at": row["started_at"],
+        }
+
+    def _read_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return json.loads(row["summary"]) if row else None
+
+    def _write_summary(self, session_id: str, summary: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (session_id, summary) VALUES (?, ?)",
+                (session_id, json.dumps(summary, ensure_ascii=False)),
+            )
+
+    def _exists_sync(self, session_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone() is not None
+
+    def _iter_live_records_sync(self, session_id: str) -> Iterator[Dict[str, Any]]:
+        """Stream head + messages in pages, releasing the lock between pages"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id, user_id, channel, started_at FROM sessions "
+                "WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None:
+            return
+        yield dict(row)
+
+        last_seq = -1
+        while True:
+            with self._lock:
+                page = self._conn.execute(
+                    "SELECT seq, role, content, timestamp, metadata FROM messages "
+                    "WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                    (session_id, last_seq, _EXPORT_PAGE_SIZE),
+                ).fetchall()
+            if not page:
+                return
+
+            for m in page:
+                yield {
+                    "role": m["role"],
+                    "content": m["content"],
+                    "timestamp": m["timestamp"],
+                    "metadata": json.loads(m["metadata"]) if m["metadata"] else {},
+                }
+            last_seq = page[-1]["seq"]
+
+    def _list_sync(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, user_id, channel, message_count, started_at FROM sessions "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _count_sync(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def _cleanup_sync(self, cutoff: float) -> int:
+        with self._lock, self._conn:
+            for table in ("messages", "summaries"):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE session_id IN "
+                    "(SELECT session_id FROM sessions WHERE updated_at < ?)",
+                    (cutoff,),
+                )
+            return self._conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (cutoff,)
+            ).rowcount
+
+    def _import_jsonl_sync(self, sessions_dir: Path) -> int:
+        imported = 0
+
+        for session_file in sorted(sessions_dir.glob(f"*{LOG_SUFFIX}")) + sorted(
+            sessions_dir.glob(f"*{COMPRESSED_SUFFIX}")
+        ):
+            try:
+                state = read_session_state(session_file)
+                if not state:
+                    continue
+
+                with self._lock:
+                    row = self._conn.execute(
+                        "SELECT message_count FROM sessions WHERE session_id = ?",
+                        (state["session_id"],),
+                    ).fetchone()
+                if row and row["message_count"] >= len(state.get("messages", [])):
+                    continue
+
+                self._save_sync(AgentContext.from_dict(state), session_file.stat().st_mtime)
+                imported += 1
+
+            except Exception as e:
+                logger.warning(f"Could not import {session_file.name}: {e}")
+
+        logger.info(f"Imported {imported} sessions from {sessions_dir}")
+        return imported
@@ -1,17 +1,147 @@
 """Telegram bot integration for Nanobot with Agent Loop"""
 
 import asyncio
-from typing import Optional
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
 from telegram import Update
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 
 from app.config import Settings
 from app.utils import get_logger
 from app.core.context import AgentContext
+from app.cloud.message_coalescer import MessageCoalescer
 
 logger = get_logger(__name__)
 
 _app: Optional[Application] = None
+_coalescer: Optional[MessageCoalescer] = None
+# Agent turn running for each chat, so /cancel can stop it
+_inflight: Dict[str, asyncio.Task] = {}
+
+# Telegram's limit on the text of one message
+MAX_MESSAGE_CHARS = 4096
+
+_stream_stats = {
+    "replies": 0,
+    "messages": 0,
+    "edits": 0,
+    "rate_limited": 0,
+    "first_message_seconds": 0.0,
+}
+
+
+def stream_stats() -> Dict[str, Any]:
+    """Counters of streamed replies; time to first message is averaged"""
+    stats = dict(_stream_stats)
+    total = stats.pop("first_message_seconds")
+    stats["avg_first_message_seconds"] = (
+        round(total / stats["replies"], 3) if stats["replies"] else None
+    )
+    return stats
+
+
+def split_message(text: str) -> List[str]:
+    """Split text into chunks Telegram accepts"""
+    return [text[i:i + MAX_MESSAGE_CHARS] for i in range(0, len(text), MAX_MESSAGE_CHARS)]
+
+
+class StreamingReply:
+    """Render a streamed answer as a reply edited in place
+
+    The first non-blank text is sent as a new reply right away; later deltas
+    are applied by editing it at most every ``edit_interval`` seconds, since
+    Telegram rate-limits edits per chat. Text past 4096 characters continues
+    in a new message. ``finish`` writes whatever is still pending.
+    """
+
+    def __init__(self, message: Any, edit_interval: float = 1.0, started: Optional[float] = None):
+        self.message = message
+        self.edit_interval = edit_interval
+        self.started = started if started is not None else time.monotonic()
+        self.text = ""  # everything streamed so far
+        self._current: Any = None  # message being edited
+        self._pending = ""  # text of the current message
+        self._shown = ""  # what Telegram currently displays for it
+        self._last_edit = float("-inf")
+        self._blocked_until = 0.0
+        self._first_sent = False
+
+    async def push(self, delta: str) -> None:
+        """Add streamed text, sending or editing the reply if it is time"""
+        if not delta:
+            return
+        self.text += delta
+        self._pending += delta
+        while len(self._pending) > MAX_MESSAGE_CHARS:
+            head = self._pending[:MAX_MESSAGE_CHARS]
+            self._pending = self._pending[MAX_MESSAGE_CHARS:]
+            await self._show(head, force=True)
+            self._current, self._shown = None, ""
+        await self._show(self._pending)
+
+    async def finish(self, final_text: str = "") -> None:
+        """Flush pending text; send ``final_text`` if it was not streamed"""
+        if self.text.strip():
+            await self._show(self._pending, force=True)
+            # e.g. an error reported after part of the answer was streamed
+            if final_text.strip() and final_text.strip() not in self.text:
+                for chunk in split_message(final_text):
+                    await self._send(chunk)
+        else:
+            for chunk in split_message(final_text):
+                await self._send(chunk)
+
+    async def _show(self, text: str, force: bool = False) -> None:
+        if not text.strip():
+            # Telegram rejects empty messages
+            return
+        if self._current is None:
+            self._current = await self._send(text)
+            self._shown = text
+            self._last_edit = time.monotonic()
+            return
+        if text == self._shown:
+            return
+        now = time.monotonic()
+        if not force and (now - self._last_edit < self.edit_interval or now < self._blocked_until):
+            return
+        if await self._request(lambda: self._current.edit_text(text), force) is not None:
+            _stream_stats["edits"] += 1
+            self._shown = text
+        self._last_edit = time.monotonic()
+
+    async def _send(self, text: str) -> Any:
+        sent = await self._request(lambda: self.message.reply_text(text), force=True)
+        _stream_stats["messages"] += 1
+        if not self._first_sent:
+            self._first_sent = True
+            _stream_stats["replies"] += 1
+            _stream_stats["first_message_seconds"] = round(
+                _stream_stats["first_message_seconds"] + time.monotonic() - self.started, 3
+            )
+        return sent
+
+    async def _request(self, send: Any, force: bool) -> Any:
+        """Run a Telegram call; on flood control wait (forced) or skip it"""
+        while True:
+            try:
+                return await send()
+            except RetryAfter as e:
+                _stream_stats["rate_limited"] += 1
+                delay = e.retry_after
+                if isinstance(delay, timedelta):
+                    delay = delay.total_seconds()
+                self._blocked_until = time.monotonic() + delay
+                if not force:
+                    return None
+                logger.warning(f"Telegram flood control, retrying in {delay}s")
+                await asyncio.sleep(delay)
+            except BadRequest as e:
+                if "not modified" in str(e).lower():
+                    return None
+                raise
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -33,7 +163,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle incoming messages with agent loop"""
+    """Handle incoming messages, coalescing bursts per chat"""
     user = update.effective_user
     message = update.message
 
@@ -42,12 +172,28 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     logger.info(f"Message from {user.id}: {message.text[:50]}...")
 
+    if _coalescer:
+        # Typing indicator once per burst; the batch is answered when it settles.
+        # Answering off the handler also keeps /cancel responsive.
+        if _coalescer.submit(str(message.chat_id), (update, time.monotonic())):
+            await message.chat.send_action("typing")
+        return
+
     # Show typing indicator
-    await update.message.chat.send_action("typing")
+    await message.chat.send_action("typing")
+    await _process_updates(str(message.chat_id), [(update, time.monotonic())])
+
+
+async def _process_updates(chat_id: str, batch: List[Tuple[Update, float]]) -> None:
+    """Answer one or more consecutive messages as a single user turn"""
+    update, _ = batch[-1]
+    user = update.effective_user
+    message = update.message
+    started = batch[0][1]
 
     try:
         # Import here to avoid circular imports
-        from app.main import _agent_loop, _session_manager
+        from app.main import _agent_loop, _session_manager, _summarizer, settings
 
         if not _agent_loop:
             await message.reply_text("❌ Agent loop no iniciado")
@@ -65,34 +211,94 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 channel="telegram"
             )
 
-        # Add user message
-        ctx.add_message("user", message.text)
+        # Where background jobs started in this turn report back
+        ctx.state["chat_id"] = chat_id
 
-        # Process with agent loop
-        response = await _agent_loop.process_message(ctx)
+        # Add user message (a burst becomes one turn)
+        text = "\n".join(u.message.text for u, _ in batch)
+        metadata = {"coalesced": len(batch)} if len(batch) > 1 else None
+        ctx.add_message("user", text, metadata=metadata)
 
-        # Save session
-        await _session_manager.save_session(ctx)
+        reply = None
+        if settings.telegram_streaming:
+            # Stream the answer into a reply edited in place
+            reply = StreamingReply(
+                message, edit_interval=settings.telegram_edit_interval, started=started
+            )
+
+        # Run the turn as its own task so /cancel can stop it
+        work = asyncio.create_task(
+            _agent_loop.process_message(ctx, on_delta=reply.push if reply else None)
+        )
+        _inflight[chat_id] = work
+        try:
+            response = await work
+        except asyncio.CancelledError:
+            if not work.cancelled() or asyncio.current_task().cancelling():
+                # We are being cancelled ourselves (shutdown), not /cancel
+                raise
+            logger.info(f"Turn cancelled by {user.id}")
+            response = "🛑 Cancelado."
+        finally:
+            if _inflight.get(chat_id) is work:
+                del _inflight[chat_id]
 
-        # Send response (split if too long)
-        if len(response) > 4096:
-            # Send in chunks
-            for i in range(0, len(response), 4096):
-                await message.reply_text(response[i:i+4096])
+        if reply:
+            await reply.finish(response)
+            await _session_manager.save_session(ctx)
         else:
-            await message.reply_text(response)
+            # Save session
+            await _session_manager.save_session(ctx)
+
+            # Send response (split if too long)
+            for chunk in split_message(response):
+                await message.reply_text(chunk)
 
         logger.info(f"Response sent to {user.id}")
 
+        # Fold old turns into the rolling summary off the reply path
+        if _summarizer:
+            _summarizer.schedule(ctx)
+
     except Exception as e:
         logger.error(f"Error processing message: {e}", exc_info=True)
         error_msg = f"❌ Error: {str(e)[:100]}\n\nPor favor, intenta de nuevo."
         await message.reply_text(error_msg)
 
 
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /cancel: stop the chat's running turn and drop queued messages"""
+    message = update.message
+    chat_id = str(message.chat_id)
+
+    dropped = _coalescer.discard(chat_id) if _coalescer else 0
+    work = _inflight.get(chat_id)
+    if work and not work.done():
+        # Aborts the model call and kills running commands; the turn replies
+        work.cancel()
+        logger.info(f"Cancelling turn of chat {chat_id}")
+    elif dropped:
+        await message.reply_text("🛑 Cancelado.")
+    else:
+        await message.reply_text("No hay nada en curso.")
+
+
+async def notify_chat(channel: str, chat_id: str, text: str) -> None:
+    """Send a message to a chat outside of a turn (background job notices)"""
+    if channel != "telegram" or not _app:
+        return
+    for chunk in split_message(text):
+        await _app.bot.send_message(chat_id=chat_id, text=chunk)
+
+
+def coalescing_stats() -> Optional[Dict[str, int]]:
+    """Counters of coalesced message bursts, None before the bot starts"""
+    return _coalescer.stats if _coalescer else None
+
+
 async def start_telegram_bot(settings: Settings) -> None:
     """Start Telegram bot"""
-    global _app
+    global _app, _coalescer
 
     logger.info("🟢 Starting Telegram bot polling...")
 
@@ -100,10 +306,19 @@ async def start_telegram_bot(settings: Settings) -> None:
         # Create application
         _app = Application.builder().token(settings.telegram_token).build()
 
+        # Always used, even with a zero window: answering off the update
+        # handler is what lets /cancel through while a turn runs
+        _coalescer = MessageCoalescer(
+            _process_updates,
+            window=settings.telegram_coalesce_window,
+            max_wait=settings.telegram_coalesce_max_wait,
+        )
+
         # Add handlers
         from app.cloud.telegram_bot import start, handle_message  # Import handlers locally to avoid circular imports? No, they are in this file.
 
         _app.add_handler(CommandHandler("start", start))
+        _app.add_handler(CommandHandler("cancel", cancel))
         _app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
         # Start polling (non-blocking way for integration with FastAPI)
@@ -120,6 +335,9 @@ async def start_telegram_bot(settings: Settings) -> None:
 async def stop_telegram_bot() -> None:
     """Stop Telegram bot"""
     global _app
+    if _coalescer:
+        # Answer bursts still waiting for their window to close
+        await _coalescer.close()
     if _app:
         try:
             await _app.stop()
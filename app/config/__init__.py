@@ -1,5 +1,6 @@
 """Configuration management"""
 
+from .providers import load_providers_config
 from .schema import Settings
 
-__all__ = ["Settings"]
+__all__ = ["Settings", "load_providers_config"]
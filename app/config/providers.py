@@ -0,0 +1,30 @@
+"""Provider settings from config/providers.yml"""
+
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+import yaml
+
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_PROVIDERS_PATH = Path(__file__).resolve().parent.parent.parent / "config" / "providers.yml"
+
+
+def load_providers_config(path: str | Path = DEFAULT_PROVIDERS_PATH) -> Dict[str, Any]:
+    """
+    Load per-provider settings, expanding ${VAR} references
+
+    Returns:
+        Dict keyed by provider name, or empty if the file is missing
+    """
+    path = Path(path)
+    if not path.exists():
+        logger.warning(f"Providers config not found: {path}")
+        return {}
+
+    with open(path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(os.path.expandvars(f.read())) or {}
+    return config
@@ -27,6 +27,71 @@ class Settings(BaseSettings):
     port: int = 8000
     host: str = "0.0.0.0"
     
+    # Sessions
+    session_backend: str = "jsonl"  # "jsonl" or "sqlite"
+    sessions_db_path: str = "./data/sessions.db"
+    session_cache_size: int = 256  # live contexts kept in memory (0 disables)
+    session_cache_idle_seconds: float = 1800
+    session_flush_interval: float = 5
+    session_serializer: str = "orjson"  # "json", "orjson" or "msgpack" (falls back to json)
+    session_fsync_policy: str = "interval"  # "none", "interval" or "always"
+    session_fsync_interval: float = 1.0
+    session_compaction_interval_hours: float = 6
+    session_compress_after_days: float = 7
+    session_retention_days: float = 30  # 0 disables each retention policy
+    session_user_quota_mb: float = 50
+    session_disk_budget_mb: float = 768  # of the 1 GB Render disk
+    session_retention_interval_hours: float = 24
+
+    # Context window
+    context_max_input_tokens: int = 16000  # when providers.yml sets no max_input_tokens
+    context_keep_recent: int = 6  # latest messages always sent
+    summary_every_turns: int = 10  # fold old turns into the summary every N (0 disables)
+    summary_max_tokens: int = 400
+    memory_top_k: int = 4  # workspace memory sections injected per turn (0 disables)
+    memory_max_tokens: int = 800  # budget for those sections
+    skill_top_k: int = 1  # matching skills whose body is injected per turn (0 disables)
+    skill_min_score: float = 2.0  # relevance needed to load a skill
+    skill_max_tokens: int = 1500  # per loaded skill
+
+    # Agent loop
+    tool_max_steps: int = 5  # model calls per user message
+    tool_concurrency: int = 4  # tool calls run at once within a step
+    tool_timeout: float = 60
+    request_deadline_seconds: float = 180  # whole turn: queue, model calls, tools (0 disables)
+
+    # Background jobs (long shell/git commands)
+    job_workers: int = 2  # jobs run at once
+    job_timeout_seconds: float = 1800
+    job_progress_interval: float = 60  # seconds between progress messages
+    jobs_db_path: str = "./data/jobs.db"
+
+    # LLM admission control
+    llm_max_in_flight: int = 4  # concurrent LLM calls
+    llm_max_queue: int = 32  # waiting calls before new turns get a "busy" reply
+    llm_max_queue_per_user: int = 4
+    llm_max_background: int = 1  # slots summaries may take
+
+    # Shared HTTP pool of the provider clients
+    llm_http_max_connections: int = 64
+    llm_http_max_keepalive: int = 16  # idle connections kept open
+    llm_http_keepalive_seconds: float = 30
+    llm_http_timeout: float = 120  # per request; the turn deadline still applies
+    llm_http2: bool = True  # used when the h2 package is installed
+
+    # LLM response cache (opt-in)
+    llm_cache_enabled: bool = False
+    llm_cache_ttl_seconds: float = 3600
+    llm_cache_max_entries: int = 512  # in memory; the disk tier keeps more
+    llm_cache_path: str = "./data/llm_cache.db"  # empty for memory only
+    llm_cache_max_history: int = 2  # earlier messages a cacheable request may have
+
+    # Telegram replies
+    telegram_streaming: bool = True  # edit the reply in place as tokens arrive
+    telegram_edit_interval: float = 1.0  # min seconds between edits of a message
+    telegram_coalesce_window: float = 1.0  # merge messages this close together (0: no merging)
+    telegram_coalesce_max_wait: float = 4.0  # max delay of a burst's first message
+
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,16 +1,169 @@
 """Agent execution context and state management"""
 
+import json
+import sys
+import time
 from dataclasses import dataclass, field
-from typing import Any, Dict, List
-from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+from datetime import datetime, timedelta, timezone
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Conservative for Spanish prose and code, which tokenize denser than English
+CHARS_PER_TOKEN = 3.5
+# Role and framing tokens the chat formats add around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text, without a provider tokenizer"""
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def _to_epoch(value: Union[datetime, float, None]) -> float:
+    """Naive-UTC datetime (or epoch seconds) to epoch seconds"""
+    if value is None:
+        return time.time()
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return (value - _EPOCH) / timedelta(seconds=1)
+    return float(value)
+
+
+def _from_epoch(ts: float) -> datetime:
+    """Epoch seconds to naive-UTC datetime, exact to the microsecond"""
+    return _EPOCH + timedelta(microseconds=round(ts * 1_000_000))
+
+
+# "YYYY-MM-DDTHH:MM:SS" per whole second; messages of a session cluster in time
+_ISO_SECONDS: Dict[int, str] = {}
+_ISO_SECONDS_MAX = 4096
+
+
+def _iso_from_epoch(ts: float) -> str:
+    """Same output as ``_from_epoch(ts).isoformat()`` without building a datetime"""
+    seconds, micros = divmod(round(ts * 1_000_000), 1_000_000)
+    prefix = _ISO_SECONDS.get(seconds)
+    if prefix is None:
+        if len(_ISO_SECONDS) >= _ISO_SECONDS_MAX:
+            _ISO_SECONDS.clear()
+        prefix = _ISO_SECONDS[seconds] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+    return f"{prefix}.{micros:06d}" if micros else prefix
 
 
-@dataclass
 class Message:
-    role: str  # "user" or "assistant"
-    content: str
-    timestamp: datetime = field(default_factory=datetime.utcnow)
-    metadata: Dict[str, Any] = field(default_factory=dict)
+    """A single conversation message
+
+    Kept compact because sessions can hold thousands of them: ``__slots__``
+    instead of a per-instance dict, interned role strings, the timestamp as
+    epoch seconds (``timestamp`` still returns a naive-UTC datetime) and
+    metadata allocated only when something is stored in it. The token
+    estimate is computed on first use and cached until content changes.
+    """
+
+    __slots__ = ("role", "_content", "ts", "_metadata", "_tokens")
+
+    def __init__(
+        self,
+        role: str,  # "user" or "assistant"
+        content: str,
+        timestamp: Union[datetime, float, None] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        self.role = sys.intern(role)
+        self.content = content
+        self.ts = _to_epoch(timestamp)
+        self._metadata = metadata or None
+
+    @property
+    def content(self) -> str:
+        return self._content
+
+    @content.setter
+    def content(self, value: str) -> None:
+        self._content = value
+        self._tokens = None
+
+    @property
+    def tokens(self) -> int:
+        """Estimated prompt tokens of this message, including overhead"""
+        if self._tokens is None:
+            tokens = estimate_tokens(self._content) + MESSAGE_OVERHEAD_TOKENS
+            if self._metadata and "tool_calls" in self._metadata:
+                tokens += estimate_tokens(json.dumps(self._metadata["tool_calls"]))
+            self._tokens = tokens
+        return self._tokens
+
+    @property
+    def timestamp(self) -> datetime:
+        return _from_epoch(self.ts)
+
+    @timestamp.setter
+    def timestamp(self, value: Union[datetime, float]) -> None:
+        self.ts = _to_epoch(value)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if self._metadata is None:
+            self._metadata = {}
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, value: Optional[Dict[str, Any]]) -> None:
+        self._metadata = value or None
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Message):
+            return NotImplemented
+        return (
+            self.role == other.role
+            and self._content == other._content
+            and self.ts == other.ts
+            and (self._metadata or {}) == (other._metadata or {})
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Message(role={self.role!r}, content={self.content!r}, "
+            f"timestamp={self.timestamp!r}, metadata={self._metadata or {}!r})"
+        )
+
+    def to_chat(self, content: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Chat-API form of the message (optionally with replaced content)
+
+        Carries ``tool_calls`` for assistant tool requests and
+        ``tool_call_id`` for tool results, from metadata.
+        """
+        data = {"role": self.role, "content": self._content if content is None else content}
+        metadata = self._metadata
+        if metadata:
+            if "tool_calls" in metadata:
+                data["tool_calls"] = metadata["tool_calls"]
+            if "tool_call_id" in metadata:
+                data["tool_call_id"] = metadata["tool_call_id"]
+        return data
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for serialization"""
+        return {
+            "role": self.role,
+            "content": self._content,
+            "timestamp": _iso_from_epoch(self.ts),
+            "metadata": self._metadata or {}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Message":
+        """Rebuild a message from its serialized form"""
+        timestamp = data.get("timestamp")
+        return cls(
+            role=data["role"],
+            content=data["content"],
+            timestamp=datetime.fromisoformat(timestamp) if timestamp else None,
+            metadata=data.get("metadata"),
+        )
 
 
 @dataclass
@@ -26,7 +179,7 @@ class AgentContext:
     
     def add_message(self, role: str, content: str, metadata: Dict[str, Any] = None) -> None:
         """Add message to context"""
-        msg = Message(role=role, content=content, metadata=metadata or {})
+        msg = Message(role=role, content=content, metadata=metadata)
         self.messages.append(msg)
     
     def to_dict(self) -> Dict[str, Any]:
@@ -35,14 +188,18 @@ class AgentContext:
             "session_id": self.session_id,
             "user_id": self.user_id,
             "channel": self.channel,
-            "messages": [
-                {
-                    "role": m.role,
-                    "content": m.content,
-                    "timestamp": m.timestamp.isoformat(),
-                    "metadata": m.metadata
-                }
-                for m in self.messages
-            ],
+            "messages": [m.to_dict() for m in self.messages],
             "started_at": self.started_at.isoformat(),
         }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AgentContext":
+        """Rebuild a context from the output of to_dict"""
+        started_at = data.get("started_at")
+        return cls(
+            session_id=data["session_id"],
+            user_id=data["user_id"],
+            channel=data["channel"],
+            messages=[Message.from_dict(m) for m in data.get("messages", [])],
+            started_at=datetime.fromisoformat(started_at) if started_at else datetime.utcnow(),
+        )
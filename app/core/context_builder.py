@@ -0,0 +1,173 @@
+"""Token-budgeted context window for LLM calls"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.context import (
+    CHARS_PER_TOKEN,
+    MESSAGE_OVERHEAD_TOKENS,
+    Message,
+    estimate_tokens,
+)
+
+# Below this, an elided message is mostly marker and not worth sending
+MIN_ELIDED_TOKENS = 64
+# Room for the "messages omitted" note appended to the system prompt
+_OMITTED_NOTE_TOKENS = 32
+
+
+def elide(content: str, max_tokens: int) -> str:
+    """Shorten text to about max_tokens, keeping its head and tail"""
+    max_chars = int(max(max_tokens, 1) * CHARS_PER_TOKEN)
+    if len(content) <= max_chars:
+        return content
+    omitted = len(content) - max_chars
+    marker = f"\n[… {omitted} caracteres omitidos …]\n"
+    keep = max(max_chars - len(marker), 0)
+    head = keep * 2 // 3
+    tail = keep - head
+    return content[:head] + marker + (content[-tail:] if tail else "")
+
+
+def _with_turn_context(messages: Sequence[Message], turn_context: str) -> List[Message]:
+    """Copy of the history with turn_context prepended to the latest user message"""
+    messages = list(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        msg = messages[i]
+        if msg.role == "user":
+            messages[i] = Message(
+                "user", f"{turn_context}\n\n{msg.content}", msg.ts, msg.metadata
+            )
+            break
+    return messages
+
+
+@dataclass
+class ContextWindow:
+    """Messages to send plus what the budget cost"""
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    input_tokens: int = 0
+    trimmed_tokens: int = 0
+    dropped_messages: int = 0
+    elided_messages: int = 0
+
+
+class ContextBuilder:
+    """Fit a conversation into a provider's input token budget
+
+    The last ``keep_recent`` messages are always sent; if they alone exceed
+    the budget the largest of them are elided (head + tail kept) rather than
+    dropped. Older messages are added newest-first while they fit, the first
+    one that does not is elided into the remaining space and everything
+    before it is dropped. The system prompt notes how many were omitted.
+
+    The system prompt is sent unchanged as the first message so providers
+    can cache it. Per-session text (``system_context``, the rolling summary and
+    the omitted-messages note) goes in a second system message after it. When
+    the session has a rolling summary, the messages it covers are replaced by
+    the summary text. Text that changes every turn (``turn_context``, e.g.
+    retrieved memory) is prepended to the latest user message instead, after
+    the history, so the history stays a cacheable prefix.
+    """
+
+    def __init__(self, max_input_tokens: int = 16000, keep_recent: int = 6):
+        self.max_input_tokens = max_input_tokens
+        self.keep_recent = max(keep_recent, 1)
+
+    def build(
+        self,
+        system_prompt: str,
+        messages: Sequence[Message],
+        summary: Optional[Dict[str, Any]] = None,
+        system_context: str = "",
+        turn_context: str = "",
+    ) -> ContextWindow:
+        """
+        Select and format the messages for one LLM call
+
+        Args:
+            system_prompt: Static system prompt (cacheable prefix)
+            messages: Full conversation history
+            summary: Rolling summary (``text``, ``upto``) of the oldest
+                messages, ignored if it covers more than the history holds
+            system_context: Per-session system text (user, channel...)
+            turn_context: Text for this turn only, sent with the latest
+                user message
+
+        Returns:
+            ContextWindow with the formatted messages (system prompt first),
+            estimated input tokens and what was trimmed to fit
+        """
+        window = ContextWindow()
+        dynamic = [system_context] if system_context else []
+        if summary and 0 < summary.get("upto", 0) <= len(messages):
+            dynamic.append(f"## Resumen de la conversación anterior\n{summary['text']}")
+            messages = messages[summary["upto"]:]
+        if turn_context:
+            messages = _with_turn_context(messages, turn_context)
+
+        budget = self.max_input_tokens - estimate_tokens(system_prompt) - MESSAGE_OVERHEAD_TOKENS
+        if dynamic:
+            budget -= estimate_tokens("\n\n".join(dynamic)) + MESSAGE_OVERHEAD_TOKENS
+        if len(messages) > self.keep_recent:
+            budget -= _OMITTED_NOTE_TOKENS
+
+        recent = list(messages[-self.keep_recent:])
+        older = messages[: len(messages) - len(recent)]
+
+        # Recent turns: elide the largest until they fit, never drop them
+        contents = [m.content for m in recent]
+        costs = [m.tokens for m in recent]
+        over = sum(costs) - budget
+        for i in sorted(range(len(recent)), key=costs.__getitem__, reverse=True):
+            if over <= 0:
+                break
+            target = max(costs[i] - over - MESSAGE_OVERHEAD_TOKENS, MIN_ELIDED_TOKENS)
+            if target >= costs[i] - MESSAGE_OVERHEAD_TOKENS:
+                continue
+            contents[i] = elide(contents[i], target)
+            new_cost = estimate_tokens(contents[i]) + MESSAGE_OVERHEAD_TOKENS
+            window.trimmed_tokens += costs[i] - new_cost
+            window.elided_messages += 1
+            over -= costs[i] - new_cost
+            costs[i] = new_cost
+        remaining = budget - sum(costs)
+
+        # Older turns: newest first while they fit, then one elided, then stop
+        kept: List[Dict[str, str]] = []
+        for msg in reversed(older):
+            if msg.tokens <= remaining:
+                kept.append(msg.to_chat())
+                remaining -= msg.tokens
+                continue
+            if remaining - MESSAGE_OVERHEAD_TOKENS >= MIN_ELIDED_TOKENS:
+                content = elide(msg.content, remaining - MESSAGE_OVERHEAD_TOKENS)
+                kept.append(msg.to_chat(content))
+                cost = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+                window.trimmed_tokens += msg.tokens - cost
+                window.elided_messages += 1
+                remaining -= cost
+            break
+
+        dropped = older[: len(older) - len(kept)]
+        window.dropped_messages = len(dropped)
+        window.trimmed_tokens += sum(m.tokens for m in dropped)
+        kept.reverse()
+
+        if window.dropped_messages:
+            dynamic.append(
+                f"(Se omitieron {window.dropped_messages} mensajes anteriores "
+                "de esta conversación por longitud.)"
+            )
+
+        window.messages = [{"role": "system", "content": system_prompt}]
+        if dynamic:
+            window.messages.append({"role": "system", "content": "\n\n".join(dynamic)})
+        window.messages.extend(kept)
+        window.messages.extend(
+            m.to_chat(content) for m, content in zip(recent, contents)
+        )
+        window.input_tokens = sum(
+            estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in window.messages
+        )
+        return window
@@ -0,0 +1,44 @@
+"""End-to-end deadline for one agent request"""
+
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request ran out of time"""
+
+
+class Deadline:
+    """Point in time by which a request must finish (None: no limit)
+
+    Created once per request and passed down to every stage, so provider
+    retries, tool timeouts and later loop steps all share one budget.
+    """
+
+    __slots__ = ("seconds", "expires_at")
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a deadline"""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def bound(self, timeout: Optional[float]) -> Optional[float]:
+        """The smaller of ``timeout`` and the time left"""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def check(self) -> None:
+        """Raise DeadlineExceeded if the deadline has passed"""
+        if self.expired:
+            raise DeadlineExceeded(f"deadline of {self.seconds:g}s exceeded")
@@ -0,0 +1,380 @@
+"""Background jobs - long shell/git commands run off the agent turn"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.tools import kill_process_tree
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Output kept per job (the end of it)
+MAX_OUTPUT_CHARS = 2000
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, TIMEOUT, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    command TEXT NOT NULL,
+    channel TEXT,
+    chat_id TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    returncode INTEGER,
+    output TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS idx_jobs_chat ON jobs (channel, chat_id);
+"""
+
+_COLUMNS = (
+    "id, kind, command, channel, chat_id, status, attempts, "
+    "created_at, started_at, finished_at, returncode, output"
+)
+
+# (channel, chat_id, text) -> sends a message to the chat that started the job
+Notifier = Callable[[str, str, str], Awaitable[None]]
+
+# (channel, chat_id) a request comes from
+Origin = Tuple[Optional[str], Optional[str]]
+
+
+@dataclass(slots=True)
+class Job:
+    """One queued command and where to report on it"""
+    id: int
+    kind: str  # "shell" or "git", for display
+    command: str
+    channel: Optional[str]
+    chat_id: Optional[str]
+    status: str
+    attempts: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    returncode: Optional[int] = None
+    output: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def belongs_to(self, origin: Origin) -> bool:
+        """Whether the job was started from the chat ``origin``"""
+        channel, chat_id = origin
+        return chat_id is not None and (self.channel, self.chat_id) == (channel, str(chat_id))
+
+    def describe(self) -> str:
+        """Status line shown to the user"""
+        line = f"Job #{self.id} ({self.kind}) {self.status}: {self.command[:100]}"
+        if self.returncode is not None:
+            line += f" [código {self.returncode}]"
+        return line
+
+
+class JobQueue:
+    """SQLite-backed queue of long commands run by ``workers`` tasks
+
+    ``submit`` stores the job and returns at once; workers run it with
+    ``timeout`` seconds of budget, send a progress message to the
+    originating chat every ``progress_interval`` seconds and a final one
+    with the end of the output. Jobs still queued when the process stops
+    run on the next ``start``; jobs it interrupted are marked failed (a
+    pull, commit or deploy is not safe to repeat) unless their kind is in
+    ``resume_kinds``, and then at most ``max_attempts`` times in total.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path = "./data/jobs.db",
+        workers: int = 2,
+        timeout: float = 1800,
+        progress_interval: float = 60,
+        notify: Optional[Notifier] = None,
+        resume_kinds: Iterable[str] = (),
+        max_attempts: int = 2,
+    ):
+        self.workers = max(workers, 1)
+        self.timeout = timeout
+        self.progress_interval = progress_interval
+        self.notify = notify
+        self.resume_kinds = frozenset(resume_kinds)
+        self.max_attempts = max(max_attempts, 1)
+        self._queue: "asyncio.Queue[int]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[int, asyncio.Task] = {}
+        self._closing = False
+        self.stats = {
+            "submitted": 0,
+            "resumed": 0,
+            "interrupted": 0,
+            "done": 0,
+            "failed": 0,
+            "timeout": 0,
+            "cancelled": 0,
+            "notify_errors": 0,
+        }
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    async def start(self) -> int:
+        """Re-queue unfinished jobs and start the workers; returns jobs queued"""
+        pending = await asyncio.to_thread(
+            self._query, "WHERE status IN (?, ?) ORDER BY id", (QUEUED, RUNNING)
+        )
+        resumed = 0
+        for job in pending:
+            if job.attempts >= self.max_attempts or (
+                job.status == RUNNING and job.kind not in self.resume_kinds
+            ):
+                await self._interrupted(job)
+                continue
+            if job.status == RUNNING:
+                # Interrupted by the restart, but safe to run again from the start
+                await asyncio.to_thread(self._update, job.id, status=QUEUED)
+                await self._send(
+                    job, f"🔄 Job #{job.id} reanudado tras reinicio: {job.command[:100]}"
+                )
+            self._queue.put_nowait(job.id)
+            resumed += 1
+        self.stats["resumed"] += resumed
+        if resumed:
+            logger.info(f"Resuming {resumed} background jobs")
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return resumed
+
+    async def _interrupted(self, job: Job) -> None:
+        """Fail a job a restart cut short, instead of repeating its side effects"""
+        job.status = FAILED
+        note = "interrumpido por un reinicio; no se repite automáticamente"
+        await asyncio.to_thread(
+            self._update, job.id, status=FAILED, finished_at=time.time(),
+            output=f"{job.output}\n[{note}]".strip(),
+        )
+        self.stats["interrupted"] += 1
+        logger.warning(f"Job #{job.id} interrupted by restart, marked failed")
+        await self._send(job, f"⚠️ Job #{job.id} {note}: {job.command[:100]}")
+
+    async def submit(
+        self,
+        kind: str,
+        command: str,
+        channel: Optional[str] = None,
+        chat_id: Optional[str] = None,
+    ) -> Job:
+        """Persist a job and queue it; returns without waiting for it to run"""
+        if chat_id is not None:
+            chat_id = str(chat_id)
+        job = await asyncio.to_thread(self._insert, kind, command, channel, chat_id)
+        self._queue.put_nowait(job.id)
+        self.stats["submitted"] += 1
+        logger.info(f"Job #{job.id} queued: {command[:100]}")
+        return job
+
+    async def get(self, job_id: int, origin: Optional[Origin] = None) -> Optional[Job]:
+        """A job by id; with ``origin``, only if that chat started it"""
+        jobs = await asyncio.to_thread(self._query, "WHERE id = ?", (job_id,))
+        if not jobs or (origin is not None and not jobs[0].belongs_to(origin)):
+            return None
+        return jobs[0]
+
+    async def list(self, origin: Optional[Origin] = None, limit: int = 10) -> List[Job]:
+        """
+        Most recent jobs of the chat ``origin``
+
+        Without an origin (the dashboard) jobs of every chat are listed; an
+        origin with no chat id lists nothing.
+        """
+        if origin is None:
+            return await asyncio.to_thread(self._query, "ORDER BY id DESC LIMIT ?", (limit,))
+        channel, chat_id = origin
+        if chat_id is None:
+            return []
+        return await asyncio.to_thread(
+            self._query,
+            "WHERE channel IS ? AND chat_id = ? ORDER BY id DESC LIMIT ?",
+            (channel, str(chat_id), limit),
+        )
+
+    async def cancel(self, job_id: int, origin: Optional[Origin] = None) -> bool:
+        """Cancel a queued or running job (its process tree is killed)"""
+        job = await self.get(job_id, origin)
+        if job is None or job.status in FINISHED:
+            return False
+        task = self._running.get(job_id)
+        if task:
+            task.cancel()
+        else:
+            # Still queued: the worker skips it
+            await asyncio.to_thread(self._update, job_id, status=CANCELLED, finished_at=time.time())
+            self.stats["cancelled"] += 1
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await self.get(job_id)
+                if job is None or job.status != QUEUED:
+                    continue
+                task = asyncio.create_task(self._run(job))
+                self._running[job_id] = task
+                try:
+                    await asyncio.shield(task)
+                except asyncio.CancelledError:
+                    # Either cancel() stopped the job, or the worker itself is
+                    # stopping; both can land as one CancelledError
+                    if self._closing:
+                        # Shutdown: kill the command
+                        task.cancel()
+                        await asyncio.wait({task})
+                        raise
+                finally:
+                    self._running.pop(job_id, None)
+            except Exception as e:
+                logger.error(f"Job #{job_id} worker error: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        started = time.time()
+        await asyncio.to_thread(
+            self._update, job.id, status=RUNNING, started_at=started, attempts=job.attempts + 1
+        )
+        proc = await asyncio.create_subprocess_shell(
+            job.command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            start_new_session=True,
+        )
+        output = bytearray()
+
+        async def pump() -> None:
+            while chunk := await proc.stdout.read(4096):
+                output.extend(chunk)
+                # Keep only the end; 4 bytes per char covers any UTF-8
+                del output[:-MAX_OUTPUT_CHARS * 4]
+
+        def tail() -> str:
+            return output.decode("utf-8", errors="replace")[-MAX_OUTPUT_CHARS:].strip()
+
+        reader = asyncio.create_task(pump())
+        status = DONE
+        try:
+            async with asyncio.timeout(self.timeout):
+                while True:
+                    done, _ = await asyncio.wait({reader}, timeout=self.progress_interval)
+                    if done:
+                        break
+                    last = tail().splitlines()[-1:] or [""]
+                    await self._send(
+                        job,
+                        f"⏳ Job #{job.id} sigue en ejecución ({time.time() - started:.0f}s)"
+                        + (f"\n{last[0][:300]}" if last[0] else ""),
+                    )
+                await proc.wait()
+            if proc.returncode != 0:
+                status = FAILED
+        except TimeoutError:
+            status = TIMEOUT
+        except asyncio.CancelledError:
+            # On shutdown the job stays "running"; the next start settles it
+            status = RUNNING if self._closing else CANCELLED
+            raise
+        finally:
+            if proc.returncode is None:
+                kill_process_tree(proc)
+                await proc.wait()
+            reader.cancel()
+            if status != RUNNING:
+                await asyncio.shield(self._finish(job, status, proc.returncode, tail(), started))
+
+    async def _finish(
+        self, job: Job, status: str, returncode: Optional[int], output: str, started: float
+    ) -> None:
+        finished = time.time()
+        job.status, job.returncode, job.output = status, returncode, output
+        self.stats[status] += 1
+        await asyncio.to_thread(
+            self._update, job.id, status=status, finished_at=finished,
+            returncode=returncode, output=output,
+        )
+        logger.info(f"Job #{job.id} {status} in {finished - started:.1f}s")
+        await self._send(job, self._summary(job, finished - started))
+
+    def _summary(self, job: Job, seconds: float) -> str:
+        header = {
+            DONE: f"✅ Job #{job.id} terminó ({seconds:.0f}s)",
+            FAILED: f"❌ Job #{job.id} falló (código {job.returncode}, {seconds:.0f}s)",
+            TIMEOUT: f"⏱️ Job #{job.id} excedió el tiempo límite ({self.timeout:g}s)",
+            CANCELLED: f"🛑 Job #{job.id} cancelado",
+        }[job.status]
+        body = f"{header}: {job.command[:100]}"
+        return f"{body}\n\n{job.output}" if job.output else body
+
+    async def _send(self, job: Job, text: str) -> None:
+        if not self.notify or not job.chat_id:
+            return
+        try:
+            await self.notify(job.channel or "", job.chat_id, text)
+        except Exception as e:
+            self.stats["notify_errors"] += 1
+            logger.warning(f"Could not notify job #{job.id}: {e}")
+
+    def _insert(
+        self, kind: str, command: str, channel: Optional[str], chat_id: Optional[str]
+    ) -> Job:
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (kind, command, channel, chat_id, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, command, channel, chat_id, QUEUED, now),
+            )
+        return Job(cursor.lastrowid, kind, command, channel, chat_id, QUEUED, 0, now)
+
+    def _update(self, job_id: int, **fields: Any) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id)
+            )
+
+    def _query(self, clause: str, params: tuple) -> List[Job]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs {clause}", params).fetchall()
+        return [Job(*row) for row in rows]
+
+    def report(self) -> Dict[str, int]:
+        return {**self.stats, "queued": self._queue.qsize(), "running": len(self._running)}
+
+    async def close(self) -> None:
+        """Stop the workers; the next start settles the jobs they interrupted"""
+        self._closing = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        with self._lock:
+            self._conn.close()
@@ -2,13 +2,22 @@
 
 import asyncio
 import json
-from typing import Optional, Dict, Any, List
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 
 from app.config import Settings
 from app.utils import get_logger
 from app.core.context import AgentContext, Message
-from app.core.tools import ToolExecutor
+from app.core.context import estimate_tokens
+from app.core.context_builder import ContextBuilder, elide
+from app.core.deadline import Deadline
+from app.core.jobs import JobQueue
+from app.core.memory_index import MemoryIndex, format_chunks
+from app.core.prompt import SystemPromptCompiler
+from app.core.scheduler import INTERACTIVE, LLMScheduler, SchedulerBusy
+from app.core.skills import SkillRegistry
+from app.core.tools import TOOL_SCHEMAS, ToolExecutor
 from app.cloud.providers import ProviderManager
 
 logger = get_logger(__name__)
@@ -17,43 +26,160 @@ logger = get_logger(__name__)
 class AgentLoop:
     """Main agent loop for processing user messages"""
 
-    def __init__(self, settings: Settings, provider_manager: ProviderManager):
+    def __init__(
+        self,
+        settings: Settings,
+        provider_manager: ProviderManager,
+        scheduler: Optional[LLMScheduler] = None,
+        jobs: Optional[JobQueue] = None,
+        memory_index: Optional[MemoryIndex] = None,
+    ):
         self.settings = settings
         self.provider_manager = provider_manager
-        self.tool_executor = ToolExecutor()
+        self.scheduler = scheduler or LLMScheduler(
+            max_in_flight=settings.llm_max_in_flight,
+            max_queue=settings.llm_max_queue,
+            max_queue_per_user=settings.llm_max_queue_per_user,
+            max_background=settings.llm_max_background,
+        )
+        self.tool_executor = ToolExecutor(jobs=jobs)
+        self.prompt_compiler = SystemPromptCompiler()
+        self.memory_index = memory_index or MemoryIndex()
+        self.skills = SkillRegistry()
+        self.loop_stats = {
+            "turns": 0,
+            "steps": 0,
+            "tool_calls": 0,
+            "tool_timeouts": 0,
+            "step_limit_hits": 0,
+            "streamed_steps": 0,
+            "first_delta_seconds": 0.0,
+            "llm_seconds": 0.0,
+            "cancelled_turns": 0,
+            "deadline_exceeded": 0,
+            "provider_seconds_saved": 0.0,
+        }
+        self.context_stats = {
+            "calls": 0,
+            "input_tokens": 0,
+            "trimmed_tokens": 0,
+            "dropped_messages": 0,
+            "elided_messages": 0,
+        }
 
-    async def process_message(self, ctx: AgentContext) -> str:
+    async def process_message(
+        self,
+        ctx: AgentContext,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> str:
         """
         Process user message and generate response
-        
+
+        Runs a bounded agent loop: call the model, execute the tool calls it
+        requested (concurrently), feed the results back and repeat until it
+        answers without tools or ``tool_max_steps`` is reached. On the last
+        step tool use is disabled so the model has to answer.
+
+        With ``on_delta`` the model output is streamed: the callback gets the
+        text of every step as it is generated (steps separated by a blank
+        line), so the caller can show it before the answer is complete.
+
+        The whole turn - queueing, model calls with their retries and tool
+        runs - shares one ``deadline`` (``request_deadline_seconds`` by
+        default). Cancelling the task (``/cancel``) stops the in-flight call
+        and kills running commands.
+
         Args:
             ctx: AgentContext with user message
-            
+            on_delta: Optional async callback for streamed text
+            deadline: Deadline for the whole turn
         Returns:
             Response text
         """
+        deadline = deadline or Deadline(self.settings.request_deadline_seconds or None)
+        llm_started = None  # set while a model call is in flight
+        pending_calls: List[Dict[str, Any]] = []  # requested tools without results yet
         try:
             # Get LLM provider
             provider = self.provider_manager.get_provider()
             logger.info(f"Using provider: {provider.__class__.__name__}")
+            self.loop_stats["turns"] += 1
+            # Retrieved once per turn, fresh each turn; every step reuses it
+            retrieved = self._retrieved_context(ctx)
+
+            max_steps = max(self.settings.tool_max_steps, 1)
+            streamed = False
+            for step in range(1, max_steps + 1):
+                # Prepare messages for LLM
+                messages = self._format_messages(ctx, provider, retrieved)
+                tool_choice = "auto" if step < max_steps else "none"
 
-            # Prepare messages for LLM
-            messages = self._format_messages(ctx)
+                # Call LLM
+                deadline.check()
+                async with asyncio.timeout(deadline.remaining()):
+                    # Only a new turn can be turned away; later steps always queue
+                    async with self.scheduler.slot(ctx.user_id, INTERACTIVE, can_reject=step == 1):
+                        llm_started = time.perf_counter()
+                        if on_delta and hasattr(provider, "stream"):
+                            llm_response = await self._stream_step(
+                                messages, tool_choice, on_delta, separate=streamed
+                            )
+                            streamed = streamed or bool(llm_response.get("text"))
+                        else:
+                            llm_response = await provider.call(
+                                messages, tools=TOOL_SCHEMAS, tool_choice=tool_choice,
+                                deadline=deadline,
+                            )
+                        llm_seconds = time.perf_counter() - llm_started
+                        llm_started = None
+                self.loop_stats["steps"] += 1
+                self.loop_stats["llm_seconds"] = round(
+                    self.loop_stats["llm_seconds"] + llm_seconds, 3
+                )
 
-            # Call LLM
-            logger.info(f"Calling LLM with {len(messages)} messages")
-            llm_response = await provider.call(messages)
+                response_text = llm_response.get("text", "")
+                tool_calls = llm_response.get("tool_calls", [])
 
-            # Parse response
-            response_text = llm_response.get("text", "")
-            tool_calls = llm_response.get("tool_calls", [])
+                if tool_calls and step == max_steps:
+                    # Tool use was disabled on the last step; do not run more
+                    self.loop_stats["step_limit_hits"] += 1
+                    logger.warning(f"Step limit reached ({max_steps}), ignoring tool calls")
+                    tool_calls = []
+                    response_text = response_text or (
+                        f"No pude completar la tarea en {max_steps} pasos."
+                    )
 
-            # Execute tools if needed
-            if tool_calls:
-                logger.info(f"Executing {len(tool_calls)} tool calls")
-                for tool_call in tool_calls:
-                    tool_result = await self.tool_executor.execute(tool_call)
-                    ctx.add_message("tool", tool_result, metadata={"tool": tool_call.get("name")})
+                if not tool_calls:
+                    logger.info(
+                        f"Step {step}/{max_steps}: LLM {llm_seconds:.2f}s "
+                        f"({len(messages)} messages), final answer"
+                    )
+                    break
+
+                # Record the request, run the tools, feed results back
+                ctx.add_message("assistant", response_text, metadata={"tool_calls": tool_calls})
+                pending_calls = tool_calls
+                started = time.perf_counter()
+                # Background jobs report back to the chat the turn came from
+                origin = (ctx.channel, ctx.state.get("chat_id"))
+                results = await self._execute_tools(tool_calls, deadline, origin)
+                tools_seconds = time.perf_counter() - started
+
+                for tool_call, result in zip(tool_calls, results):
+                    ctx.add_message(
+                        "tool",
+                        result,
+                        metadata={
+                            "tool": tool_call.get("name"),
+                            "tool_call_id": tool_call.get("id"),
+                        },
+                    )
+                pending_calls = []
+                logger.info(
+                    f"Step {step}/{max_steps}: LLM {llm_seconds:.2f}s "
+                    f"({len(messages)} messages), {len(tool_calls)} tools in {tools_seconds:.2f}s"
+                )
 
             # Add assistant response
             ctx.add_message("assistant", response_text)
@@ -61,74 +187,230 @@ class AgentLoop:
 
             return response_text
 
+        except asyncio.CancelledError:
+            self._account_abort(llm_started)
+            self.loop_stats["cancelled_turns"] += 1
+            logger.info(f"Turn cancelled: {ctx.session_id}")
+            self._close_pending_calls(ctx, pending_calls)
+            ctx.add_message(
+                "assistant", "🛑 Cancelado.", metadata={"error": True, "cancelled": True}
+            )
+            raise
+
+        except TimeoutError as e:
+            self._close_pending_calls(ctx, pending_calls)
+            if not deadline.expired:
+                # A timeout from below (tool, provider), not the turn deadline
+                return self._error_reply(ctx, e)
+            self._account_abort(llm_started)
+            self.loop_stats["deadline_exceeded"] += 1
+            logger.warning(f"Turn exceeded its deadline ({deadline.seconds:g}s): {ctx.session_id}")
+            timeout_msg = f"⏱️ La solicitud excedió el tiempo límite ({deadline.seconds:g}s)."
+            ctx.add_message("assistant", timeout_msg, metadata={"error": True, "deadline": True})
+            return timeout_msg
+
+        except SchedulerBusy:
+            busy_msg = "⏳ Estoy atendiendo muchas solicitudes, intenta de nuevo en un momento."
+            ctx.add_message("assistant", busy_msg, metadata={"error": True, "busy": True})
+            return busy_msg
+
         except Exception as e:
-            logger.error(f"Error processing message: {e}", exc_info=True)
-            error_msg = f"Disculpa, ocurrió un error: {str(e)[:100]}"
-            ctx.add_message("assistant", error_msg, metadata={"error": True})
-            return error_msg
+            self._close_pending_calls(ctx, pending_calls)
+            return self._error_reply(ctx, e)
 
-    def _format_messages(self, ctx: AgentContext) -> List[Dict[str, str]]:
-        """Format context messages for LLM API"""
-        formatted = []
+    @staticmethod
+    def _close_pending_calls(ctx: AgentContext, tool_calls: List[Dict[str, Any]]) -> None:
+        """Give every requested tool call a result, so the history stays valid"""
+        for tool_call in tool_calls:
+            ctx.add_message(
+                "tool",
+                f"❌ {tool_call.get('name')} cancelado: la solicitud se interrumpió",
+                metadata={
+                    "tool": tool_call.get("name"),
+                    "tool_call_id": tool_call.get("id"),
+                    "cancelled": True,
+                },
+            )
 
-        # Add system prompt
-        system_prompt = self._build_system_prompt(ctx)
-        formatted.append({"role": "system", "content": system_prompt})
+    def _error_reply(self, ctx: AgentContext, e: Exception) -> str:
+        logger.error(f"Error processing message: {e}", exc_info=True)
+        error_msg = f"Disculpa, ocurrió un error: {str(e)[:100]}"
+        ctx.add_message("assistant", error_msg, metadata={"error": True})
+        return error_msg
 
-        # Add conversation history
-        for msg in ctx.messages:
-            formatted.append({"role": msg.role, "content": msg.content})
+    async def _stream_step(
+        self,
+        messages: List[Dict[str, Any]],
+        tool_choice: str,
+        on_delta: Callable[[str], Awaitable[None]],
+        separate: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        One streamed model call, forwarding text deltas
+
+        Goes through the provider manager, which falls back to Anthropic if
+        the primary fails before its first event.
+        """
+        started = time.perf_counter()
+        first = True
+        result: Dict[str, Any] = {}
+        events = self.provider_manager.stream(messages, tools=TOOL_SCHEMAS, tool_choice=tool_choice)
+        async for event in events:
+            if event["type"] == "done":
+                result = event
+            elif event["text"]:
+                if first:
+                    first = False
+                    self.loop_stats["first_delta_seconds"] = round(
+                        self.loop_stats["first_delta_seconds"] + time.perf_counter() - started, 3
+                    )
+                    if separate:
+                        await on_delta("\n\n")
+                await on_delta(event["text"])
+        self.loop_stats["streamed_steps"] += 1
+        return result
+
+    def _account_abort(self, llm_started: Optional[float]) -> None:
+        """
+        Estimate provider time saved by stopping an in-flight model call
 
-        return formatted
+        Counted as the average completed call minus the time already spent
+        (aborting the request closes its connection, so generation stops).
+        """
+        steps = self.loop_stats["steps"]
+        if llm_started is None or not steps:
+            return
+        elapsed = time.perf_counter() - llm_started
+        saved = max(self.loop_stats["llm_seconds"] / steps - elapsed, 0.0)
+        self.loop_stats["provider_seconds_saved"] = round(
+            self.loop_stats["provider_seconds_saved"] + saved, 3
+        )
+
+    async def _execute_tools(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        deadline: Optional[Deadline] = None,
+        origin: Tuple[Optional[str], Optional[str]] = (None, None),
+    ) -> List[str]:
+        """
+        Run the tool calls of one step concurrently
+
+        At most ``tool_concurrency`` run at once and each is bounded by
+        ``tool_timeout`` seconds and the turn deadline. Results keep the
+        order of ``tool_calls``.
+        """
+        semaphore = asyncio.Semaphore(max(self.settings.tool_concurrency, 1))
+        deadline = deadline or Deadline()
+        timeout = deadline.bound(self.settings.tool_timeout)
+
+        async def run(tool_call: Dict[str, Any]) -> str:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(
+                        self.tool_executor.execute(tool_call, deadline=deadline, origin=origin),
+                        timeout,
+                    )
+                except asyncio.TimeoutError:
+                    self.loop_stats["tool_timeouts"] += 1
+                    logger.warning(f"Tool timed out after {timeout}s: {tool_call.get('name')}")
+                    return f"❌ {tool_call.get('name')} excedió timeout ({timeout:g}s)"
+
+        self.loop_stats["tool_calls"] += len(tool_calls)
+        return await asyncio.gather(*(run(tool_call) for tool_call in tool_calls))
+
+    def _format_messages(
+        self, ctx: AgentContext, provider: Any = None, retrieved: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """Format context messages for LLM API, within the provider's input budget"""
+        builder = ContextBuilder(
+            max_input_tokens=getattr(provider, "max_input_tokens", None)
+            or self.settings.context_max_input_tokens,
+            keep_recent=self.settings.context_keep_recent,
+        )
+        window = builder.build(
+            self.prompt_compiler.compile(),
+            ctx.messages,
+            summary=ctx.state.get("summary"),
+            system_context=self._build_system_context(ctx),
+            turn_context=self._retrieved_context(ctx) if retrieved is None else retrieved,
+        )
+
+        stats = self.context_stats
+        stats["calls"] += 1
+        stats["input_tokens"] += window.input_tokens
+        stats["trimmed_tokens"] += window.trimmed_tokens
+        stats["dropped_messages"] += window.dropped_messages
+        stats["elided_messages"] += window.elided_messages
+        if window.trimmed_tokens:
+            logger.info(
+                f"Context trimmed: {window.trimmed_tokens} tokens "
+                f"({window.dropped_messages} dropped, {window.elided_messages} elided), "
+                f"~{window.input_tokens} input tokens"
+            )
+
+        return window.messages
 
     def _build_system_prompt(self, ctx: AgentContext) -> str:
-        """Build system prompt with context information"""
-        prompt = """Eres Nanobot, asistente personal de desarrollo de QUINTANA (Julian Juarez).
-
-## Tu Rol
-- Senior developer assistant
-- Especialista en: Python, JavaScript, DevOps, cloud deployment
-- Acceso a herramientas: shell, files, git, web
-
-## Comunicación
-- Siempre en español
-- Breve y al grano (máximo 4 líneas salvo que pida detalle)
-- Técnico y directo
-- Muestra output real de comandos
-
-## Herramientas Disponibles
-Puedes usar:
-- execute_shell(command) → output
-- read_file(path) → content
-- write_file(path, content)
-- git_operation(cmd)
-- web_fetch(url)
-
-Llama herramientas cuando sea necesario para ayudar."""
-
-        # Add user context if available
-        if hasattr(ctx, 'user_id'):
-            prompt += f"\n\nUsuario: {ctx.user_id}"
-        if hasattr(ctx, 'channel'):
-            prompt += f"\nCanal: {ctx.channel}"
-
-        return prompt
+        """Full system prompt as sent: compiled static prompt plus per-session context"""
+        return f"{self.prompt_compiler.compile()}\n\n{self._build_system_context(ctx)}"
+
+    def _build_system_context(self, ctx: AgentContext) -> str:
+        """Per-session system text, kept out of the cached static prompt"""
+        return f"Usuario: {ctx.user_id}\nCanal: {ctx.channel}"
+
+    def _retrieved_context(self, ctx: AgentContext) -> str:
+        """
+        Memory sections and skills that match the latest user message
+
+        Sent with that message, after the history, so a change between turns
+        does not invalidate the provider's cached prompt prefix.
+        """
+        query = next((m.content for m in reversed(ctx.messages) if m.role == "user"), "")
+        if not query:
+            return ""
+
+        sections = []
+        memory = self._relevant_memory(query)
+        if memory:
+            sections.append(f"## Memoria relevante\n{memory}")
+        sections.extend(self._relevant_skills(query))
+        return "\n\n".join(sections)
+
+    def _relevant_memory(self, query: str) -> str:
+        """Workspace memory sections for a request, within memory_max_tokens"""
+        top_k = self.settings.memory_top_k
+        if top_k <= 0:
+            return ""
+        budget = self.settings.memory_max_tokens
+        kept, used = [], 0
+        for score, chunk in self.memory_index.search(query, top_k):
+            cost = estimate_tokens(chunk.text)
+            if kept and used + cost > budget:
+                break
+            kept.append((score, chunk))
+            used += cost
+        return elide(format_chunks(kept), budget) if kept else ""
+
+    def _relevant_skills(self, query: str) -> List[str]:
+        """Bodies of the skills that match a request, each within skill_max_tokens"""
+        if self.settings.skill_top_k <= 0:
+            return []
+        sections = []
+        for score, name in self.skills.match(
+            query, k=self.settings.skill_top_k, min_score=self.settings.skill_min_score
+        ):
+            body = self.skills.load(name)
+            if body:
+                logger.info(f"Skill loaded for this turn: {name} (score {score:.2f})")
+                sections.append(f"## Skill: {name}\n{elide(body, self.settings.skill_max_tokens)}")
+        return sections
 
     async def handle_tool_response(self, tool_response: str, ctx: AgentContext) -> str:
         """Handle tool response and generate follow-up"""
         try:
-            # Add tool response to context
+            # Add tool response to context and continue the agent loop
             ctx.add_message("tool", tool_response)
-
-            # Get provider and call LLM again
-            provider = self.provider_manager.get_provider()
-            messages = self._format_messages(ctx)
-
-            llm_response = await provider.call(messages)
-            response_text = llm_response.get("text", "")
-
-            ctx.add_message("assistant", response_text)
-            return response_text
+            return await self.process_message(ctx)
 
         except Exception as e:
             logger.error(f"Error handling tool response: {e}")
@@ -1,10 +1,10 @@
 """Persistent memory management for Nanobot"""
 
-import json
 from pathlib import Path
 from typing import Any, Optional, Dict, List
 from datetime import datetime
 
+from app.core.memory_index import MemoryIndex, format_chunks
 from app.utils import get_logger
 
 logger = get_logger(__name__)
@@ -13,10 +13,12 @@ logger = get_logger(__name__)
 class Memory:
     """File-based memory for agent state and history"""
 
-    def __init__(self, workspace_path: str | Path):
+    def __init__(self, workspace_path: str | Path, index: Optional[MemoryIndex] = None):
         self.workspace_path = Path(workspace_path)
         self.memory_file = self.workspace_path / "memory" / "MEMORY.md"
         self.memory_file.parent.mkdir(parents=True, exist_ok=True)
+        # Shared with the agent loop when given, so the workspace is indexed once
+        self.index = index or MemoryIndex(self.workspace_path)
         logger.info(f"Memory initialized: {self.memory_file}")
 
     def load(self) -> Dict[str, Any]:
@@ -38,36 +40,18 @@ class Memory:
         except Exception as e:
             logger.error(f"Error saving memory: {e}")
 
-    async def append_session(
-        self, session_id: str, messages: List[Any]
-    ) -> None:
-        """Append session messages to JSONL log"""
-        try:
-            sessions_dir = self.workspace_path / "data" / "sessions"
-            sessions_dir.mkdir(parents=True, exist_ok=True)
-
-            session_file = sessions_dir / f"{session_id}.jsonl"
-
-            with open(session_file, "a", encoding="utf-8") as f:
-                for msg in messages:
-                    try:
-                        # Handle Message objects
-                        if hasattr(msg, 'to_dict'):
-                            msg_data = msg.to_dict()
-                        else:
-                            msg_data = msg
-
-                        f.write(json.dumps(msg_data) + "\n")
-                    except Exception as e:
-                        logger.error(f"Error serializing message: {e}")
-
-            logger.debug(f"Session appended: {session_id}")
-
-        except Exception as e:
-            logger.error(f"Error appending session: {e}")
-
-    def get_memory_context(self) -> str:
-        """Get memory content for LLM context"""
+    def search(self, query: str, k: int = 4) -> List[Dict[str, Any]]:
+        """Workspace memory sections most relevant to a query (BM25)"""
+        return [
+            {"path": chunk.path, "heading": chunk.heading, "line": chunk.line,
+             "score": round(score, 3), "content": chunk.text}
+            for score, chunk in self.index.search(query, k)
+        ]
+
+    def get_memory_context(self, query: Optional[str] = None, k: int = 4) -> str:
+        """Get memory content for LLM context (only the top-k sections for a query)"""
+        if query is not None:
+            return format_chunks(self.index.search(query, k))
         try:
             if self.memory_file.exists():
                 return self.memory_file.read_text(encoding="utf-8")
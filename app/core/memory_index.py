@@ -0,0 +1,247 @@
+"""BM25 retrieval over workspace markdown, chunked by heading"""
+
+import math
+import re
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.prompt import WORKSPACE_FILES
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Sections longer than this are split further at paragraph breaks
+MAX_CHUNK_CHARS = 1500
+# Skills are loaded on demand by name, not retrieved
+_SKIPPED_DIRS = frozenset({"skills"})
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_TOKEN = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a al algo como con de del el en es esta este for in is la las lo los "
+    "mi no o of on para por que se si su the to un una y".split()
+)
+
+
+@dataclass(slots=True)
+class Chunk:
+    """One heading section of a markdown file"""
+    path: str  # relative to the workspace
+    heading: str  # "Title > Section > Subsection"
+    text: str
+    line: int  # 1-based line where the section starts
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, accent-insensitive word tokens without stopwords"""
+    folded = unicodedata.normalize("NFKD", text.casefold())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return [t for t in _TOKEN.findall(folded) if t not in _STOPWORDS]
+
+
+def _split_long(text: str, max_chars: int) -> Iterable[str]:
+    if len(text) <= max_chars:
+        yield text
+        return
+    part = ""
+    for paragraph in text.split("\n\n"):
+        if part and len(part) + len(paragraph) + 2 > max_chars:
+            yield part
+            part = ""
+        part = f"{part}\n\n{paragraph}" if part else paragraph
+    if part:
+        yield part
+
+
+def chunk_markdown(text: str, path: str, max_chars: int = MAX_CHUNK_CHARS) -> List[Chunk]:
+    """Split markdown at headings (outside code fences) into chunks"""
+    chunks: List[Chunk] = []
+    trail: List[Tuple[int, str]] = []
+    body: List[str] = []
+    start = 1
+    in_fence = False
+
+    def flush() -> None:
+        content = "\n".join(body).strip()
+        if content:
+            heading = " > ".join(title for _, title in trail)
+            for part in _split_long(content, max_chars):
+                chunks.append(Chunk(path=path, heading=heading, text=part, line=start))
+
+    for number, line in enumerate(text.splitlines(), 1):
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING.match(line)
+        if not match:
+            body.append(line)
+            continue
+        flush()
+        level = len(match.group(1))
+        trail = [(lvl, title) for lvl, title in trail if lvl < level]
+        trail.append((level, match.group(2)))
+        body, start = [], number
+    flush()
+    return chunks
+
+
+class MemoryIndex:
+    """Inverted BM25 index over the workspace's markdown files
+
+    Files already compiled into the system prompt (``exclude``) and skills
+    are left out. ``search`` refreshes the index first, at most every
+    ``check_interval`` seconds: one stat per file, and only files whose
+    size or mtime changed are re-chunked and re-indexed.
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(
+        self,
+        workspace_path: str | Path = "./workspace",
+        exclude: Tuple[str, ...] = WORKSPACE_FILES,
+        check_interval: float = 5.0,
+    ):
+        self.workspace_path = Path(workspace_path)
+        self.exclude = frozenset(exclude)
+        self.check_interval = check_interval
+        self._files: Dict[str, Tuple[Tuple[int, int], List[int]]] = {}
+        self._chunks: Dict[int, Chunk] = {}
+        self._lengths: Dict[int, int] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._total_length = 0
+        self._norms: Optional[Dict[int, float]] = None  # length norms, reset on change
+        self._next_id = 0
+        self._checked_at = float("-inf")
+        self.stats = {"files_indexed": 0, "refreshes": 0, "queries": 0, "last_query_ms": 0.0}
+
+    def _markdown_files(self) -> Dict[str, Path]:
+        files = {}
+        for path in self.workspace_path.rglob("*.md"):
+            relative = path.relative_to(self.workspace_path)
+            if relative.parts[0] in _SKIPPED_DIRS or str(relative) in self.exclude:
+                continue
+            files[relative.as_posix()] = path
+        return files
+
+    def refresh(self, force: bool = False) -> int:
+        """Re-index changed files; returns how many were (re)indexed or dropped"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return 0
+        self._checked_at = now
+
+        current = self._markdown_files()
+        changed = 0
+        for name in set(self._files) - set(current):
+            self._drop(name)
+            changed += 1
+        for name, path in current.items():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            signature = (st.st_mtime_ns, st.st_size)
+            indexed = self._files.get(name)
+            if indexed and indexed[0] == signature:
+                continue
+            if indexed:
+                self._drop(name)
+            try:
+                text = path.read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError) as e:
+                logger.warning(f"Skipping {name} in memory index: {e}")
+                continue
+            self._add(name, signature, chunk_markdown(text, name))
+            changed += 1
+
+        if changed:
+            self._norms = None
+            self.stats["files_indexed"] += changed
+            self.stats["refreshes"] += 1
+            logger.info(
+                f"Memory index refreshed: {changed} files, "
+                f"{len(self._chunks)} chunks, {len(self._postings)} terms"
+            )
+        return changed
+
+    def _add(self, name: str, signature: Tuple[int, int], chunks: List[Chunk]) -> None:
+        ids = []
+        for chunk in chunks:
+            chunk_id = self._next_id
+            self._next_id += 1
+            terms = tokenize(f"{chunk.heading}\n{chunk.text}")
+            for term, tf in Counter(terms).items():
+                self._postings.setdefault(term, {})[chunk_id] = tf
+            self._chunks[chunk_id] = chunk
+            self._lengths[chunk_id] = len(terms)
+            self._total_length += len(terms)
+            ids.append(chunk_id)
+        self._files[name] = (signature, ids)
+
+    def _drop(self, name: str) -> None:
+        _, ids = self._files.pop(name)
+        for chunk_id in ids:
+            chunk = self._chunks.pop(chunk_id)
+            self._total_length -= self._lengths.pop(chunk_id)
+            for term in set(tokenize(f"{chunk.heading}\n{chunk.text}")):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[float, Chunk]]:
+        """Top ``k`` chunks for a query, best first (only positive scores)"""
+        self.refresh()
+        started = time.perf_counter()
+        n = len(self._chunks)
+        if not n or k <= 0:
+            return []
+
+        norms = self._norms
+        if norms is None:
+            avg_length = self._total_length / n or 1
+            k1, b = self.k1, self.b
+            norms = self._norms = {
+                chunk_id: k1 * (1 - b + b * length / avg_length)
+                for chunk_id, length in self._lengths.items()
+            }
+
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            weight = math.log(1 + (n - df + 0.5) / (df + 0.5)) * (self.k1 + 1)
+            for chunk_id, tf in postings.items():
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + weight * tf / (tf + norms[chunk_id])
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        self.stats["queries"] += 1
+        self.stats["last_query_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return [(score, self._chunks[chunk_id]) for chunk_id, score in best]
+
+    def report(self) -> Dict[str, float]:
+        return {
+            **self.stats,
+            "files": len(self._files),
+            "chunks": len(self._chunks),
+            "terms": len(self._postings),
+        }
+
+
+def format_chunks(results: List[Tuple[float, Chunk]], max_chars: Optional[int] = None) -> str:
+    """Retrieved chunks as prompt text, each under its file and heading"""
+    sections = []
+    for _, chunk in results:
+        text = chunk.text if max_chars is None else chunk.text[:max_chars]
+        title = f"{chunk.path} — {chunk.heading}" if chunk.heading else chunk.path
+        sections.append(f"### {title}\n{text}")
+    return "\n\n".join(sections)
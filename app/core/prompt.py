@@ -0,0 +1,103 @@
+"""System prompt compiled from a template plus workspace files"""
+
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+BASE_PROMPT = """Eres Nanobot, asistente personal de desarrollo de QUINTANA (Julian Juarez).
+
+## Tu Rol
+- Senior developer assistant
+- Especialista en: Python, JavaScript, DevOps, cloud deployment
+- Acceso a herramientas: shell, files, git, web
+
+## Comunicación
+- Siempre en español
+- Breve y al grano (máximo 4 líneas salvo que pida detalle)
+- Técnico y directo
+- Muestra output real de comandos
+
+## Herramientas Disponibles
+Puedes usar:
+- execute_shell(command) → output
+- read_file(path) → content
+- write_file(path, content)
+- git_operation(cmd)
+- web_fetch(url)
+
+Llama herramientas cuando sea necesario para ayudar."""
+
+# Appended in this order; the compiled prompt must be byte-identical across
+# calls so providers can cache it as a prefix
+WORKSPACE_FILES = ("SOUL.md", "USER.md")
+
+
+class SystemPromptCompiler:
+    """Static system prompt: BASE_PROMPT followed by the workspace files
+
+    The prompt is compiled once and reused; workspace files are re-checked
+    (one stat each) at most every ``check_interval`` seconds and the prompt
+    is recompiled only when one of them changed. Per-user or per-call text
+    does not belong here - it would break the cached prefix.
+    """
+
+    def __init__(
+        self,
+        workspace_path: str | Path = "./workspace",
+        files: Tuple[str, ...] = WORKSPACE_FILES,
+        check_interval: float = 5.0,
+    ):
+        self.workspace_path = Path(workspace_path)
+        self.files = files
+        self.check_interval = check_interval
+        self.compilations = 0
+        self._prompt: Optional[str] = None
+        self._signature: Optional[Tuple] = None
+        self._checked_at = float("-inf")
+
+    def _file_signature(self) -> Tuple:
+        signature = []
+        for name in self.files:
+            try:
+                st = (self.workspace_path / name).stat()
+                signature.append((name, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append((name, None, None))
+        return tuple(signature)
+
+    def compile(self) -> str:
+        """The current system prompt, recompiled only if workspace files changed"""
+        now = time.monotonic()
+        if self._prompt is not None and now - self._checked_at < self.check_interval:
+            return self._prompt
+        self._checked_at = now
+
+        signature = self._file_signature()
+        if signature == self._signature:
+            return self._prompt
+
+        sections: List[str] = [BASE_PROMPT]
+        for name in self.files:
+            path = self.workspace_path / name
+            try:
+                text = path.read_text(encoding="utf-8").strip()
+            except FileNotFoundError:
+                continue
+            if text:
+                sections.append(text)
+
+        self._prompt = "\n\n".join(sections)
+        self._signature = signature
+        self.compilations += 1
+        logger.info(
+            f"System prompt compiled ({len(self._prompt)} chars, "
+            f"{len(sections) - 1} workspace files)"
+        )
+        return self._prompt
+
+    def stats(self) -> Dict[str, int]:
+        return {"compilations": self.compilations, "chars": len(self._prompt or "")}
@@ -0,0 +1,151 @@
+"""Admission control for LLM calls - global limit, per-user fair queuing"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict
+
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+
+class SchedulerBusy(Exception):
+    """The queue is full; the request was rejected instead of queued"""
+
+
+class LLMScheduler:
+    """Grant at most ``max_in_flight`` concurrent LLM calls
+
+    Waiting calls are queued per priority class and, within a class, per
+    user; slots go to interactive calls first and rotate round-robin across
+    users, so one chat's burst cannot starve the others. Background calls
+    (summaries...) never hold more than ``max_background`` slots, leaving
+    room for interactive ones. When ``max_queue`` calls (or
+    ``max_queue_per_user`` for one user) are already waiting, new calls are
+    rejected with SchedulerBusy unless ``can_reject`` is False.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 4,
+        max_queue: int = 32,
+        max_queue_per_user: int = 4,
+        max_background: int = 1,
+    ):
+        self.max_in_flight = max(max_in_flight, 1)
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.max_background = max(min(max_background, self.max_in_flight), 1)
+        self._queues: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+        self._in_flight = {priority: 0 for priority in PRIORITIES}
+        self._queued = 0
+        self._stats = {
+            priority: {"admitted": 0, "rejected": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+            for priority in PRIORITIES
+        }
+
+    @asynccontextmanager
+    async def slot(
+        self, user_id: str, priority: str = INTERACTIVE, can_reject: bool = True
+    ) -> AsyncIterator[None]:
+        """Hold one LLM slot for the duration of the block"""
+        await self._acquire(user_id, priority, can_reject)
+        try:
+            yield
+        finally:
+            self._in_flight[priority] -= 1
+            self._dispatch()
+
+    def _has_capacity(self, priority: str) -> bool:
+        if sum(self._in_flight.values()) >= self.max_in_flight:
+            return False
+        return priority != BACKGROUND or self._in_flight[BACKGROUND] < self.max_background
+
+    def _waiting_ahead(self, priority: str) -> bool:
+        """Whether calls of this or a higher class are already queued"""
+        return any(self._queues[p] for p in PRIORITIES[: PRIORITIES.index(priority) + 1])
+
+    async def _acquire(self, user_id: str, priority: str, can_reject: bool) -> None:
+        stats = self._stats[priority]
+        queue = self._queues[priority]
+        if self._has_capacity(priority) and not self._waiting_ahead(priority):
+            self._in_flight[priority] += 1
+            stats["admitted"] += 1
+            return
+
+        waiting = queue.get(user_id)
+        if can_reject and (
+            self._queued >= self.max_queue
+            or (waiting is not None and len(waiting) >= self.max_queue_per_user)
+        ):
+            stats["rejected"] += 1
+            logger.warning(f"LLM scheduler busy, rejecting {priority} call for {user_id}")
+            raise SchedulerBusy(f"{self._queued} calls waiting")
+
+        future = asyncio.get_running_loop().create_future()
+        queue.setdefault(user_id, deque()).append(future)
+        self._queued += 1
+        started = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just before cancellation; give it back
+                self._in_flight[priority] -= 1
+                self._dispatch()
+            else:
+                self._remove(priority, user_id, future)
+            raise
+
+        waited = time.perf_counter() - started
+        stats["admitted"] += 1
+        stats["wait_seconds"] = round(stats["wait_seconds"] + waited, 3)
+        stats["max_wait_seconds"] = round(max(stats["max_wait_seconds"], waited), 3)
+
+    def _remove(self, priority: str, user_id: str, future: asyncio.Future) -> None:
+        waiting = self._queues[priority].get(user_id)
+        if waiting and future in waiting:
+            waiting.remove(future)
+            self._queued -= 1
+            if not waiting:
+                del self._queues[priority][user_id]
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiters: interactive first, users round-robin"""
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue and self._has_capacity(priority):
+                user_id, waiting = queue.popitem(last=False)
+                future = waiting.popleft()
+                self._queued -= 1
+                if waiting:
+                    # Back of the rotation: other users go first
+                    queue[user_id] = waiting
+                if future.done():
+                    # Cancelled while queued
+                    continue
+                self._in_flight[priority] += 1
+                future.set_result(None)
+
+    def stats(self) -> Dict[str, object]:
+        """In-flight and queued calls plus per-class admission and wait times"""
+        report: Dict[str, object] = {
+            "in_flight": sum(self._in_flight.values()),
+            "queued": self._queued,
+            "max_in_flight": self.max_in_flight,
+        }
+        for priority, stats in self._stats.items():
+            admitted = stats["admitted"]
+            report[priority] = {
+                **stats,
+                "avg_wait_seconds": round(stats["wait_seconds"] / admitted, 3) if admitted else 0.0,
+            }
+        return report
@@ -0,0 +1,223 @@
+"""Skill registry - lazy, relevance-gated loading of workspace skills"""
+
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+import yaml
+
+from app.core.memory_index import tokenize
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+SKILL_FILE = "SKILL.md"
+# Front matter is looked for in this many leading bytes; the body is not read
+_HEAD_BYTES = 4096
+
+
+@dataclass(slots=True)
+class SkillInfo:
+    """What is indexed for a skill: its name and description, never the body"""
+    name: str
+    description: str
+    path: str
+    signature: Tuple[int, int]
+    terms: FrozenSet[str]
+    name_terms: FrozenSet[str]
+
+
+def split_front_matter(text: str) -> Tuple[Dict[str, str], str]:
+    """Parse a leading ``---`` YAML block; returns (metadata, body)"""
+    if not text.startswith("---"):
+        return {}, text
+    end = text.find("\n---", 3)
+    if end == -1:
+        return {}, text
+    try:
+        meta = yaml.safe_load(text[3:end]) or {}
+    except yaml.YAMLError:
+        return {}, text
+    body = text[end + 4:].lstrip("-").lstrip("\n")
+    return (meta if isinstance(meta, dict) else {}), body
+
+
+def _describe(head: str) -> str:
+    """Description from front matter, else the first line of prose"""
+    meta, body = split_front_matter(head)
+    if meta.get("description"):
+        return str(meta["description"]).strip()
+    for line in body.splitlines():
+        line = line.strip()
+        if line and not line.startswith(("#", "---")):
+            return line[:200]
+    return ""
+
+
+class SkillRegistry:
+    """Index of ``<skills_dir>/<name>/SKILL.md`` by name and description
+
+    Only the first few KB of each file are read, for the front matter
+    ``description``. The directory is re-scanned at most every
+    ``check_interval`` seconds (one stat per skill; changed files re-read).
+    Full bodies are read on demand by ``load`` and kept in a small LRU.
+    """
+
+    def __init__(
+        self,
+        skills_dir: str | Path = "./workspace/skills",
+        check_interval: float = 5.0,
+        max_cached_bodies: int = 32,
+    ):
+        self.skills_dir = Path(skills_dir)
+        self.check_interval = check_interval
+        self.max_cached_bodies = max_cached_bodies
+        self._skills: Dict[str, SkillInfo] = {}
+        self._bodies: "OrderedDict[str, Tuple[Tuple[int, int], str]]" = OrderedDict()
+        self._inverted: Optional[Dict[str, Set[str]]] = None  # term -> skill names
+        self._checked_at = float("-inf")
+        self.stats = {
+            "refreshes": 0,
+            "matches": 0,
+            "loads": 0,
+            "body_cache_hits": 0,
+            "scan_ms": 0.0,
+        }
+
+    def refresh(self, force: bool = False) -> int:
+        """Pick up added, changed and removed skills; returns how many changed"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return 0
+        self._checked_at = now
+        started = time.perf_counter()
+
+        seen = set()
+        changed = 0
+        try:
+            entries = list(os.scandir(self.skills_dir))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            path = os.path.join(entry.path, SKILL_FILE)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            seen.add(entry.name)
+            signature = (st.st_mtime_ns, st.st_size)
+            known = self._skills.get(entry.name)
+            if known and known.signature == signature:
+                continue
+            try:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    head = f.read(_HEAD_BYTES)
+            except OSError as e:
+                logger.warning(f"Skipping skill {entry.name}: {e}")
+                continue
+            description = _describe(head)
+            name_terms = frozenset(tokenize(entry.name.replace("-", " ").replace("_", " ")))
+            self._skills[entry.name] = SkillInfo(
+                name=entry.name,
+                description=description,
+                path=path,
+                signature=signature,
+                terms=name_terms | frozenset(tokenize(description)),
+                name_terms=name_terms,
+            )
+            changed += 1
+
+        for name in set(self._skills) - seen:
+            del self._skills[name]
+            self._bodies.pop(name, None)
+            changed += 1
+
+        self.stats["scan_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        if changed:
+            self._inverted = None
+            self.stats["refreshes"] += 1
+            logger.info(f"Skill registry refreshed: {changed} changed, {len(self._skills)} skills")
+        return changed
+
+    def list(self) -> List[Dict[str, str]]:
+        """Name and description of every skill, sorted by name"""
+        self.refresh()
+        return [
+            {"name": info.name, "description": info.description}
+            for info in sorted(self._skills.values(), key=lambda info: info.name)
+        ]
+
+    def match(self, query: str, k: int = 1, min_score: float = 2.0) -> List[Tuple[float, str]]:
+        """
+        Skills relevant to a request, best first
+
+        Each query term found in a skill's name or description adds
+        ``1 + idf`` (terms shared by fewer skills weigh more), and naming the
+        skill outright adds a bonus. Skills below ``min_score`` - by default
+        a single common word - are not returned.
+        """
+        self.refresh()
+        terms = set(tokenize(query))
+        if not terms or not self._skills or k <= 0:
+            return []
+
+        if self._inverted is None:
+            self._inverted = {}
+            for info in self._skills.values():
+                for term in info.terms:
+                    self._inverted.setdefault(term, set()).add(info.name)
+
+        n = len(self._skills)
+        scores: Dict[str, float] = {}
+        for term in terms:
+            holders = self._inverted.get(term)
+            if not holders:
+                continue
+            idf = math.log(1 + (n - len(holders) + 0.5) / (len(holders) + 0.5))
+            for name in holders:
+                scores[name] = scores.get(name, 0.0) + 1 + idf
+        for name in scores:
+            name_terms = self._skills[name].name_terms
+            if name_terms and name_terms <= terms:
+                scores[name] += 2
+
+        best = sorted(
+            ((score, name) for name, score in scores.items() if score >= min_score),
+            reverse=True,
+        )[:k]
+        self.stats["matches"] += len(best)
+        return best
+
+    def load(self, name: str) -> Optional[str]:
+        """Full body of a skill (without front matter), or None if unknown"""
+        self.refresh()
+        info = self._skills.get(name)
+        if info is None:
+            return None
+        cached = self._bodies.get(name)
+        if cached and cached[0] == info.signature:
+            self._bodies.move_to_end(name)
+            self.stats["body_cache_hits"] += 1
+            return cached[1]
+
+        try:
+            text = Path(info.path).read_text(encoding="utf-8")
+        except OSError as e:
+            logger.warning(f"Could not load skill {name}: {e}")
+            return None
+        _, body = split_front_matter(text)
+        body = body.strip()
+        self._bodies[name] = (info.signature, body)
+        while len(self._bodies) > self.max_cached_bodies:
+            self._bodies.popitem(last=False)
+        self.stats["loads"] += 1
+        return body
+
+    def report(self) -> Dict[str, float]:
+        return {**self.stats, "skills": len(self._skills), "cached_bodies": len(self._bodies)}
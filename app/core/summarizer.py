@@ -0,0 +1,152 @@
+"""Rolling summarization of long sessions"""
+
+import asyncio
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.context import AgentContext
+from app.core.context_builder import elide
+from app.core.scheduler import BACKGROUND, LLMScheduler
+from app.utils import get_logger
+
+logger = get_logger(__name__)
+
+_SUMMARY_PROMPT = (
+    "Mantienes el resumen de una conversación entre un usuario y Nanobot, "
+    "su asistente de desarrollo.\n\n"
+    "Recibirás el resumen actual (puede estar vacío) y los mensajes nuevos. "
+    "Devuelve SOLO el resumen actualizado:\n"
+    "- En español, conciso, en viñetas\n"
+    "- Conserva decisiones, datos concretos (rutas, comandos, nombres, errores) "
+    "y tareas pendientes\n"
+    "- Omite saludos y relleno"
+)
+
+# Each folded message is shortened to this before being sent for summarization
+_MAX_MESSAGE_TOKENS = 500
+
+
+class SessionSummarizer:
+    """Fold old turns of a session into a running summary, in the background
+
+    Every ``every_turns`` messages that fall out of the recent window, the
+    previous summary plus only those new messages are sent to the provider,
+    so each update costs the same regardless of session length. The result
+    is stored in ``ctx.state["summary"]`` (``text``, ``upto``, ``updated_at``)
+    and persisted through the session manager. With a ``scheduler`` the
+    call runs in its background class, behind interactive requests.
+    """
+
+    def __init__(
+        self,
+        provider: Any,
+        session_manager: Any,
+        every_turns: int = 10,
+        keep_recent: int = 6,
+        max_summary_tokens: int = 400,
+        scheduler: Optional[LLMScheduler] = None,
+    ):
+        self.provider = provider
+        self.scheduler = scheduler
+        self.session_manager = session_manager
+        self.every_turns = every_turns
+        self.keep_recent = keep_recent
+        self.max_summary_tokens = max_summary_tokens
+        self._tasks: Set[asyncio.Task] = set()
+        self._running: Set[str] = set()
+        self.stats = {"runs": 0, "failures": 0, "folded_messages": 0, "seconds": 0.0}
+
+    def due(self, ctx: AgentContext) -> bool:
+        """Whether enough turns left the recent window since the last update"""
+        if self.every_turns <= 0:
+            return False
+        summary = ctx.state.get("summary") or {}
+        upto = summary.get("upto", 0)
+        if upto > len(ctx.messages):
+            # Session was reset; start over
+            upto = 0
+        return len(ctx.messages) - self.keep_recent - upto >= self.every_turns
+
+    def schedule(self, ctx: AgentContext) -> Optional[asyncio.Task]:
+        """Start a background update if one is due and none is running"""
+        if ctx.session_id in self._running or not self.due(ctx):
+            return None
+
+        self._running.add(ctx.session_id)
+        task = asyncio.create_task(self.summarize(ctx))
+        self._tasks.add(task)
+
+        def _done(t: asyncio.Task) -> None:
+            self._tasks.discard(t)
+            self._running.discard(ctx.session_id)
+
+        task.add_done_callback(_done)
+        return task
+
+    async def summarize(self, ctx: AgentContext) -> Optional[Dict[str, Any]]:
+        """
+        Fold the messages between the current summary and the recent window
+
+        Returns:
+            The new summary, or None if nothing was folded or the call failed
+        """
+        started = time.perf_counter()
+        previous = ctx.state.get("summary") or {}
+        upto = previous.get("upto", 0)
+        if upto > len(ctx.messages):
+            previous, upto = {}, 0
+        end = len(ctx.messages) - self.keep_recent
+        if end <= upto:
+            return None
+
+        lines = [
+            f"{msg.role}: {elide(msg.content, _MAX_MESSAGE_TOKENS)}"
+            for msg in ctx.messages[upto:end]
+        ]
+        messages: List[Dict[str, str]] = [
+            {"role": "system", "content": _SUMMARY_PROMPT},
+            {
+                "role": "user",
+                "content": (
+                    f"Resumen actual:\n{previous.get('text') or '(vacío)'}\n\n"
+                    "Mensajes nuevos:\n" + "\n\n".join(lines)
+                ),
+            },
+        ]
+
+        slot = self.scheduler.slot(ctx.user_id, BACKGROUND) if self.scheduler else nullcontext()
+        try:
+            async with slot:
+                response = await self.provider.call(
+                    messages, max_tokens=self.max_summary_tokens, temperature=0.2
+                )
+            text = (response.get("text") or "").strip()
+            if not text:
+                raise ValueError("empty summary")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats["failures"] += 1
+            logger.warning(f"Summarization failed for {ctx.session_id}: {e}")
+            return None
+
+        summary = {"text": text, "upto": end, "updated_at": datetime.utcnow().isoformat()}
+        ctx.state["summary"] = summary
+        await self.session_manager.save_summary(ctx.session_id, summary)
+
+        elapsed = time.perf_counter() - started
+        self.stats["runs"] += 1
+        self.stats["folded_messages"] += end - upto
+        self.stats["seconds"] = round(self.stats["seconds"] + elapsed, 3)
+        logger.info(
+            f"Session summarized: {ctx.session_id} (+{end - upto} messages, "
+            f"upto {end}) in {elapsed:.2f}s"
+        )
+        return summary
+
+    async def close(self) -> None:
+        """Wait for running updates to finish"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
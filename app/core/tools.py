@@ -1,14 +1,20 @@
 """Tool execution for agent - shell, files, git, web"""
 
 import asyncio
+import os
+import signal
 import subprocess
 import json
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 from urllib.parse import urlparse
 
+from app.core.deadline import Deadline
 from app.utils import get_logger
 
+if TYPE_CHECKING:
+    from app.core.jobs import JobQueue
+
 logger = get_logger(__name__)
 
 # Safe paths - restrict to user's development directory
@@ -16,28 +22,156 @@ SAFE_BASE_PATHS = [
     Path("C:/Users/QUINTANA/sistemas"),
 ]
 
+# Shell and git commands never run longer than this
+COMMAND_TIMEOUT = 30
+
+# Provider-neutral tool definitions (JSON Schema parameters); providers adapt
+# them to their own tool-calling format
+TOOL_SCHEMAS: List[Dict[str, Any]] = [
+    {
+        "name": "execute_shell",
+        "description": (
+            "Ejecuta un comando de shell y devuelve su salida (timeout 30s). "
+            "Para tareas largas (tests, builds) usa background."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "command": {"type": "string", "description": "Comando a ejecutar"},
+                "background": {
+                    "type": "boolean",
+                    "description": "Ejecutar como job en segundo plano; avisa al chat al terminar",
+                },
+            },
+            "required": ["command"],
+        },
+    },
+    {
+        "name": "read_file",
+        "description": "Lee un archivo de texto dentro del directorio permitido.",
+        "parameters": {
+            "type": "object",
+            "properties": {"path": {"type": "string", "description": "Ruta del archivo"}},
+            "required": ["path"],
+        },
+    },
+    {
+        "name": "write_file",
+        "description": (
+            "Escribe (o sobrescribe) un archivo de texto dentro del directorio permitido."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "path": {"type": "string", "description": "Ruta del archivo"},
+                "content": {"type": "string", "description": "Contenido completo"},
+            },
+            "required": ["path", "content"],
+        },
+    },
+    {
+        "name": "git_operation",
+        "description": (
+            "Ejecuta una operación git segura "
+            "(status, log, diff, show, branch, pull, add, commit)."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "operation": {
+                    "type": "string",
+                    "description": "Argumentos de git, p. ej. 'status'",
+                },
+                "repo_path": {"type": "string", "description": "Ruta del repositorio"},
+                "background": {
+                    "type": "boolean",
+                    "description": "Ejecutar como job en segundo plano (p. ej. un pull grande)",
+                },
+            },
+            "required": ["operation"],
+        },
+    },
+    {
+        "name": "job_status",
+        "description": (
+            "Estado y salida de los jobs en segundo plano de este chat; "
+            "opcionalmente cancela uno."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "job_id": {
+                    "type": "integer",
+                    "description": "Id del job (omitir para listar los recientes)",
+                },
+                "cancel": {"type": "boolean", "description": "Cancelar el job indicado"},
+            },
+        },
+    },
+    {
+        "name": "web_fetch",
+        "description": "Descarga el contenido de una URL (primeros 3000 caracteres).",
+        "parameters": {
+            "type": "object",
+            "properties": {"url": {"type": "string", "description": "URL http(s)"}},
+            "required": ["url"],
+        },
+    },
+]
+
+
+def kill_process_tree(proc: asyncio.subprocess.Process) -> None:
+    """Kill a shell and everything it started"""
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == "posix":
+            # The shell leads its own session (start_new_session)
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
+
 
 class ToolExecutor:
     """Execute tools safely"""
 
-    async def execute(self, tool_call: Dict[str, Any]) -> str:
-        """Execute tool call"""
+    def __init__(self, *, jobs: Optional["JobQueue"] = None):
+        self.jobs = jobs
+        self.stats = {"commands": 0, "commands_killed": 0, "jobs_submitted": 0}
+
+    async def execute(
+        self,
+        tool_call: Dict[str, Any],
+        deadline: Optional[Deadline] = None,
+        origin: Tuple[Optional[str], Optional[str]] = (None, None),
+    ) -> str:
+        """
+        Execute tool call
+
+        Commands are bounded by ``deadline``, unless sent to the background
+        job queue; job notices go to ``origin`` (channel, chat id).
+        """
         name = tool_call.get("name", "unknown")
         args = tool_call.get("args", {})
+        timeout = (deadline or Deadline()).bound(COMMAND_TIMEOUT)
 
         try:
             logger.info(f"Executing tool: {name}")
 
             if name == "execute_shell":
-                return await self._execute_shell(args)
+                return await self._execute_shell(args, timeout, origin)
             elif name == "read_file":
                 return await self._read_file(args)
             elif name == "write_file":
                 return await self._write_file(args)
             elif name == "git_operation":
-                return await self._git_operation(args)
+                return await self._git_operation(args, timeout, origin)
             elif name == "web_fetch":
                 return await self._web_fetch(args)
+            elif name == "job_status":
+                return await self._job_status(args, origin)
             else:
                 return f"❌ Herramienta desconocida: {name}"
 
@@ -45,7 +179,74 @@ class ToolExecutor:
             logger.error(f"Tool error ({name}): {e}")
             return f"❌ Error en {name}: {str(e)[:200]}"
 
-    async def _execute_shell(self, args: Dict[str, Any]) -> str:
+    async def _run_command(self, command: str, timeout: float) -> Tuple[int, str, str]:
+        """
+        Run a shell command, killing its whole process tree on timeout or
+        cancellation (``/cancel``, request deadline)
+
+        Raises:
+            subprocess.TimeoutExpired: the command ran past ``timeout``
+        """
+        self.stats["commands"] += 1
+        proc = await asyncio.create_subprocess_shell(
+            command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            kill_process_tree(proc)
+            self.stats["commands_killed"] += 1
+            await proc.wait()
+            logger.warning(f"Command killed ({type(e).__name__}): {command[:100]}")
+            if isinstance(e, asyncio.TimeoutError):
+                raise subprocess.TimeoutExpired(command, timeout) from None
+            raise
+        return (
+            proc.returncode,
+            stdout.decode("utf-8", errors="replace"),
+            stderr.decode("utf-8", errors="replace"),
+        )
+
+    async def _submit_job(
+        self, kind: str, command: str, origin: Tuple[Optional[str], Optional[str]]
+    ) -> str:
+        job = await self.jobs.submit(kind, command, channel=origin[0], chat_id=origin[1])
+        self.stats["jobs_submitted"] += 1
+        notice = "te aviso cuando termine" if origin[1] else "consulta su estado con job_status"
+        return f"🕒 Job #{job.id} en cola: {command[:100]} ({notice})"
+
+    async def _job_status(
+        self, args: Dict[str, Any], origin: Tuple[Optional[str], Optional[str]]
+    ) -> str:
+        """Report (or cancel) background jobs"""
+        if not self.jobs:
+            return "❌ Jobs en segundo plano no disponibles"
+
+        job_id = args.get("job_id")
+        if job_id is None:
+            jobs = await self.jobs.list(origin)
+            return "\n".join(job.describe() for job in jobs) or "No hay jobs"
+
+        # Only jobs started from this chat are visible or cancellable
+        if args.get("cancel"):
+            if await self.jobs.cancel(int(job_id), origin):
+                return f"🛑 Job #{job_id} cancelado"
+            return f"❌ Job #{job_id} no existe o ya terminó"
+
+        job = await self.jobs.get(int(job_id), origin)
+        if job is None:
+            return f"❌ Job #{job_id} no existe"
+        return f"{job.describe()}\n{job.output}".strip()
+
+    async def _execute_shell(
+        self,
+        args: Dict[str, Any],
+        timeout: float = COMMAND_TIMEOUT,
+        origin: Tuple[Optional[str], Optional[str]] = (None, None),
+    ) -> str:
         """Execute shell command safely"""
         command = args.get("command", "").strip()
 
@@ -57,23 +258,19 @@ class ToolExecutor:
         if any(d in command for d in dangerous):
             return "❌ Comando peligroso bloqueado"
 
+        if args.get("background") and self.jobs:
+            return await self._submit_job("shell", command, origin)
+
         try:
             logger.info(f"Executing: {command[:100]}")
 
-            result = await asyncio.to_thread(
-                subprocess.run,
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=30,
-            )
+            returncode, stdout, stderr = await self._run_command(command, timeout)
 
-            output = result.stdout if result.returncode == 0 else result.stderr
+            output = stdout if returncode == 0 else stderr
             return output.strip()[:2000]  # Limit output
 
         except subprocess.TimeoutExpired:
-            return "❌ Comando excedió timeout (30s)"
+            return f"❌ Comando excedió timeout ({timeout:.0f}s)"
         except Exception as e:
             return f"❌ Error ejecutando comando: {str(e)}"
 
@@ -127,7 +324,12 @@ class ToolExecutor:
         except Exception as e:
             return f"❌ Error escribiendo {path}: {str(e)}"
 
-    async def _git_operation(self, args: Dict[str, Any]) -> str:
+    async def _git_operation(
+        self,
+        args: Dict[str, Any],
+        timeout: float = COMMAND_TIMEOUT,
+        origin: Tuple[Optional[str], Optional[str]] = (None, None),
+    ) -> str:
         """Execute git operation safely"""
         operation = args.get("operation", "").strip()
         repo_path = args.get("repo_path", "C:/Users/QUINTANA/sistemas").strip()
@@ -140,19 +342,16 @@ class ToolExecutor:
         if not any(op in operation.lower() for op in safe_ops):
             return "❌ Operación git no permitida"
 
+        command = f'cd "{repo_path}" && git {operation}'
+        if args.get("background") and self.jobs:
+            return await self._submit_job("git", command, origin)
+
         try:
             logger.info(f"Git: {operation}")
 
-            result = await asyncio.to_thread(
-                subprocess.run,
-                f'cd "{repo_path}" && git {operation}',
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=30,
-            )
+            returncode, stdout, stderr = await self._run_command(command, timeout)
 
-            output = result.stdout if result.returncode == 0 else result.stderr
+            output = stdout if returncode == 0 else stderr
             return output.strip()[:2000]
 
         except subprocess.TimeoutExpired:
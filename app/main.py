@@ -11,16 +11,23 @@ from pathlib import Path
 from app.config import Settings
 from app.utils import get_logger
 from app.cloud.dashboard import create_dashboard_routes
-from app.cloud.telegram_bot import start_telegram_bot, stop_telegram_bot
+from app.cloud.telegram_bot import notify_chat, start_telegram_bot, stop_telegram_bot
 from app.cloud.backup_service import BackupService
 from app.core.memory import Memory
-from app.cloud.sessions import SessionManager
+from app.core.memory_index import MemoryIndex
+from app.cloud.sessions import create_session_manager
+from app.cloud.session_compaction import SessionCompactor
+from app.cloud.session_retention import SessionRetention
+from app.cloud.session_writer import close_session_writers
 
 # Configuration
 settings = Settings()
 # Global variables for cross-module access
 _agent_loop = None
 _session_manager = None
+_session_retention = None
+_summarizer = None
+_job_queue = None
 logger = get_logger(__name__)
 
 
@@ -36,13 +43,35 @@ async def lifespan(app: FastAPI):
         # Initialize components
         logger.info("📦 Initializing components...")
 
-        # Memory
-        memory = Memory(workspace_path="./workspace")
+        # Memory (one workspace index, shared with the agent loop)
+        memory_index = MemoryIndex("./workspace")
+        memory = Memory(workspace_path="./workspace", index=memory_index)
         logger.info("✅ Memory initialized")
 
         # Session manager
-        session_manager = SessionManager(data_dir="./data")
-        logger.info("✅ Session manager initialized")
+        session_manager = create_session_manager(settings, data_dir="./data")
+        flusher_task = asyncio.create_task(session_manager.run_flusher())
+        logger.info(f"✅ Session manager initialized ({settings.session_backend})")
+
+        # Session compaction and retention (JSONL logs only)
+        compaction_task = retention_task = None
+        global _session_retention
+        if settings.session_backend == "jsonl":
+            compactor = SessionCompactor(
+                session_manager, compress_after_days=settings.session_compress_after_days
+            )
+            compaction_task = asyncio.create_task(
+                compactor.scheduled_compaction(settings.session_compaction_interval_hours)
+            )
+            _session_retention = SessionRetention(
+                session_manager,
+                max_age_days=settings.session_retention_days or None,
+                user_quota_mb=settings.session_user_quota_mb or None,
+                disk_budget_mb=settings.session_disk_budget_mb or None,
+            )
+            retention_task = asyncio.create_task(
+                _session_retention.scheduled_retention(settings.session_retention_interval_hours)
+            )
 
         # Backup service
         backup_service = BackupService(settings)
@@ -52,19 +81,62 @@ async def lifespan(app: FastAPI):
             logger.info("⏭️  S3 backups disabled")
 
         # Initialize global agent loop
+        from app.cloud.http_pool import HTTPPool
         from app.cloud.providers import ProviderManager
+        from app.core.jobs import JobQueue
         from app.core.loop import AgentLoop
+        from app.core.scheduler import LLMScheduler
+        from app.core.summarizer import SessionSummarizer
         
-        provider_manager = ProviderManager(settings)
-        global _agent_loop, _session_manager
-        _agent_loop = AgentLoop(settings, provider_manager)
+        # Keep-alive connections shared by every provider call
+        http_pool = HTTPPool(
+            max_connections=settings.llm_http_max_connections,
+            max_keepalive=settings.llm_http_max_keepalive,
+            keepalive_seconds=settings.llm_http_keepalive_seconds,
+            timeout=settings.llm_http_timeout,
+            http2=settings.llm_http2,
+        )
+        provider_manager = ProviderManager(settings, http_pool=http_pool)
+        # One admission queue for every LLM call, interactive or background
+        scheduler = LLMScheduler(
+            max_in_flight=settings.llm_max_in_flight,
+            max_queue=settings.llm_max_queue,
+            max_queue_per_user=settings.llm_max_queue_per_user,
+            max_background=settings.llm_max_background,
+        )
+        global _agent_loop, _session_manager, _summarizer, _job_queue
+        # Long commands the agent sends to the background; survive restarts
+        _job_queue = JobQueue(
+            db_path=settings.jobs_db_path,
+            workers=settings.job_workers,
+            timeout=settings.job_timeout_seconds,
+            progress_interval=settings.job_progress_interval,
+            notify=notify_chat,
+        )
+        _agent_loop = AgentLoop(
+            settings,
+            provider_manager,
+            scheduler=scheduler,
+            jobs=_job_queue,
+            memory_index=memory_index,
+        )
         _session_manager = session_manager
+        _summarizer = SessionSummarizer(
+            provider_manager,
+            session_manager,
+            every_turns=settings.summary_every_turns,
+            keep_recent=settings.context_keep_recent,
+            max_summary_tokens=settings.summary_max_tokens,
+            scheduler=scheduler,
+        )
         
         logger.info("✅ Agent loop initialized")
 
         # Start Telegram bot (includes agent loop initialization)
         logger.info("📱 Starting Telegram bot...")
         telegram_task = asyncio.create_task(start_telegram_bot(settings))
+        # Resumed jobs notify their chats, so start them once the bot is up
+        jobs_task = asyncio.create_task(_start_jobs(_job_queue, telegram_task))
 
         logger.info("=" * 80)
         logger.info("🟢 NANOBOT IS RUNNING — READY FOR MESSAGES")
@@ -77,6 +149,10 @@ async def lifespan(app: FastAPI):
         logger.info("🛑 SHUTTING DOWN NANOBOT")
         logger.info("=" * 80)
 
+        # Running jobs are killed and resumed on the next start
+        jobs_task.cancel()
+        await _job_queue.close()
+
         telegram_task.cancel()
         try:
             await telegram_task
@@ -85,6 +161,20 @@ async def lifespan(app: FastAPI):
 
         await stop_telegram_bot()
 
+        for task in (flusher_task, compaction_task, retention_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await _summarizer.close()
+        provider_manager.close()
+        await http_pool.aclose()
+        await session_manager.close()
+        await close_session_writers()
+
         logger.info("✅ Nanobot shut down gracefully")
         logger.info("=" * 80)
 
@@ -93,6 +183,12 @@ async def lifespan(app: FastAPI):
         raise
 
 
+async def _start_jobs(job_queue, telegram_task: asyncio.Task) -> None:
+    await asyncio.wait({telegram_task})
+    resumed = await job_queue.start()
+    logger.info(f"✅ Job queue started ({resumed} jobs resumed)")
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Nanobot Cloud",
@@ -0,0 +1,177 @@
+"""Record serializers for session logs - stdlib json, orjson or msgpack
+
+JSON-based serializers write newline-delimited records (the classic JSONL
+layout) and are interchangeable on read. The msgpack serializer writes a
+magic preamble followed by length-framed records::
+
+    NBMSGPK1 | len:u32 | payload | len:u32 | len:u32 | payload | len:u32 | ...
+
+The trailing length lets readers seek backwards to the last record. Readers
+pick the format per file from its first bytes, so logs written with different
+settings can coexist in the same directory.
+"""
+
+import json
+import struct
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional binary format
+    msgpack = None
+
+MSGPACK_MAGIC = b"NBMSGPK1"
+_FRAME = struct.Struct(">I")
+
+# Block size for reverse-seeking reads of the last JSON line
+_TAIL_BLOCK_SIZE = 8192
+
+
+def json_loads(data: bytes | str) -> Any:
+    """Decode JSON with orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _decode_line(line: bytes) -> Optional[Dict[str, Any]]:
+    """Record on one JSONL line, or None for blank lines and torn appends"""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json_loads(line)
+    except ValueError:
+        # A crash mid-append leaves a partial line; later appends start anew
+        return None
+
+
+class JsonSerializer:
+    """Newline-delimited JSON with the stdlib encoder"""
+
+    name = "json"
+    preamble = b""
+
+    def dumps(self, record: Dict[str, Any]) -> bytes:
+        return json.dumps(record).encode("utf-8")
+
+    def encode(self, records: Iterable[Dict[str, Any]]) -> bytes:
+        """Encode records into bytes ready to append to a log"""
+        return b"".join(self.dumps(record) + b"\n" for record in records)
+
+    def iter_records(self, f: BinaryIO) -> Iterator[Dict[str, Any]]:
+        for line in f:
+            record = _decode_line(line)
+            if record is not None:
+                yield record
+
+    def read_last(self, f: BinaryIO) -> Optional[Dict[str, Any]]:
+        """Last complete record of a seekable log, reading backwards from the end"""
+        pos = f.seek(0, 2)
+        head = b""
+
+        while pos > 0:
+            step = min(_TAIL_BLOCK_SIZE, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + head).split(b"\n")
+            # The first piece may continue in the previous block
+            head = lines.pop(0) if pos > 0 else b""
+            for line in reversed(lines):
+                record = _decode_line(line)
+                if record is not None:
+                    return record
+
+        return _decode_line(head)
+
+
+class OrjsonSerializer(JsonSerializer):
+    """Newline-delimited JSON encoded with orjson"""
+
+    name = "orjson"
+
+    def dumps(self, record: Dict[str, Any]) -> bytes:
+        try:
+            return orjson.dumps(record)
+        except TypeError:
+            # e.g. non-string dict keys in tool metadata
+            return super().dumps(record)
+
+
+class MsgpackSerializer:
+    """Length-framed msgpack records after a magic preamble"""
+
+    name = "msgpack"
+    preamble = MSGPACK_MAGIC
+
+    def dumps(self, record: Dict[str, Any]) -> bytes:
+        return msgpack.packb(record, use_bin_type=True)
+
+    def encode(self, records: Iterable[Dict[str, Any]]) -> bytes:
+        frames = []
+        for record in records:
+            payload = self.dumps(record)
+            length = _FRAME.pack(len(payload))
+            frames.append(length + payload + length)
+        return b"".join(frames)
+
+    def iter_records(self, f: BinaryIO) -> Iterator[Dict[str, Any]]:
+        while True:
+            header = f.read(_FRAME.size)
+            if len(header) < _FRAME.size:
+                return
+            (length,) = _FRAME.unpack(header)
+            payload = f.read(length)
+            f.read(_FRAME.size)
+            if len(payload) < length:
+                return  # torn final frame
+            yield msgpack.unpackb(payload, raw=False)
+
+    def read_last(self, f: BinaryIO) -> Optional[Dict[str, Any]]:
+        end = f.seek(0, 2)
+        if end - _FRAME.size < len(self.preamble):
+            return None
+        f.seek(end - _FRAME.size)
+        (length,) = _FRAME.unpack(f.read(_FRAME.size))
+        f.seek(end - _FRAME.size - length)
+        return msgpack.unpackb(f.read(length), raw=False)
+
+
+_SERIALIZERS = {
+    "json": JsonSerializer,
+    "orjson": OrjsonSerializer,
+    "msgpack": MsgpackSerializer,
+}
+
+
+def get_serializer(name: str = "json"):
+    """
+    Serializer by name, falling back to stdlib json when the optional
+    package behind it is not installed
+    """
+    name = name.lower()
+    if name not in _SERIALIZERS:
+        raise ValueError(f"Unknown serializer: {name}")
+    if (name == "orjson" and orjson is None) or (name == "msgpack" and msgpack is None):
+        return JsonSerializer()
+    return _SERIALIZERS[name]()
+
+
+def detect_serializer(f: BinaryIO):
+    """
+    Serializer a log was written with, from its first bytes
+
+    Leaves ``f`` positioned at the first record.
+    """
+    head = f.read(len(MSGPACK_MAGIC))
+    if head == MSGPACK_MAGIC:
+        if msgpack is None:
+            raise RuntimeError("Session log is msgpack-encoded but msgpack is not installed")
+        return MsgpackSerializer()
+    f.seek(0)
+    return JsonSerializer()
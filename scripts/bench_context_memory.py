@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Microbenchmark: memory and serialization cost of AgentContext messages"""
+
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.context import AgentContext  # noqa: E402
+
+N_MESSAGES = 10_000
+
+
+@dataclass
+class LegacyMessage:
+    """Message layout before the compact representation (for comparison)"""
+    role: str
+    content: str
+    timestamp: datetime = field(default_factory=datetime.utcnow)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": self.timestamp.isoformat(),
+            "metadata": self.metadata
+        }
+
+
+def _contents():
+    # Distinct strings, like real conversation text; shared by both runs
+    return [f"mensaje {i}: " + "x" * 40 for i in range(N_MESSAGES)]
+
+
+def measure(build) -> int:
+    """Bytes allocated by build(), excluding the message contents"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    holder = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del holder
+    return after - before
+
+
+def time_it(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    contents = _contents()
+    roles = ["user", "assistant"]
+
+    def build_legacy():
+        return [LegacyMessage(role=roles[i % 2], content=c) for i, c in enumerate(contents)]
+
+    def build_compact():
+        ctx = AgentContext(session_id="bench", user_id="0", channel="bench")
+        for i, c in enumerate(contents):
+            ctx.add_message(roles[i % 2], c)
+        return ctx
+
+    legacy_bytes = measure(build_legacy)
+    compact_bytes = measure(build_compact)
+
+    legacy = build_legacy()
+    ctx = build_compact()
+    legacy_s = time_it(lambda: [m.to_dict() for m in legacy])
+    compact_s = time_it(ctx.to_dict)
+
+    print(f"📊 {N_MESSAGES} messages (content strings excluded)")
+    print(
+        f"   legacy dataclass : {legacy_bytes / 1024:8.1f} KiB  "
+        f"to_dict {legacy_s * 1000:6.1f} ms"
+    )
+    print(
+        f"   compact Message  : {compact_bytes / 1024:8.1f} KiB  "
+        f"to_dict {compact_s * 1000:6.1f} ms"
+    )
+    print(f"   memory saved     : {(1 - compact_bytes / legacy_bytes) * 100:5.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Benchmark: build, incremental refresh and query cost of the memory index"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.context import estimate_tokens  # noqa: E402
+from app.core.memory_index import MemoryIndex, format_chunks  # noqa: E402
+
+N_FILES = 200
+SECTIONS_PER_FILE = 25
+WORDS = (
+    "deploy render groq anthropic telegram backup s3 sesión token docker git rama "
+    "error timeout cola proyecto cliente pwa dashboard métricas caché prompt memoria "
+    "usuario python fastapi sqlite índice búsqueda resumen herramienta shell archivo"
+).split()
+QUERIES = [
+    "¿cómo hago deploy en render?",
+    "error de timeout en telegram",
+    "backup de sesiones a s3",
+    "caché del prompt de anthropic",
+]
+
+
+def _write_workspace(root: Path) -> None:
+    rng = random.Random(0)
+    for f in range(N_FILES):
+        lines = [f"# Notas {f}"]
+        for s in range(SECTIONS_PER_FILE):
+            lines.append(f"## {rng.choice(WORDS)} {s}")
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(80)))
+        (root / f"notes_{f}.md").write_text("\n\n".join(lines), encoding="utf-8")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _write_workspace(root)
+        corpus_tokens = sum(
+            estimate_tokens(p.read_text(encoding="utf-8")) for p in root.glob("*.md")
+        )
+
+        index = MemoryIndex(root, check_interval=0)
+        started = time.perf_counter()
+        index.refresh()
+        build_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index.refresh()
+        noop_s = time.perf_counter() - started
+
+        target = root / "notes_7.md"
+        changed = target.read_text(encoding="utf-8") + "\n\n## nuevo\nrender deploy"
+        target.write_text(changed, encoding="utf-8")
+        started = time.perf_counter()
+        index.refresh()
+        incremental_s = time.perf_counter() - started
+
+        index.check_interval = 3600  # measure queries without the stat pass
+        timings, injected = [], []
+        for _ in range(50):
+            for query in QUERIES:
+                started = time.perf_counter()
+                results = index.search(query, k=4)
+                timings.append(time.perf_counter() - started)
+                injected.append(estimate_tokens(format_chunks(results)))
+        timings.sort()
+
+        report = index.report()
+        print(f"📊 {N_FILES} files, {report['chunks']} chunks, {report['terms']} terms")
+        print(f"   full build        : {build_s * 1000:8.1f} ms")
+        print(f"   refresh unchanged : {noop_s * 1000:8.1f} ms")
+        print(f"   refresh 1 changed : {incremental_s * 1000:8.1f} ms")
+        print(f"   query p50 / p95   : {timings[len(timings) // 2] * 1000:6.2f} / "
+              f"{timings[int(len(timings) * 0.95)] * 1000:6.2f} ms")
+        print(f"   prompt tokens     : {sum(injected) / len(injected):8.0f} top-4 "
+              f"vs {corpus_tokens} full files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Benchmark: concurrent provider calls, sync SDK in threads vs async client
+
+A local stub of the Groq chat completions endpoint answers every request
+after a fixed delay. The old path (sync ``Groq`` client in
+``asyncio.to_thread``) is capped by the default thread pool; GroqProvider
+on the shared HTTPPool (default limits) is capped by its connection limit.
+Past 64 connections httpcore's pool bookkeeping costs more CPU than the
+extra parallelism saves, which is why the defaults stay there.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.cloud.http_pool import HTTPPool  # noqa: E402
+from app.cloud.providers import GroqProvider  # noqa: E402
+
+DELAY = 0.2  # simulated model latency per request
+CONCURRENCY = (1, 8, 32, 128, 256)
+MESSAGES = [{"role": "user", "content": "hola"}]
+
+_RESPONSE = json.dumps({
+    "id": "stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "stub",
+    "choices": [{
+        "index": 0,
+        "finish_reason": "stop",
+        "message": {"role": "assistant", "content": "ok"},
+    }],
+    "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+}).encode()
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Minimal HTTP/1.1 keep-alive server: every request gets _RESPONSE"""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            await asyncio.sleep(DELAY)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: %d\r\n\r\n%s" % (len(_RESPONSE), _RESPONSE)
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+def _serve(port_ready: "list", stop: threading.Event) -> None:
+    """Run the stub in its own thread and event loop, like a remote API"""
+
+    async def main() -> None:
+        server = await asyncio.start_server(_handle, "127.0.0.1", 0, backlog=1024)
+        port_ready.append(server.sockets[0].getsockname()[1])
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+        server.close()
+
+    asyncio.run(main())
+
+
+async def _run(n: int, call) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(n)))
+    return time.perf_counter() - started
+
+
+async def bench(base_url: str) -> None:
+    from groq import Groq
+
+    # The default executor, sized as asyncio sizes it
+    workers = min(32, (os.cpu_count() or 1) + 4)
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(workers))
+
+    sync_client = Groq(api_key="stub", base_url=base_url)
+
+    async def threaded_call():
+        return await asyncio.to_thread(
+            sync_client.chat.completions.create, model="stub", messages=MESSAGES
+        )
+
+    pool = HTTPPool()
+    provider = GroqProvider(api_key="stub", model="stub", http_pool=pool)
+    provider.client = provider.client.with_options(base_url=base_url)
+
+    async def async_call():
+        return await provider.call(MESSAGES)
+
+    # Warm up connections on both paths
+    await _run(8, threaded_call)
+    await _run(8, async_call)
+
+    print(
+        f"📊 stub latency {DELAY * 1000:.0f} ms, default executor {workers} threads, "
+        f"pool {pool.max_connections} connections"
+    )
+    print(f"   {'concurrent':>10} | {'to_thread (sync SDK)':>22} | {'async client + pool':>22}")
+    for n in CONCURRENCY:
+        threaded = await _run(n, threaded_call)
+        native = await _run(n, async_call)
+        print(
+            f"   {n:>10} | {threaded:7.2f} s {n / threaded:8.1f} req/s | "
+            f"{native:7.2f} s {n / native:8.1f} req/s"
+        )
+
+    sync_client.close()
+    await pool.aclose()
+
+
+def main():
+    logger.disable("app")  # two log lines per call would dominate the output
+    port_ready: list = []
+    stop = threading.Event()
+    server = threading.Thread(target=_serve, args=(port_ready, stop), daemon=True)
+    server.start()
+    while not port_ready:
+        time.sleep(0.01)
+    try:
+        asyncio.run(bench(f"http://127.0.0.1:{port_ready[0]}/openai/v1"))
+    finally:
+        stop.set()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Benchmark: retention scan and eviction over a large sessions directory"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.cloud.session_retention import SessionRetention, scan_sessions  # noqa: E402
+from app.cloud.sessions import SessionManager  # noqa: E402
+
+N_FILES = 100_000
+N_USERS = 500
+
+
+def populate(sessions_dir: Path) -> None:
+    """Small fake session logs spread over 60 days and N_USERS users"""
+    now = time.time()
+    for i in range(N_FILES):
+        path = sessions_dir / f"telegram_{i % N_USERS}_{i}.jsonl"
+        path.write_bytes(b'{"kind":"header","user_id":"%d"}\n' % (i % N_USERS) + b"x" * (i % 2048))
+        mtime = now - (i % 60) * 86400
+        os.utime(path, (mtime, mtime))
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = SessionManager(data_dir=tmp)
+        print(f"📁 Creating {N_FILES} session logs...")
+        populate(manager.sessions_dir)
+
+        # Warm the dentry cache so both scans are measured the same way
+        scan_sessions(manager.sessions_dir)
+
+        started = time.perf_counter()
+        legacy = [p.stat().st_mtime for p in manager.sessions_dir.glob("*.jsonl")]
+        legacy_s = time.perf_counter() - started
+        print(f"🐢 glob + stat (old cleanup): {len(legacy)} files in {legacy_s:.3f}s")
+
+        started = time.perf_counter()
+        entries = scan_sessions(manager.sessions_dir)
+        print(f"🔍 scandir: {len(entries)} files in {time.perf_counter() - started:.3f}s")
+
+        retention = SessionRetention(
+            manager, max_age_days=30, user_quota_mb=0.05, disk_budget_mb=20
+        )
+        report = await retention.run_once()
+        print(f"🧹 retention: {report}")
+        await manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
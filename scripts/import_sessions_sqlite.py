@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""Import JSONL session logs into the SQLite session store"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.cloud.sessions_sqlite import SqliteSessionManager  # noqa: E402
+
+
+async def import_sessions(data_dir: str, db_path: str) -> bool:
+    """Copy every session in data_dir/sessions into the database"""
+    manager = SqliteSessionManager(data_dir=data_dir, db_path=db_path)
+    try:
+        imported = await manager.import_jsonl()
+        print(f"✅ Imported {imported} sessions into {db_path}")
+        return True
+    except Exception as e:
+        print(f"❌ Import failed: {e}", file=sys.stderr)
+        return False
+    finally:
+        await manager.close()
+
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "./data"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else str(Path(data_dir) / "sessions.db")
+    success = asyncio.run(import_sessions(data_dir, db_path))
+    sys.exit(0 if success else 1)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Convert snapshot-style session logs to the delta-append format"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.cloud.sessions import migrate_session_file  # noqa: E402
+
+
+def migrate_sessions(sessions_dir: Path) -> bool:
+    """Migrate every session log in the directory"""
+
+    if not sessions_dir.exists():
+        print(f"⚠️  Sessions directory not found: {sessions_dir}")
+        return True
+
+    migrated = skipped = failed = 0
+    bytes_before = bytes_after = 0
+    started = time.perf_counter()
+
+    for session_file in sorted(sessions_dir.glob("*.jsonl")):
+        size = session_file.stat().st_size
+        try:
+            if migrate_session_file(session_file):
+                migrated += 1
+                bytes_before += size
+                bytes_after += session_file.stat().st_size
+                print(f"✅ {session_file.name}: {size} -> {session_file.stat().st_size} bytes")
+            else:
+                skipped += 1
+        except Exception as e:
+            failed += 1
+            print(f"❌ {session_file.name}: {e}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"\n📦 Migrated {migrated}, skipped {skipped}, failed {failed} "
+        f"in {elapsed:.2f}s ({bytes_before - bytes_after} bytes reclaimed)"
+    )
+    return failed == 0
+
+
+if __name__ == "__main__":
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("./data/sessions")
+    success = migrate_sessions(target)
+    sys.exit(0 if success else 1)
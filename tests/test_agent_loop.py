@@ -1,8 +1,10 @@
 """Tests for agent loop and LLM integration"""
 
+import asyncio
 import pytest
-from unittest.mock import AsyncMock, MagicMock
+from unittest.mock import AsyncMock
 
+from app.cloud.providers import ProviderManager
 from app.core.loop import AgentLoop
 from app.core.context import AgentContext
 from app.config import Settings
@@ -87,3 +89,296 @@ def test_agent_context_to_dict(agent_context):
     assert ctx_dict["user_id"] == "test_user"
     assert ctx_dict["channel"] == "test"
     assert len(ctx_dict["messages"]) == 1
+
+
+class ScriptedProvider:
+    """Fake provider replaying a list of responses and recording requests"""
+
+    max_input_tokens = 8000
+    # Once the script runs out, keep asking for tools
+    fallback = {"text": "", "tool_calls": [{"id": "x", "name": "slow", "args": {}}]}
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def call(self, messages, max_tokens=8192, temperature=0.7, tools=None, tool_choice="auto",
+                   deadline=None):
+        self.requests.append({"messages": messages, "tool_choice": tool_choice})
+        return self.responses.pop(0) if self.responses else self.fallback
+
+
+class SlowTools:
+    """Tool executor whose calls sleep, tracking peak concurrency"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+
+    async def execute(self, tool_call, deadline=None, origin=(None, None)):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(tool_call["args"].get("delay", self.delay))
+            return f"ok {tool_call['id']}"
+        finally:
+            self.running -= 1
+
+
+def _loop(settings, provider, fallback=None, **overrides):
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    manager = ProviderManager(settings)
+    manager.groq_provider, manager.anthropic_provider = provider, fallback
+    loop = AgentLoop(settings, manager)
+    loop.tool_executor = SlowTools()
+    return loop
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_run_concurrently_and_feed_back(settings, agent_context):
+    """All tool calls of a step run together and their results reach the next call"""
+    provider = ScriptedProvider([
+        {"text": "", "tool_calls": [
+            {"id": f"c{i}", "name": "slow", "args": {}} for i in range(3)
+        ]},
+        {"text": "listo", "tool_calls": []},
+    ])
+    loop = _loop(settings, provider, tool_concurrency=2)
+
+    assert await loop.process_message(agent_context) == "listo"
+    assert loop.tool_executor.peak == 2
+
+    second = provider.requests[1]["messages"]
+    assert second[-4]["tool_calls"][0]["id"] == "c0"
+    assert [m["tool_call_id"] for m in second[-3:]] == ["c0", "c1", "c2"]
+    assert [m["content"] for m in second[-3:]] == ["ok c0", "ok c1", "ok c2"]
+    roles = [m.role for m in agent_context.messages]
+    assert roles == ["user", "assistant", "tool", "tool", "tool", "assistant"]
+    assert loop.loop_stats["steps"] == 2 and loop.loop_stats["tool_calls"] == 3
+
+
+@pytest.mark.asyncio
+async def test_tool_timeout_and_step_limit(settings, agent_context):
+    """Slow tools time out; the last step disables tools and ends the turn"""
+    provider = ScriptedProvider([
+        {"text": "", "tool_calls": [{"id": "a", "name": "slow", "args": {"delay": 1}}]},
+    ])
+    loop = _loop(settings, provider, tool_max_steps=2, tool_timeout=0.05)
+
+    response = await loop.process_message(agent_context)
+
+    assert "excedió timeout" in agent_context.messages[2].content
+    assert [r["tool_choice"] for r in provider.requests] == ["auto", "none"]
+    assert "2 pasos" in response
+    assert loop.loop_stats["tool_timeouts"] == 1
+    assert loop.loop_stats["step_limit_hits"] == 1
+
+
+class StreamingProvider(ScriptedProvider):
+    """Scripted provider that also streams each response in small deltas"""
+
+    async def stream(
+        self, messages, max_tokens=8192, temperature=0.7, tools=None, tool_choice="auto"
+    ):
+        response = await self.call(messages, max_tokens, temperature, tools, tool_choice)
+        for i in range(0, len(response["text"]), 3):
+            yield {"type": "text", "text": response["text"][i:i + 3]}
+        yield {"type": "done", **response}
+
+
+@pytest.mark.asyncio
+async def test_streamed_steps_reach_on_delta(settings, agent_context):
+    """Text of every step is forwarded as it streams, steps split by a blank line"""
+    provider = StreamingProvider([
+        {"text": "reviso", "tool_calls": [{"id": "a", "name": "slow", "args": {}}]},
+        {"text": "todo listo", "tool_calls": []},
+    ])
+    loop = _loop(settings, provider)
+    deltas = []
+
+    async def on_delta(text):
+        deltas.append(text)
+
+    assert await loop.process_message(agent_context, on_delta=on_delta) == "todo listo"
+    assert "".join(deltas) == "reviso\n\ntodo listo"
+    assert len(deltas) > 3
+    assert agent_context.messages[-1].content == "todo listo"
+    assert loop.loop_stats["streamed_steps"] == 2
+
+
+class BrokenStreamProvider(StreamingProvider):
+    """Primary whose stream fails before yielding anything"""
+
+    name = "groq"
+
+    async def stream(self, *args, **kwargs):
+        raise ConnectionError("groq caído")
+        yield
+
+
+@pytest.mark.asyncio
+async def test_stream_falls_back_before_the_first_delta(settings, agent_context):
+    """A primary that fails before streaming anything is replaced by Anthropic"""
+    fallback = StreamingProvider([{"text": "respuesta de respaldo", "tool_calls": []}])
+    loop = _loop(settings, BrokenStreamProvider([]), fallback=fallback)
+    deltas = []
+
+    async def on_delta(text):
+        deltas.append(text)
+
+    response = await loop.process_message(agent_context, on_delta=on_delta)
+    assert response == "respuesta de respaldo"
+    assert "".join(deltas) == "respuesta de respaldo"
+    assert len(fallback.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_matching_skill_body_is_injected(settings, tmp_path):
+    """Only a skill relevant to the request is sent, with the latest user message"""
+    from app.core.skills import SkillRegistry
+
+    skill = tmp_path / "deploy-render"
+    skill.mkdir()
+    (skill / "SKILL.md").write_text(
+        "---\ndescription: Desplegar el servicio en Render\n---\nUsa render.yaml", encoding="utf-8"
+    )
+    provider = ScriptedProvider([{"text": "ok", "tool_calls": []}] * 2)
+    loop = _loop(settings, provider)
+    loop.skills = SkillRegistry(tmp_path, check_interval=0)
+
+    ctx = AgentContext(session_id="s", user_id="u", channel="test")
+    ctx.add_message("user", "haz el deploy a render")
+    await loop.process_message(ctx)
+    messages = provider.requests[0]["messages"]
+    assert "## Skill" not in messages[1]["content"]
+    assert "## Skill: deploy-render\nUsa render.yaml" in messages[-1]["content"]
+    assert messages[-1]["content"].endswith("haz el deploy a render")
+
+    ctx.add_message("user", "¿qué hora es?")
+    await loop.process_message(ctx)
+    messages = provider.requests[1]["messages"]
+    assert "## Skill" not in str(messages)
+    assert messages[-1]["content"] == "¿qué hora es?"
+
+
+@pytest.mark.asyncio
+async def test_retrieved_memory_is_fresh_each_turn(settings, tmp_path):
+    """Retrieval runs once per turn and sees workspace edits made since the last one"""
+    from app.core.memory_index import MemoryIndex
+
+    notes = tmp_path / "notas.md"
+    notes.write_text("# Deploy\nEl deploy corre en el servidor alfa", encoding="utf-8")
+    provider = ScriptedProvider([
+        {"text": "", "tool_calls": [{"id": "c1", "name": "slow", "args": {"delay": 0}}]},
+        {"text": "en alfa", "tool_calls": []},
+        {"text": "en beta-2", "tool_calls": []},
+    ])
+    loop = _loop(settings, provider)
+    loop.memory_index = MemoryIndex(tmp_path, check_interval=0)
+
+    first = AgentContext(session_id="a", user_id="1", channel="test")
+    first.add_message("user", "¿dónde corre el deploy?")
+    await loop.process_message(first)
+    assert loop.memory_index.stats["queries"] == 1
+    assert all("servidor alfa" in str(r["messages"]) for r in provider.requests)
+
+    notes.write_text("# Deploy\nEl deploy corre en el servidor beta-2", encoding="utf-8")
+    second = AgentContext(session_id="b", user_id="2", channel="test")
+    second.add_message("user", "¿dónde corre el deploy?")
+    await loop.process_message(second)
+    assert "servidor beta-2" in str(provider.requests[-1]["messages"])
+    assert "servidor alfa" not in str(provider.requests[-1]["messages"])
+
+
+@pytest.mark.asyncio
+async def test_busy_scheduler_answers_without_calling_the_model(settings, agent_context):
+    """A rejected turn gets a busy reply and the provider is not called"""
+    provider = ScriptedProvider([{"text": "ok", "tool_calls": []}])
+    loop = _loop(settings, provider, llm_max_in_flight=1, llm_max_queue=0)
+
+    async with loop.scheduler.slot("otro"):
+        response = await loop.process_message(agent_context)
+
+    assert "muchas solicitudes" in response
+    assert provider.requests == []
+    assert agent_context.messages[-1].metadata["busy"] is True
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_the_whole_turn(settings, agent_context):
+    """Tools and later steps share one deadline; running out ends the turn"""
+    provider = ScriptedProvider([])  # always asks for more tools
+    loop = _loop(settings, provider, request_deadline_seconds=0.2)
+    loop.tool_executor.delay = 0.08
+
+    response = await loop.process_message(agent_context)
+
+    assert "tiempo límite" in response
+    assert len(provider.requests) <= 4
+    assert agent_context.messages[-1].metadata["deadline"] is True
+    assert loop.loop_stats["deadline_exceeded"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancel_aborts_stream_and_counts_saved_time(settings, agent_context):
+    """Cancelling mid-stream stops the turn and estimates the provider time saved"""
+
+    class HangingProvider(StreamingProvider):
+        async def stream(
+            self, messages, max_tokens=8192, temperature=0.7, tools=None, tool_choice="auto"
+        ):
+            if self.requests:
+                yield {"type": "text", "text": "empiezo"}
+                await asyncio.sleep(10)
+            events = super().stream(messages, max_tokens, temperature, tools, tool_choice)
+            async for event in events:
+                await asyncio.sleep(0.05)
+                yield event
+
+    provider = HangingProvider([{"text": "ok", "tool_calls": []}])
+    loop = _loop(settings, provider)
+    deltas = []
+
+    async def on_delta(text):
+        deltas.append(text)
+
+    # A completed call gives the average duration
+    await loop.process_message(agent_context, on_delta=on_delta)
+    task = asyncio.create_task(loop.process_message(agent_context, on_delta=on_delta))
+    await asyncio.sleep(0.02)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert deltas[-1] == "empiezo"
+    assert agent_context.messages[-1].metadata["cancelled"] is True
+    assert loop.loop_stats["cancelled_turns"] == 1
+    assert loop.loop_stats["provider_seconds_saved"] > 0
+
+
+@pytest.mark.asyncio
+async def test_cancel_during_tools_leaves_a_valid_history(settings, agent_context):
+    """Tool calls interrupted by /cancel get a result, so the session can continue"""
+    from app.cloud.providers import to_openai_messages
+
+    provider = ScriptedProvider([
+        {"text": "", "tool_calls": [
+            {"id": "a", "name": "slow", "args": {"delay": 5}},
+            {"id": "b", "name": "slow", "args": {"delay": 5}},
+        ]},
+    ])
+    loop = _loop(settings, provider)
+    task = asyncio.create_task(loop.process_message(agent_context))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    results = [m for m in agent_context.messages if m.role == "tool"]
+    assert [m.metadata["tool_call_id"] for m in results] == ["a", "b"]
+    assert all(m.metadata["cancelled"] for m in results)
+
+    chat = to_openai_messages([m.to_chat() for m in agent_context.messages])
+    assert [m["role"] for m in chat[-4:]] == ["assistant", "tool", "tool", "assistant"]
@@ -0,0 +1,34 @@
+"""Tests for the compact message representation"""
+
+from datetime import datetime
+
+from app.core.context import AgentContext, Message
+
+
+def test_message_is_compact_and_lazy():
+    """Messages use slots, interned roles and allocate metadata on demand"""
+    ctx = AgentContext(session_id="s", user_id="u", channel="test")
+    ctx.add_message("user", "uno")
+    ctx.add_message("user", "dos")
+
+    first, second = ctx.messages
+    assert not hasattr(first, "__dict__")
+    assert first.role is second.role
+    assert first._metadata is None
+    assert first.to_dict()["metadata"] == {}
+
+    first.metadata["tool"] = "read_file"
+    assert first.to_dict()["metadata"] == {"tool": "read_file"}
+
+
+def test_message_timestamp_roundtrip():
+    """Epoch storage keeps datetime semantics and exact ISO serialization"""
+    when = datetime(2026, 3, 1, 12, 30, 45, 123456)
+    msg = Message(role="assistant", content="hola", timestamp=when)
+
+    assert msg.timestamp == when
+    assert msg.to_dict()["timestamp"] == when.isoformat()
+    assert Message.from_dict(msg.to_dict()) == msg
+
+    whole_second = Message(role="user", content="x", timestamp=datetime(2026, 3, 1, 0, 0, 1))
+    assert whole_second.to_dict()["timestamp"] == "2026-03-01T00:00:01"
@@ -0,0 +1,81 @@
+"""Tests for the token-budgeted context window"""
+
+from app.core.context import AgentContext, Message
+from app.core.context_builder import ContextBuilder
+
+
+def _context(n, size=400):
+    ctx = AgentContext(session_id="s", user_id="u", channel="test")
+    for i in range(n):
+        ctx.add_message("user" if i % 2 == 0 else "assistant", f"{i}: " + "x" * size)
+    return ctx
+
+
+def test_short_conversation_is_sent_verbatim():
+    """Everything fits: system prompt plus every message, nothing trimmed"""
+    ctx = _context(4)
+    window = ContextBuilder(max_input_tokens=4000, keep_recent=2).build("sistema", ctx.messages)
+
+    assert window.messages[0] == {"role": "system", "content": "sistema"}
+    assert [m["content"] for m in window.messages[1:]] == [m.content for m in ctx.messages]
+    assert window.trimmed_tokens == 0
+    assert window.dropped_messages == 0
+
+
+def test_long_history_fits_budget_keeping_recent_turns():
+    """Older turns are dropped or elided, the recent window stays verbatim"""
+    ctx = _context(200)
+    builder = ContextBuilder(max_input_tokens=2000, keep_recent=4)
+    window = builder.build("sistema", ctx.messages)
+
+    assert window.input_tokens <= 2000
+    assert [m["content"] for m in window.messages[-4:]] == [m.content for m in ctx.messages[-4:]]
+    assert window.dropped_messages > 150
+    assert window.trimmed_tokens > 0
+    assert window.messages[0]["content"] == "sistema"
+    assert f"Se omitieron {window.dropped_messages}" in window.messages[1]["content"]
+    assert len(window.messages) - 2 + window.dropped_messages == 200
+
+
+def test_oversized_recent_message_is_elided_not_dropped():
+    """A huge tool output in the recent window keeps its head and tail"""
+    ctx = _context(2)
+    ctx.add_message("tool", "INICIO " + "y" * 50_000 + " FIN")
+    window = ContextBuilder(max_input_tokens=1000, keep_recent=3).build("sistema", ctx.messages)
+
+    tool = window.messages[-1]["content"]
+    assert tool.startswith("INICIO") and tool.endswith("FIN")
+    assert "caracteres omitidos" in tool
+    assert window.elided_messages == 1
+    assert window.input_tokens <= 1000
+
+
+def test_turn_context_follows_the_history():
+    """Per-turn text rides on the latest user message, leaving the prefix unchanged"""
+    ctx = _context(5)
+    ctx.add_message("tool", "resultado")
+    builder = ContextBuilder(max_input_tokens=4000, keep_recent=2)
+    first = builder.build("sistema", ctx.messages, system_context="Usuario: u",
+                          turn_context="## Memoria relevante\nalfa")
+    second = builder.build("sistema", ctx.messages, system_context="Usuario: u",
+                           turn_context="## Memoria relevante\nbeta")
+
+    assert first.messages[1] == {"role": "system", "content": "Usuario: u"}
+    assert first.messages[:6] == second.messages[:6]
+    assert first.messages[6]["content"] == (
+        "## Memoria relevante\nalfa\n\n" + ctx.messages[4].content
+    )
+    assert first.messages[-1]["content"] == "resultado"
+    assert ctx.messages[4].content.startswith("4: ")
+
+
+def test_message_token_estimate_is_cached():
+    """The estimate is computed once and refreshed when content changes"""
+    msg = Message(role="user", content="hola " * 100)
+    assert msg._tokens is None
+    tokens = msg.tokens
+    assert msg._tokens == tokens
+
+    msg.content = "hola"
+    assert msg._tokens is None
+    assert msg.tokens < tokens
@@ -0,0 +1,141 @@
+"""Tests for the background job queue"""
+
+import asyncio
+
+import pytest
+
+from app.core.jobs import CANCELLED, DONE, FAILED, QUEUED, RUNNING, TIMEOUT, JobQueue
+from app.core.tools import ToolExecutor
+
+
+class Inbox:
+    """Notifier collecting messages per chat"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def __call__(self, channel, chat_id, text):
+        self.messages.append((channel, chat_id, text))
+
+
+async def _wait_for(queue, job_id, statuses, timeout=5):
+    async with asyncio.timeout(timeout):
+        while (job := await queue.get(job_id)).status not in statuses:
+            await asyncio.sleep(0.02)
+    return job
+
+
+@pytest.mark.asyncio
+async def test_job_runs_in_background_and_notifies(tmp_path):
+    """Submit returns at once; progress and completion reach the chat"""
+    inbox = Inbox()
+    queue = JobQueue(tmp_path / "jobs.db", progress_interval=0.1, notify=inbox)
+    await queue.start()
+
+    job = await queue.submit(
+        "shell", "echo uno; sleep 0.3; echo dos", channel="telegram", chat_id="42"
+    )
+    assert job.status == QUEUED
+
+    job = await _wait_for(queue, job.id, (DONE, FAILED))
+    assert job.status == DONE and job.returncode == 0
+    assert job.output == "uno\ndos"
+    assert any("sigue en ejecución" in text for _, _, text in inbox.messages)
+    assert inbox.messages[-1][:2] == ("telegram", "42")
+    assert inbox.messages[-1][2].startswith(f"✅ Job #{job.id} terminó")
+
+    failed = await queue.submit("shell", "exit 3")
+    failed = await _wait_for(queue, failed.id, (DONE, FAILED))
+    assert failed.status == FAILED and failed.returncode == 3
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_timeout_and_cancel_kill_the_command(tmp_path):
+    """Jobs past their timeout, or cancelled, are killed and recorded"""
+    queue = JobQueue(tmp_path / "jobs.db", workers=2, timeout=0.2)
+    await queue.start()
+
+    slow = await queue.submit("shell", "sleep 5")
+    assert (await _wait_for(queue, slow.id, (TIMEOUT,))).status == TIMEOUT
+
+    queue.timeout = 10
+    other = await queue.submit("shell", "sleep 5")
+    await _wait_for(queue, other.id, (RUNNING,))
+    assert await queue.cancel(other.id)
+    assert (await _wait_for(queue, other.id, (CANCELLED,))).finished_at is not None
+    assert not await queue.cancel(other.id)
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_restart_runs_queued_jobs_and_fails_interrupted_ones(tmp_path):
+    """Queued jobs survive a restart; one cut short is not repeated unless opted in"""
+    inbox = Inbox()
+    queue = JobQueue(tmp_path / "jobs.db", workers=1)
+    await queue.start()
+    running = await queue.submit("git", "sleep 5; echo tarde", channel="telegram", chat_id="42")
+    waiting = await queue.submit("shell", "echo espera")
+    await _wait_for(queue, running.id, (RUNNING,))
+    await queue.close()
+
+    queue = JobQueue(tmp_path / "jobs.db", workers=2, notify=inbox)
+    assert (await queue.get(running.id)).status == RUNNING
+    assert await queue.start() == 1
+    assert inbox.messages[0][2].startswith(f"⚠️ Job #{running.id} interrumpido por un reinicio")
+    assert (await queue.get(running.id)).status == FAILED
+    assert (await _wait_for(queue, waiting.id, (DONE,))).output == "espera"
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_resumable_kinds_are_retried_up_to_max_attempts(tmp_path):
+    """Opted-in kinds run again after a restart, until max_attempts is reached"""
+    queue = JobQueue(tmp_path / "jobs.db", resume_kinds=("shell",), max_attempts=2)
+    await queue.start()
+    job = await queue.submit("shell", "sleep 5")
+    for attempt in (1, 2):
+        assert (await _wait_for(queue, job.id, (RUNNING,))).attempts == attempt
+        await queue.close()
+        queue = JobQueue(tmp_path / "jobs.db", resume_kinds=("shell",), max_attempts=2)
+        await queue.start()
+
+    assert (await queue.get(job.id)).status == FAILED
+    assert queue.stats["interrupted"] == 1
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_tool_executor_sends_background_commands_to_the_queue(tmp_path):
+    """background=true returns a job id instead of waiting for the command"""
+    queue = JobQueue(tmp_path / "jobs.db")
+    await queue.start()
+    executor = ToolExecutor(jobs=queue)
+    origin = ("telegram", "42")
+
+    result = await executor.execute(
+        {"name": "execute_shell", "args": {"command": "echo hecho", "background": True}},
+        origin=origin,
+    )
+    assert result.startswith("🕒 Job #1 en cola")
+    await _wait_for(queue, 1, (DONE,))
+
+    status = await executor.execute({"name": "job_status", "args": {"job_id": 1}}, origin=origin)
+    assert "done" in status and status.endswith("hecho")
+    listing = await executor.execute({"name": "job_status", "args": {}}, origin=origin)
+    assert listing.startswith("Job #1 (shell) done")
+
+    # Other chats, or a request with no chat, neither see nor cancel the job
+    for other in (("telegram", "7"), ("telegram", None)):
+        listing = await executor.execute({"name": "job_status", "args": {}}, origin=other)
+        assert listing == "No hay jobs"
+        status = await executor.execute({"name": "job_status", "args": {"job_id": 1}}, origin=other)
+        assert status == "❌ Job #1 no existe"
+    assert len(await queue.list()) == 1
+
+    job = await queue.submit("shell", "sleep 5", channel="telegram", chat_id=42)
+    cancel = {"name": "job_status", "args": {"job_id": job.id, "cancel": True}}
+    assert "no existe" in await executor.execute(cancel, origin=("telegram", "7"))
+    assert (await queue.get(job.id)).status != CANCELLED
+    assert "cancelado" in await executor.execute(cancel, origin=("telegram", 42))
+    await queue.close()
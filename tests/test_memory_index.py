@@ -0,0 +1,102 @@
+"""Tests for BM25 retrieval over workspace memory"""
+
+import os
+
+from app.core.memory import Memory
+from app.core.memory_index import MemoryIndex, chunk_markdown, tokenize
+
+MEMORY = """# Memoria
+
+## Deploy
+Render despliega desde main con `render.yaml`.
+
+### Variables
+GROQ_API_KEY y TELEGRAM_TOKEN en el dashboard.
+
+## Proyectos
+- MueveCancun: PWA de transporte
+```
+# no es un título
+```
+"""
+
+
+def _workspace(tmp_path):
+    (tmp_path / "memory").mkdir()
+    (tmp_path / "memory" / "MEMORY.md").write_text(MEMORY, encoding="utf-8")
+    (tmp_path / "SOUL.md").write_text("# Alma\nNunca indexado: despliega", encoding="utf-8")
+    (tmp_path / "skills" / "git").mkdir(parents=True)
+    (tmp_path / "skills" / "git" / "SKILL.md").write_text("# Git\ndespliega", encoding="utf-8")
+    return tmp_path
+
+
+def test_chunks_follow_headings_outside_code_fences():
+    chunks = chunk_markdown(MEMORY, "memory/MEMORY.md")
+
+    assert [c.heading for c in chunks] == [
+        "Memoria > Deploy",
+        "Memoria > Deploy > Variables",
+        "Memoria > Proyectos",
+    ]
+    assert "# no es un título" in chunks[2].text
+    assert chunks[1].line == 6
+    assert tokenize("Cancún DESPLIEGA") == ["cancun", "despliega"]
+
+
+def test_search_ranks_relevant_sections_only(tmp_path):
+    """Prompt files and skills are not indexed; matches rank by BM25"""
+    index = MemoryIndex(_workspace(tmp_path), check_interval=0)
+
+    results = index.search("¿cómo despliega render?", k=2)
+
+    assert [c.heading for _, c in results] == ["Memoria > Deploy"]
+    assert index.report()["files"] == 1
+    assert index.search("transporte cancun")[0][1].heading == "Memoria > Proyectos"
+    assert index.search("kubernetes") == []
+
+
+def test_index_updates_incrementally(tmp_path):
+    """Only changed files are re-indexed; removed files leave no postings"""
+    workspace = _workspace(tmp_path)
+    index = MemoryIndex(workspace, check_interval=0)
+    assert index.refresh() == 1
+    assert index.refresh() == 0
+
+    notes = workspace / "NOTES.md"
+    notes.write_text("# Notas\nEl backup va a S3 cada noche", encoding="utf-8")
+    assert index.refresh() == 1
+    assert index.search("backup s3")[0][1].path == "NOTES.md"
+
+    notes.write_text("# Notas\nSin backups", encoding="utf-8")
+    os.utime(notes, ns=(1, 1))
+    assert index.refresh() == 1
+    assert "s3" not in index._postings
+
+    notes.unlink()
+    assert index.refresh() == 1
+    assert index.report()["chunks"] == 3
+
+
+def test_memory_context_for_query(tmp_path):
+    memory = Memory(_workspace(tmp_path))
+
+    context = memory.get_memory_context("variables de entorno GROQ")
+    assert context.startswith("### memory/MEMORY.md — Memoria > Deploy > Variables")
+    assert "Proyectos" not in context
+    assert memory.search("pwa", k=1)[0]["heading"] == "Memoria > Proyectos"
+
+
+def test_memory_and_agent_loop_share_one_index(tmp_path):
+    from unittest.mock import MagicMock
+
+    from app.config import Settings
+    from app.core.loop import AgentLoop
+
+    index = MemoryIndex(_workspace(tmp_path))
+    memory = Memory(tmp_path, index=index)
+    settings = Settings(
+        telegram_token="t", telegram_user_id="u", groq_api_key="g", anthropic_api_key="a"
+    )
+    loop = AgentLoop(settings, MagicMock(), memory_index=index)
+
+    assert memory.index is loop.memory_index is index
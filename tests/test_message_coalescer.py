@@ -0,0 +1,87 @@
+"""Tests for per-chat message coalescing"""
+
+import asyncio
+
+import pytest
+
+from app.cloud.message_coalescer import MessageCoalescer
+
+
+class Recorder:
+    """Handler recording each batch, optionally slow"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    async def __call__(self, key, items):
+        self.batches.append((key, list(items)))
+        await asyncio.sleep(self.delay)
+
+
+@pytest.mark.asyncio
+async def test_burst_becomes_one_batch():
+    """Messages within the window reach the handler once, per chat"""
+    handler = Recorder()
+    coalescer = MessageCoalescer(handler, window=0.05)
+
+    assert coalescer.submit("a", 1) is True
+    assert coalescer.submit("a", 2) is False
+    coalescer.submit("b", "x")
+    await asyncio.sleep(0.02)
+    coalescer.submit("a", 3)
+    await asyncio.sleep(0.1)
+
+    assert sorted(handler.batches) == [("a", [1, 2, 3]), ("b", ["x"])]
+    assert coalescer.stats["batches"] == 2
+    assert coalescer.stats["llm_calls_saved"] == 2
+    assert coalescer.stats["largest_batch"] == 3
+
+
+@pytest.mark.asyncio
+async def test_max_wait_caps_a_long_burst():
+    """A steady stream of messages is still answered after max_wait"""
+    handler = Recorder()
+    coalescer = MessageCoalescer(handler, window=0.05, max_wait=0.1)
+
+    for i in range(8):
+        coalescer.submit("a", i)
+        await asyncio.sleep(0.03)
+    await coalescer.close()
+
+    assert len(handler.batches) >= 2
+    assert [i for _, items in handler.batches for i in items] == list(range(8))
+
+
+@pytest.mark.asyncio
+async def test_batches_of_a_chat_run_in_order():
+    """A new burst waits for the previous batch of the same chat to finish"""
+    handler = Recorder(delay=0.1)
+    coalescer = MessageCoalescer(handler, window=0.01)
+
+    coalescer.submit("a", 1)
+    await asyncio.sleep(0.03)
+    coalescer.submit("a", 2)
+    await asyncio.sleep(0.03)
+    assert handler.batches == [("a", [1])]
+
+    await coalescer.close()
+    assert handler.batches == [("a", [1]), ("a", [2])]
+
+
+@pytest.mark.asyncio
+async def test_discard_drops_a_pending_batch():
+    """A discarded burst is never handed to the handler"""
+    batches = []
+
+    async def handler(key, items):
+        batches.append(items)
+
+    coalescer = MessageCoalescer(handler, window=0.05)
+    coalescer.submit("chat", "a")
+    coalescer.submit("chat", "b")
+
+    assert coalescer.discard("chat") == 2
+    assert coalescer.discard("chat") == 0
+    await asyncio.sleep(0.1)
+    assert batches == []
@@ -0,0 +1,37 @@
+"""Tests for the compiled system prompt"""
+
+import os
+
+from app.core.prompt import BASE_PROMPT, SystemPromptCompiler
+
+
+def test_prompt_includes_workspace_files_in_stable_order(tmp_path):
+    """Base prompt first, then SOUL.md and USER.md; repeated calls reuse the result"""
+    (tmp_path / "USER.md").write_text("# Usuario", encoding="utf-8")
+    (tmp_path / "SOUL.md").write_text("# Alma", encoding="utf-8")
+    compiler = SystemPromptCompiler(tmp_path, check_interval=0)
+
+    prompt = compiler.compile()
+    assert prompt.startswith(BASE_PROMPT)
+    assert prompt.index("# Alma") < prompt.index("# Usuario")
+
+    assert compiler.compile() is prompt
+    assert compiler.compilations == 1
+
+
+def test_prompt_recompiles_when_a_file_changes(tmp_path):
+    """Editing a workspace file produces a new prompt on the next check"""
+    soul = tmp_path / "SOUL.md"
+    soul.write_text("# Alma v1", encoding="utf-8")
+    compiler = SystemPromptCompiler(tmp_path, check_interval=0)
+    assert "v1" in compiler.compile()
+
+    soul.write_text("# Alma v2 con más texto", encoding="utf-8")
+    os.utime(soul, ns=(0, soul.stat().st_mtime_ns + 1_000_000))
+    assert "v2" in compiler.compile()
+    assert compiler.compilations == 2
+
+
+def test_missing_workspace_uses_base_prompt(tmp_path):
+    """Without workspace files the prompt is the base template"""
+    assert SystemPromptCompiler(tmp_path / "nada").compile() == BASE_PROMPT
@@ -1,14 +1,16 @@
 """Tests for LLM providers"""
 
 import pytest
+
 from app.cloud.providers import ProviderManager
 
 
 @pytest.fixture
 def provider_manager():
     """Create provider manager with test settings"""
-    from app.config import Settings
     import os
+
+    from app.config import Settings
     
     # Use environment variables
     settings = Settings()
@@ -35,3 +37,229 @@ def test_fallback_provider_anthropic(provider_manager):
     # Anthropic should be fallback
     if provider_manager.fallback_provider:
         assert provider_manager.fallback_provider.__class__.__name__ == "AnthropicProvider"
+
+
+def test_anthropic_request_marks_cache_breakpoints():
+    """Static prompt and latest turn carry cache_control; system moves out of messages"""
+    from app.cloud.providers import to_anthropic_request
+
+    request = to_anthropic_request([
+        {"role": "system", "content": "estático"},
+        {"role": "system", "content": "Usuario: 42"},
+        {"role": "user", "content": "hola"},
+        {"role": "tool", "content": "salida"},
+    ])
+
+    assert [b["text"] for b in request["system"]] == ["estático", "Usuario: 42"]
+    assert request["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in request["system"][1]
+    # The orphan tool result becomes user text, merged into the same turn
+    assert [m["role"] for m in request["messages"]] == ["user"]
+    assert len(request["messages"][0]["content"]) == 2
+    assert request["messages"][-1]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+
+
+def test_anthropic_usage_counts_cache_hits():
+    """Cache reads reported by the API are counted as hits"""
+    from types import SimpleNamespace
+
+    from app.cloud.providers import AnthropicProvider
+
+    provider = AnthropicProvider(api_key="test")
+    provider._record_usage(SimpleNamespace(
+        input_tokens=20, output_tokens=5,
+        cache_read_input_tokens=1500, cache_creation_input_tokens=0,
+    ))
+    provider._record_usage(SimpleNamespace(
+        input_tokens=1520, output_tokens=5,
+        cache_read_input_tokens=None, cache_creation_input_tokens=None,
+    ))
+
+    assert provider.stats["calls"] == 2
+    assert provider.stats["cache_hits"] == 1
+    assert provider.stats["cache_read_tokens"] == 1500
+    assert provider.stats["input_tokens"] == 3040
+
+
+def test_tool_calls_convert_per_provider():
+    """Assistant tool calls and their results map to each provider's format"""
+    from app.cloud.providers import to_anthropic_request, to_openai_messages
+
+    messages = [
+        {"role": "tool", "content": "viejo", "tool_call_id": "gone"},
+        {"role": "assistant", "content": "", "tool_calls": [
+            {"id": "a", "name": "read_file", "args": {"path": "x"}},
+            {"id": "b", "name": "web_fetch", "args": {"url": "http://y"}},
+        ]},
+        {"role": "tool", "content": "contenido", "tool_call_id": "a"},
+        {"role": "tool", "content": "html", "tool_call_id": "b"},
+    ]
+
+    openai = to_openai_messages(messages)
+    assert openai[0]["role"] == "user"
+    assert openai[1]["tool_calls"][1]["function"] == {"name": "web_fetch", "arguments": '{"url": "http://y"}'}
+    assert [m["role"] for m in openai[2:]] == ["tool", "tool"]
+
+    anthropic = to_anthropic_request(messages)["messages"]
+    assert [m["role"] for m in anthropic] == ["user", "assistant", "user"]
+    assert [b["type"] for b in anthropic[1]["content"]] == ["tool_use", "tool_use"]
+    assert [b["tool_use_id"] for b in anthropic[2]["content"]] == ["a", "b"]
+
+
+def test_tool_calls_without_result_are_left_out():
+    """A call interrupted before its result is dropped, so providers accept the history"""
+    from app.cloud.providers import to_anthropic_request, to_openai_messages
+
+    messages = [
+        {"role": "user", "content": "hola"},
+        {"role": "assistant", "content": "", "tool_calls": [
+            {"id": "a", "name": "slow", "args": {}},
+        ]},
+        {"role": "assistant", "content": "leo", "tool_calls": [
+            {"id": "b", "name": "read_file", "args": {}},
+            {"id": "c", "name": "read_file", "args": {}},
+        ]},
+        {"role": "tool", "content": "contenido", "tool_call_id": "b"},
+    ]
+
+    openai = to_openai_messages(messages)
+    assert [m["role"] for m in openai] == ["user", "assistant", "tool"]
+    assert [call["id"] for call in openai[1]["tool_calls"]] == ["b"]
+
+    anthropic = to_anthropic_request(messages)["messages"]
+    assert [m["role"] for m in anthropic] == ["user", "assistant", "user"]
+    assert [b.get("id") for b in anthropic[1]["content"]] == [None, "b"]
+
+
+@pytest.mark.asyncio
+async def test_groq_stream_yields_deltas_and_tool_calls():
+    """Text arrives as deltas; fragmented tool calls are reassembled at the end"""
+    from types import SimpleNamespace as NS
+
+    from app.cloud.providers import GroqProvider
+
+    def chunk(content=None, tool_calls=None, usage=None):
+        return NS(
+            choices=[NS(delta=NS(content=content, tool_calls=tool_calls))],
+            x_groq=NS(usage=usage) if usage else None,
+        )
+
+    chunks = [
+        chunk("Ho"),
+        chunk("la"),
+        chunk(tool_calls=[NS(index=0, id="c1", function=NS(name="read_file", arguments='{"pa'))]),
+        chunk(tool_calls=[NS(index=0, id=None, function=NS(name=None, arguments='th": "x"}'))]),
+        chunk(usage=NS(prompt_tokens=10, completion_tokens=3, prompt_tokens_details=None)),
+    ]
+    class FakeStream:
+        closed = False
+
+        def __init__(self, chunks):
+            self.chunks = chunks
+
+        async def __aiter__(self):
+            for chunk in self.chunks:
+                yield chunk
+
+        async def close(self):
+            self.closed = True
+
+    stream = FakeStream(chunks)
+
+    async def create(**kwargs):
+        return stream
+
+    provider = GroqProvider(api_key="test")
+    provider.client = NS(chat=NS(completions=NS(create=create)))
+
+    events = [event async for event in provider.stream([{"role": "user", "content": "hola"}])]
+
+    assert [e["text"] for e in events if e["type"] == "text"] == ["Ho", "la"]
+    assert events[-1] == {
+        "type": "done",
+        "text": "Hola",
+        "tool_calls": [{"id": "c1", "name": "read_file", "args": {"path": "x"}}],
+    }
+    assert provider.stats["calls"] == 1 and provider.stats["output_tokens"] == 3
+    assert stream.closed
+
+
+@pytest.mark.asyncio
+async def test_call_does_not_retry_or_run_past_the_deadline():
+    """A slow call is aborted at the deadline and not retried"""
+    import asyncio
+    import time
+    from types import SimpleNamespace as NS
+
+    from app.cloud.providers import GroqProvider
+    from app.core.deadline import Deadline, DeadlineExceeded
+
+    attempts = []
+
+    async def create(**kwargs):
+        attempts.append(kwargs)
+        await asyncio.sleep(0.3)
+        raise ConnectionError("boom")
+
+    provider = GroqProvider(api_key="test")
+    provider.client = NS(chat=NS(completions=NS(create=create)))
+
+    started = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        await provider.call([{"role": "user", "content": "hola"}], deadline=Deadline(0.1))
+    assert time.perf_counter() - started < 0.25
+    assert len(attempts) == 1
+
+    # A failure with little time left is not retried either
+    from tenacity import RetryError
+
+    with pytest.raises(RetryError):
+        await provider.call([{"role": "user", "content": "hola"}], deadline=Deadline(1.5))
+    assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_providers_share_one_pooled_http_client():
+    """Clients of the same HTTP library come from one pool, closed once"""
+    from app.cloud.http_pool import HTTPPool
+    from app.cloud.providers import GroqProvider
+
+    pool = HTTPPool(max_connections=8, http2=False)
+    first = GroqProvider(api_key="a", http_pool=pool)
+    second = GroqProvider(api_key="b", http_pool=pool)
+
+    assert first.client._client is second.client._client
+    assert pool.stats()["clients"] == {"httpx": "HTTP/1.1"}
+
+    await pool.aclose()
+    assert first.client._client.is_closed
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", ["groq", "anthropic"])
+async def test_cancelled_call_is_not_retried(name):
+    """Cancelling a provider call propagates after one attempt"""
+    import asyncio
+    from types import SimpleNamespace as NS
+
+    from app.cloud.providers import AnthropicProvider, GroqProvider
+
+    attempts = []
+
+    async def create(**kwargs):
+        attempts.append(kwargs)
+        await asyncio.sleep(10)
+
+    if name == "groq":
+        provider = GroqProvider(api_key="test")
+        provider.client = NS(chat=NS(completions=NS(create=create)))
+    else:
+        provider = AnthropicProvider(api_key="test")
+        provider.client = NS(messages=NS(create=create))
+
+    task = asyncio.create_task(provider.call([{"role": "user", "content": "hola"}]))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(task, 1)
+    assert len(attempts) == 1
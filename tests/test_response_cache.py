@@ -0,0 +1,131 @@
+"""Tests for the LLM response cache"""
+
+import pytest
+
+from app.cloud.response_cache import CachedProvider, ResponseCache, cache_key
+
+
+class CountingProvider:
+    """Fake provider counting real calls"""
+
+    name = "fake"
+    model = "fake-1"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def call(self, messages, max_tokens=8192, temperature=0.7, tools=None, tool_choice="auto",
+                   deadline=None):
+        self.calls += 1
+        return {"text": f"respuesta {self.calls}", "tool_calls": []}
+
+    async def stream(
+        self, messages, max_tokens=8192, temperature=0.7, tools=None, tool_choice="auto"
+    ):
+        response = await self.call(messages, max_tokens, temperature, tools, tool_choice)
+        yield {"type": "text", "text": response["text"]}
+        yield {"type": "done", **response}
+
+
+def _ask(text):
+    return [{"role": "system", "content": "sistema"}, {"role": "user", "content": text}]
+
+
+def test_key_ignores_case_and_whitespace_but_not_parameters():
+    """Normalized prompts share a key; model and sampling parameters do not"""
+    base = cache_key("groq", "m", _ask("Status del deploy"), 100, 0.7)
+    assert cache_key("groq", "m", _ask("  status   del DEPLOY\n"), 100, 0.7) == base
+    assert cache_key("groq", "m2", _ask("status del deploy"), 100, 0.7) != base
+    assert cache_key("groq", "m", _ask("status del deploy"), 100, 0.2) != base
+
+
+@pytest.mark.asyncio
+async def test_repeated_prompt_is_served_from_cache():
+    """A second identical prompt skips the provider, also when streaming"""
+    provider = CountingProvider()
+    cached = CachedProvider(provider, ResponseCache())
+
+    first = await cached.call(_ask("hola"))
+    assert await cached.call(_ask("Hola ")) == first
+    events = [e async for e in cached.stream(_ask("hola"))]
+
+    assert provider.calls == 1
+    assert events[-1]["text"] == "respuesta 1"
+    report = cached.cache.report()
+    assert report["hits"] == 2 and report["hit_rate"] == round(2 / 3, 3)
+
+
+@pytest.mark.asyncio
+async def test_tool_output_bypasses_cache():
+    """Conversations with tool results are always sent to the provider"""
+    provider = CountingProvider()
+    cached = CachedProvider(provider, ResponseCache())
+    messages = _ask("status") + [{"role": "tool", "content": "ok", "tool_call_id": "a"}]
+
+    await cached.call(messages)
+    await cached.call(messages)
+
+    assert provider.calls == 2
+    assert cached.cache.stats["bypassed"] == 2 and cached.cache.stats["lookups"] == 0
+
+
+@pytest.mark.asyncio
+async def test_long_history_bypasses_cache():
+    """The key leaves history out, so only short conversations use the cache"""
+    provider = CountingProvider()
+    cached = CachedProvider(provider, ResponseCache(), max_history=2)
+    history = [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}] * 2
+
+    await cached.call(_ask("status")[:1] + history + _ask("status")[1:])
+    assert cached.cache.stats["bypassed"] == 1 and provider.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_lru_ttl_and_disk_tier(tmp_path):
+    """Memory evicts least recently used, entries expire, disk survives restarts"""
+    db = tmp_path / "cache.db"
+    cache = ResponseCache(db_path=db, max_entries=2)
+    for key in "abc":
+        await cache.put(key, {"text": key, "tool_calls": []}, latency=1.5)
+    assert list(cache._memory) == ["b", "c"]
+    cache.close()
+
+    cache = ResponseCache(db_path=db, max_entries=2)
+    assert (await cache.get("a"))["text"] == "a"
+    assert cache.stats["disk_hits"] == 1
+    assert cache.stats["latency_saved_seconds"] == 1.5
+
+    expired = ResponseCache(ttl_seconds=0)
+    await expired.put("k", {"text": "x", "tool_calls": []}, latency=1)
+    assert await expired.get("k") is None
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_repeated_question_hits_through_the_agent_loop():
+    """Per-user system text and a short history do not change the key"""
+    from unittest.mock import MagicMock
+
+    from app.config import Settings
+    from app.core.context import AgentContext
+    from app.core.loop import AgentLoop
+
+    provider = CountingProvider()
+    cached = CachedProvider(provider, ResponseCache())
+    manager = MagicMock()
+    manager.get_provider.return_value = cached
+    settings = Settings(
+        telegram_token="t", telegram_user_id="u", groq_api_key="g", anthropic_api_key="a"
+    )
+    loop = AgentLoop(settings, manager)
+
+    contexts = [
+        AgentContext(session_id=f"s{i}", user_id=str(i), channel="telegram") for i in (1, 2)
+    ]
+    for _ in range(2):
+        for ctx in contexts:
+            ctx.add_message("user", "status del deploy")
+            assert await loop.process_message(ctx) == "respuesta 1"
+
+    assert provider.calls == 1
+    assert cached.cache.report()["hit_rate"] == 0.75
@@ -0,0 +1,89 @@
+"""Tests for LLM admission control"""
+
+import asyncio
+
+import pytest
+
+from app.core.scheduler import BACKGROUND, INTERACTIVE, LLMScheduler, SchedulerBusy
+
+
+async def _call(scheduler, order, user, tag, priority=INTERACTIVE, hold=0.02):
+    async with scheduler.slot(user, priority):
+        order.append(tag)
+        await asyncio.sleep(hold)
+
+
+@pytest.mark.asyncio
+async def test_users_are_served_round_robin():
+    """A burst from one user does not delay another user's first call"""
+    scheduler = LLMScheduler(max_in_flight=1)
+    order = []
+
+    tasks = [asyncio.create_task(_call(scheduler, order, "a", f"a{i}")) for i in range(3)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(_call(scheduler, order, "b", "b0")))
+    await asyncio.gather(*tasks)
+
+    assert order == ["a0", "a1", "b0", "a2"]
+    stats = scheduler.stats()
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+    assert stats[INTERACTIVE]["admitted"] == 4
+    assert stats[INTERACTIVE]["max_wait_seconds"] > 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_goes_before_background():
+    """Background calls are capped and queued behind interactive ones"""
+    scheduler = LLMScheduler(max_in_flight=2, max_background=1)
+    order = []
+
+    tasks = [
+        asyncio.create_task(_call(scheduler, order, "s", "bg0", BACKGROUND)),
+        asyncio.create_task(_call(scheduler, order, "s", "bg1", BACKGROUND)),
+    ]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(_call(scheduler, order, "u", "fg0")))
+    await asyncio.gather(*tasks)
+
+    # bg1 did not take the second slot; fg0 did
+    assert order == ["bg0", "fg0", "bg1"]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_new_turns():
+    """Past the queue limits new calls are busy; continuations still queue"""
+    scheduler = LLMScheduler(max_in_flight=1, max_queue=1)
+    order = []
+    running = asyncio.create_task(_call(scheduler, order, "a", "a0", hold=0.05))
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(_call(scheduler, order, "b", "b0"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(SchedulerBusy):
+        async with scheduler.slot("c"):
+            pass
+    async with scheduler.slot("c", can_reject=False):
+        order.append("c0")
+
+    await asyncio.gather(running, queued)
+    assert order == ["a0", "b0", "c0"]
+    assert scheduler.stats()[INTERACTIVE]["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    scheduler = LLMScheduler(max_in_flight=1)
+    order = []
+    running = asyncio.create_task(_call(scheduler, order, "a", "a0"))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(_call(scheduler, order, "b", "b0"))
+    await asyncio.sleep(0)
+    assert scheduler.stats()["queued"] == 1
+
+    waiter.cancel()
+    await asyncio.gather(running, waiter, return_exceptions=True)
+    async with scheduler.slot("c"):
+        pass
+
+    assert order == ["a0"]
+    assert scheduler.stats()["queued"] == 0 and scheduler.stats()["in_flight"] == 0
@@ -0,0 +1,618 @@
+"""Tests for session persistence"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.cloud.session_catalog import SessionCatalog
+from app.cloud.session_compaction import SessionCompactor
+from app.cloud.session_retention import (
+    SessionRetention,
+    _SessionEntry,
+    scan_sessions,
+    select_evictions,
+)
+from app.cloud.session_writer import SessionWriter
+from app.cloud.sessions import (
+    SessionManager,
+    migrate_session_file,
+    read_last_record,
+    read_session_summary,
+)
+from app.cloud.sessions_sqlite import SqliteSessionManager
+from app.core.context import AgentContext
+from app.utils.serializer import MSGPACK_MAGIC
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """Session manager on a temporary data directory"""
+    return SessionManager(data_dir=str(tmp_path))
+
+
+@pytest.fixture
+def context():
+    """Test context"""
+    return AgentContext(
+        session_id="telegram_42",
+        user_id="42",
+        channel="telegram"
+    )
+
+
+def _read_lines(manager, session_id):
+    path = manager.sessions_dir / f"{session_id}.jsonl"
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_save_appends_only_new_messages(manager, context):
+    """Each save writes only the delta since the previous save"""
+    context.add_message("user", "Hola")
+    context.add_message("assistant", "¿Qué tal?")
+    await manager.save_session(context)
+
+    context.add_message("user", "Bien")
+    await manager.save_session(context)
+
+    records = _read_lines(manager, context.session_id)
+    assert [r["kind"] for r in records] == ["header", "message", "message", "message"]
+    assert [r["seq"] for r in records[1:]] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_load_reconstructs_context(manager, context):
+    """Loading replays header + deltas, keeping timestamps and metadata"""
+    context.add_message("user", "Hola")
+    await manager.save_session(context)
+    context.add_message("tool", "ok", metadata={"tool": "execute_shell"})
+    await manager.save_session(context)
+
+    fresh = SessionManager(data_dir=str(manager.data_dir))
+    loaded = await fresh.load_session(context.session_id)
+
+    assert [m.content for m in loaded.messages] == ["Hola", "ok"]
+    assert loaded.messages[1].metadata == {"tool": "execute_shell"}
+    assert loaded.messages[0].timestamp == context.messages[0].timestamp
+
+    # A loaded session continues appending deltas without a new header
+    loaded.add_message("assistant", "listo")
+    await fresh.save_session(loaded)
+    kinds = [r["kind"] for r in _read_lines(manager, context.session_id)]
+    assert kinds.count("header") == 1
+
+
+@pytest.mark.asyncio
+async def test_legacy_snapshot_file_is_readable_and_migrates(manager, context):
+    """Snapshot-per-line logs load as before and migrate to the delta format"""
+    path = manager.sessions_dir / f"{context.session_id}.jsonl"
+    context.add_message("user", "uno")
+    first = context.to_dict()
+    context.add_message("assistant", "dos")
+    second = context.to_dict()
+    path.write_text(json.dumps(first) + "\n" + json.dumps(second) + "\n", encoding="utf-8")
+
+    loaded = await manager.load_session(context.session_id)
+    assert [m.content for m in loaded.messages] == ["uno", "dos"]
+
+    assert migrate_session_file(path) is True
+    assert migrate_session_file(path) is False
+
+    records = _read_lines(manager, context.session_id)
+    assert [r["kind"] for r in records] == ["header", "message", "message"]
+    reloaded = await manager.load_session(context.session_id)
+    assert [m.content for m in reloaded.messages] == ["uno", "dos"]
+
+
+@pytest.mark.asyncio
+async def test_summary_reads_only_head_and_tail(manager, context):
+    """Summaries come from header + last record, across tail block boundaries"""
+    for i in range(200):
+        context.add_message("user", f"mensaje {i} " + "x" * 100)
+    await manager.save_session(context)
+
+    path = manager.sessions_dir / f"{context.session_id}.jsonl"
+    assert read_last_record(path)["seq"] == 199
+
+    summary = read_session_summary(path)
+    assert summary["session_id"] == context.session_id
+    assert summary["message_count"] == 200
+
+    sessions = await manager.list_sessions()
+    assert sessions[0]["message_count"] == 200
+    assert sessions[0]["size_bytes"] == path.stat().st_size
+
+
+def test_summary_of_legacy_snapshot(manager, context):
+    """Legacy files are summarized from their last snapshot line"""
+    path = manager.sessions_dir / "legacy.jsonl"
+    context.add_message("user", "uno")
+    path.write_text(json.dumps(context.to_dict()) + "\n\n", encoding="utf-8")
+
+    summary = read_session_summary(path)
+    assert summary["user_id"] == "42"
+    assert summary["message_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_msgpack_log_roundtrip_and_tail(tmp_path, context):
+    """msgpack logs are framed, appendable and readable from the tail"""
+    pytest.importorskip("msgpack")
+    manager = SessionManager(data_dir=str(tmp_path), serializer="msgpack")
+    for i in range(50):
+        context.add_message("user", f"mensaje {i} ñ")
+    await manager.save_session(context)
+    context.add_message("assistant", "último")
+    await manager.save_session(context)
+
+    path = manager.sessions_dir / f"{context.session_id}.jsonl"
+    assert path.read_bytes().startswith(MSGPACK_MAGIC)
+    assert read_last_record(path)["seq"] == 50
+    assert read_session_summary(path)["message_count"] == 51
+
+    manager.forget(context.session_id)
+    loaded = await manager.load_session(context.session_id)
+    assert [m.content for m in loaded.messages] == [m.content for m in context.messages]
+
+
+@pytest.mark.asyncio
+async def test_compaction_converts_log_encoding(tmp_path, context):
+    """Switching serializer re-encodes existing logs on the next compaction"""
+    pytest.importorskip("msgpack")
+    context.add_message("user", "Hola")
+    await SessionManager(data_dir=str(tmp_path), serializer="json").save_session(context)
+
+    manager = SessionManager(data_dir=str(tmp_path), serializer="msgpack")
+    path = manager.sessions_dir / f"{context.session_id}.jsonl"
+    assert not path.read_bytes().startswith(MSGPACK_MAGIC)
+
+    report = await SessionCompactor(manager, compress_after_days=30).run_once()
+    assert report["compacted"] == 1
+    assert path.read_bytes().startswith(MSGPACK_MAGIC)
+
+    context.add_message("assistant", "Hola!")
+    await manager.save_session(context)
+    manager.forget(context.session_id)
+    loaded = await manager.load_session(context.session_id)
+    assert [m.content for m in loaded.messages] == ["Hola", "Hola!"]
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_roundtrip(tmp_path, context):
+    """SQLite backend supports the SessionManager surface"""
+    manager = SqliteSessionManager(data_dir=str(tmp_path))
+    try:
+        context.add_message("user", "Hola")
+        assert await manager.save_session(context) is True
+        context.add_message("assistant", "Hola!", metadata={"model": "test"})
+        assert await manager.save_session(context) is True
+
+        loaded = await manager.load_session(context.session_id)
+        assert [m.content for m in loaded.messages] == ["Hola", "Hola!"]
+        assert loaded.messages[1].metadata == {"model": "test"}
+
+        sessions = await manager.list_sessions()
+        assert sessions[0]["session_id"] == context.session_id
+        assert sessions[0]["message_count"] == 2
+
+        exported = json.loads(await manager.export_session(context.session_id))
+        assert len(exported[0]["messages"]) == 2
+
+        assert await manager.cleanup_old_sessions(days=-1) == 1
+        assert await manager.load_session(context.session_id) is None
+    finally:
+        await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_imports_jsonl_sessions(manager, context):
+    """Existing JSONL logs can be imported, idempotently"""
+    context.add_message("user", "uno")
+    await manager.save_session(context)
+
+    store = SqliteSessionManager(data_dir=str(manager.data_dir))
+    try:
+        assert await store.import_jsonl() == 1
+        assert await store.import_jsonl() == 0
+
+        loaded = await store.load_session(context.session_id)
+        assert loaded.messages[0].content == "uno"
+    finally:
+        await store.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_defers_writes_until_flush(tmp_path, context):
+    """With the cache enabled, saves are write-behind and loads hit memory"""
+    manager = SessionManager(data_dir=str(tmp_path), cache_size=2)
+    path = manager.sessions_dir / f"{context.session_id}.jsonl"
+
+    context.add_message("user", "Hola")
+    await manager.save_session(context)
+    assert not path.exists()
+    assert await manager.load_session(context.session_id) is context
+
+    context.add_message("assistant", "Hola!")
+    await manager.save_session(context)
+    assert await manager.flush() == 1
+    assert await manager.flush() == 0
+    assert [r["kind"] for r in _read_lines(manager, context.session_id)] == [
+        "header", "message", "message"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_cache_evicts_lru_and_idle_sessions(tmp_path):
+    """Overflow evicts the least recently used session, persisting it first"""
+    manager = SessionManager(data_dir=str(tmp_path), cache_size=1, cache_idle_seconds=0)
+
+    first = AgentContext(session_id="a", user_id="1", channel="telegram")
+    first.add_message("user", "uno")
+    await manager.save_session(first)
+
+    second = AgentContext(session_id="b", user_id="2", channel="telegram")
+    await manager.save_session(second)
+
+    assert list(manager._cache) == ["b"]
+    assert (manager.sessions_dir / "a.jsonl").exists()
+
+    await manager.close()
+    await manager._evict_idle()
+    assert not manager._cache
+    loaded = await manager.load_session("a")
+    assert loaded.messages[0].content == "uno"
+
+
+@pytest.mark.asyncio
+async def test_overflow_keeps_sessions_whose_write_fails(tmp_path, monkeypatch):
+    """An evicted dirty session stays cached when its write fails, and is flushed later"""
+    manager = SessionManager(data_dir=str(tmp_path), cache_size=1)
+    first = AgentContext(session_id="a", user_id="1", channel="telegram")
+    first.add_message("user", "uno")
+    await manager.save_session(first)
+
+    write_session = manager._write_session
+
+    async def failing_write(ctx):
+        return False
+
+    monkeypatch.setattr(manager, "_write_session", failing_write)
+    second = AgentContext(session_id="b", user_id="2", channel="telegram")
+    second.add_message("user", "dos")
+    await manager.save_session(second)
+
+    assert list(manager._cache) == ["a", "b"]
+    assert manager._cache["a"].dirty
+    assert not (manager.sessions_dir / "a.jsonl").exists()
+
+    monkeypatch.setattr(manager, "_write_session", write_session)
+    assert await manager.flush() == 2
+    await manager._evict_overflow()
+    assert list(manager._cache) == ["b"]
+    loaded = await SessionManager(data_dir=str(tmp_path)).load_session("a")
+    assert loaded.messages[0].content == "uno"
+
+
+@pytest.mark.asyncio
+async def test_catalog_tracks_saves_and_rebuilds(manager, context):
+    """The catalog is updated on save and can be rebuilt from the logs"""
+    context.add_message("user", "Hola")
+    await manager.save_session(context)
+
+    other = AgentContext(session_id="mcp_1", user_id="7", channel="mcp")
+    other.add_message("user", "ping")
+    other.add_message("assistant", "pong")
+    await manager.save_session(other)
+
+    recent = await manager.list_sessions(limit=1)
+    assert [s["session_id"] for s in recent] == ["mcp_1"]
+    assert recent[0]["message_count"] == 2
+
+    # A fresh catalog database is rebuilt from the session logs
+    await manager.close()
+    (manager.data_dir / "catalog.db").unlink()
+    catalog = SessionCatalog(manager.data_dir / "catalog.db", manager.sessions_dir)
+    try:
+        entry = catalog.get(context.session_id)
+        assert entry["user_id"] == "42"
+        assert entry["message_count"] == 1
+        assert len(catalog.recent()) == 2
+    finally:
+        catalog.close()
+
+
+@pytest.mark.asyncio
+async def test_compaction_scans_off_the_loop(manager, context, monkeypatch):
+    """The directory scan and the per-file stats run in a worker thread"""
+    import threading
+
+    from app.cloud import session_compaction
+
+    await manager.save_session(context)
+    threads = []
+
+    def scan(sessions_dir):
+        threads.append(threading.get_ident())
+        return scan_sessions(sessions_dir)
+
+    monkeypatch.setattr(session_compaction, "scan_sessions", scan)
+    await SessionCompactor(manager).run_once()
+    assert threads and threads[0] != threading.get_ident()
+
+
+@pytest.mark.asyncio
+async def test_compaction_rewrites_and_compresses(manager, context):
+    """Dead records are dropped, cold sessions are gzipped and still readable"""
+    path = manager.sessions_dir / f"{context.session_id}.jsonl"
+    context.add_message("user", "uno")
+    snapshot = json.dumps(context.to_dict())
+    path.write_text((snapshot + "\n") * 20, encoding="utf-8")
+    size_before = path.stat().st_size
+
+    compactor = SessionCompactor(manager, compress_after_days=30)
+    report = await compactor.run_once()
+    assert report["compacted"] == 1
+    assert report["bytes_reclaimed"] > 0
+    assert path.stat().st_size < size_before
+    assert (await compactor.run_once())["compacted"] == 0
+
+    # Idle past the threshold: compress, then read transparently
+    report = await SessionCompactor(manager, compress_after_days=-1).run_once()
+    assert report["compressed"] == 1
+    assert not path.exists()
+    assert (manager.sessions_dir / f"{context.session_id}.jsonl.gz").exists()
+    # Compressed logs are left alone on later runs
+    assert (await SessionCompactor(manager, compress_after_days=-1).run_once())["compressed"] == 0
+
+    loaded = await manager.load_session(context.session_id)
+    assert loaded.messages[0].content == "uno"
+    exported = json.loads(await manager.export_session(context.session_id))
+    assert exported[0]["messages"][0]["content"] == "uno"
+
+    # Saving again restores the plain log and appends to it
+    loaded.add_message("assistant", "dos")
+    await manager.save_session(loaded)
+    assert path.exists()
+    assert not (manager.sessions_dir / f"{context.session_id}.jsonl.gz").exists()
+    reloaded = await manager.load_session(context.session_id)
+    assert [m.content for m in reloaded.messages] == ["uno", "dos"]
+
+
+def test_retention_policies_select_oldest_first():
+    """Age, then per-user quota (keeping the newest), then the disk budget"""
+    day = 86400 * 10**9
+    now = 100 * 86400
+    entries = [
+        _SessionEntry("old", "old", 10, 1 * day, "a"),
+        _SessionEntry("a1", "a1", 40, 90 * day, "a"),
+        _SessionEntry("a2", "a2", 40, 91 * day, "a"),
+        _SessionEntry("a3", "a3", 40, 92 * day, "a"),
+        _SessionEntry("b1", "b1", 30, 93 * day, "b", pinned=True),
+        _SessionEntry("b2", "b2", 30, 94 * day, "b"),
+        _SessionEntry("c1", "c1", 200, 95 * day, "c"),
+    ]
+    evictions = select_evictions(
+        entries, now, max_age_days=30, user_quota_bytes=50, disk_budget_bytes=250
+    )
+    ids = {policy: [e.session_id for e in victims] for policy, victims in evictions.items()}
+    assert ids["age"] == ["old"]
+    # c1 alone exceeds the quota but is c's newest session
+    assert ids["user_quota"] == ["a1", "a2"]
+    # b1 is pinned: counted, never evicted
+    assert ids["disk_budget"] == ["a3", "b2"]
+
+
+@pytest.mark.asyncio
+async def test_retention_run_evicts_and_reports(manager, context):
+    """A retention pass deletes logs, drops them from the catalog and reports"""
+    import os
+    import threading
+    import time
+
+    for i in range(3):
+        ctx = AgentContext(session_id=f"telegram_{i}", user_id="42", channel="telegram")
+        ctx.add_message("user", "x" * 1000)
+        await manager.save_session(ctx)
+    old = time.time() - 40 * 86400
+    os.utime(manager.sessions_dir / "telegram_0.jsonl", (old, old))
+
+    # forget() touches the manager's cache, so it must run on the event loop thread
+    forget_threads = []
+    forget = manager.forget
+
+    def recording_forget(*session_ids):
+        forget_threads.append(threading.current_thread())
+        forget(*session_ids)
+
+    manager.forget = recording_forget
+
+    retention = SessionRetention(manager, max_age_days=30, user_quota_mb=0.0015)
+    report = await retention.run_once()
+
+    assert forget_threads == [threading.main_thread()]
+    assert report["scanned"] == 3
+    assert report["evicted"] == {"age": 1, "user_quota": 1, "disk_budget": 0}
+    assert report["bytes_freed"] > 2000
+    assert retention.last_report is report
+    assert [p.name for p in manager.sessions_dir.iterdir()] == ["telegram_2.jsonl"]
+    assert [s["session_id"] for s in await manager.list_sessions()] == ["telegram_2"]
+    assert await manager.cleanup_old_sessions(days=-1) == 1
+
+
+@pytest.mark.asyncio
+async def test_streaming_export_json_and_csv(manager, context):
+    """Exports stream the live state only, as valid JSON or CSV"""
+    for i in range(5):
+        context.add_message("user", f"descartado {i}")
+    await manager.save_session(context)
+
+    # Rewriting the context with fewer messages resets the log
+    context.messages = []
+    for i in range(3):
+        context.add_message("user", f"mensaje {i}")
+    await manager.save_session(context)
+
+    chunks = await manager.stream_export(context.session_id, "json")
+    exported = json.loads("".join(chunks))
+    assert exported[0]["session_id"] == context.session_id
+    assert [m["content"] for m in exported[0]["messages"]] == [
+        "mensaje 0", "mensaje 1", "mensaje 2"
+    ]
+
+    csv_text = await manager.export_session(context.session_id, "csv")
+    rows = csv_text.strip().splitlines()
+    assert rows[0] == "timestamp,role,content"
+    assert len(rows) == 4
+
+    assert await manager.stream_export(context.session_id, "xml") is None
+    assert await manager.stream_export("missing", "json") is None
+
+
+def test_export_route_streams(tmp_path, monkeypatch, context):
+    """The dashboard export route returns a streaming attachment"""
+    import asyncio
+
+    from fastapi.testclient import TestClient
+
+    import app.main as main
+
+    manager = SessionManager(data_dir=str(tmp_path))
+    context.add_message("user", "Hola")
+    asyncio.run(manager.save_session(context))
+    monkeypatch.setattr(main, "_session_manager", manager)
+
+    client = TestClient(main.app)
+    response = client.get(f"/api/sessions/{context.session_id}/export?format=csv")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "Hola" in response.text
+    assert client.get("/api/sessions/missing/export").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_search_is_accent_folded_and_incremental(manager, context):
+    """Saved messages are searchable right away, ignoring accents and case"""
+    context.add_message("user", "¿Cuál es el estado del despliegue en Render?")
+    await manager.save_session(context)
+
+    other = AgentContext(session_id="telegram_7", user_id="7", channel="telegram")
+    other.add_message("user", "Revisa la configuración de acción de GitHub")
+    await manager.save_session(other)
+
+    hits = await manager.search("DESPLIEGUE render")
+    assert [h["session_id"] for h in hits] == [context.session_id]
+    assert "[despliegue]" in hits[0]["snippet"]
+
+    hits = await manager.search("accion configuracion")
+    assert hits[0]["session_id"] == "telegram_7"
+
+    # Prefix match on the last word
+    assert await manager.search("despl")
+    assert await manager.search("!!!") == []
+
+    # A new index database is rebuilt from the logs
+    await manager.close()
+    (manager.data_dir / "search.db").unlink()
+    fresh = SessionManager(data_dir=str(manager.data_dir))
+    assert (await fresh.search("github"))[0]["seq"] == 0
+    await fresh.close()
+
+
+@pytest.mark.asyncio
+async def test_search_index_removes_by_session_off_the_loop(manager, context):
+    """Resets replace a session's rows through the session map, in a worker thread"""
+    import threading
+
+    threads = []
+    record_save = manager._record_save
+
+    def recording(*args):
+        threads.append(threading.current_thread())
+        record_save(*args)
+
+    manager._record_save = recording
+    context.add_message("user", "despliegue en render")
+    await manager.save_session(context)
+    manager._persisted[context.session_id] = 99  # forces a rewrite from a header
+    await manager.save_session(context)
+
+    assert threads and threading.main_thread() not in threads
+    assert len(await manager.search("render")) == 1
+    index = manager.search_index
+    rows = index._conn.execute("SELECT session_id FROM message_sessions").fetchall()
+    assert [tuple(r) for r in rows] == [(context.session_id,)]
+
+    # An index created before the session map gets it filled on open
+    index._conn.execute("DROP TABLE message_sessions")
+    await manager.close()
+    reopened = SessionManager(data_dir=str(manager.data_dir))
+    reopened.search_index.remove_session(context.session_id)
+    assert await reopened.search("render") == []
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_torn_append_is_skipped_and_next_save_starts_a_new_line(tmp_path, context):
+    """A crash mid-append leaves a partial line that neither breaks loads nor later saves"""
+    manager = SessionManager(data_dir=str(tmp_path))
+    context.add_message("user", "Hola")
+    context.add_message("assistant", "Hola!")
+    await manager.save_session(context)
+    await manager.close()
+
+    path = manager.sessions_dir / f"{context.session_id}.jsonl"
+    with open(path, "ab") as f:
+        f.write(b'{"kind": "message", "seq": 2, "ro')
+
+    manager = SessionManager(data_dir=str(tmp_path))
+    assert read_last_record(path)["seq"] == 1
+    loaded = await manager.load_session(context.session_id)
+    assert [m.content for m in loaded.messages] == ["Hola", "Hola!"]
+
+    loaded.add_message("user", "¿Sigues ahí?")
+    await manager.save_session(loaded)
+    await manager.close()
+
+    lines = path.read_bytes().split(b"\n")
+    assert lines[-3] == b'{"kind": "message", "seq": 2, "ro'
+    assert json.loads(lines[-2])["seq"] == 2
+    reloaded = await SessionManager(data_dir=str(tmp_path)).load_session(context.session_id)
+    assert [m.content for m in reloaded.messages] == ["Hola", "Hola!", "¿Sigues ahí?"]
+    assert read_session_summary(path)["message_count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_writer_group_commits_concurrent_appends(tmp_path):
+    """Concurrent appends are serialized per session and batched into commits"""
+    writer = SessionWriter(tmp_path, fsync_policy="always")
+    try:
+        sizes = await asyncio.gather(
+            *(writer.append(f"s{i % 3}", f"line {i}\n".encode()) for i in range(30))
+        )
+        assert all(size > 0 for size in sizes)
+
+        stats = writer.stats()
+        assert stats["appends"] == 30
+        assert stats["commits"] < 30
+        assert stats["queue_depth"] == 0
+        assert stats["fsyncs"] > 0
+
+        lines = (tmp_path / "s0.jsonl").read_text(encoding="utf-8").splitlines()
+        assert lines == [f"line {i}" for i in range(0, 30, 3)]
+    finally:
+        await writer.close()
+
+    with pytest.raises(RuntimeError):
+        await writer.append("s0", b"late\n")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_saves_do_not_duplicate_deltas(manager, context):
+    """Two saves racing on the same context append each message once"""
+    context.add_message("user", "Hola")
+    context.add_message("assistant", "Hola!")
+    assert all(await asyncio.gather(manager.save_session(context), manager.save_session(context)))
+
+    records = _read_lines(manager, context.session_id)
+    assert [r["kind"] for r in records] == ["header", "message", "message"]
@@ -0,0 +1,65 @@
+"""Tests for the lazy skill registry"""
+
+import os
+
+from app.core.skills import SkillRegistry
+
+
+def _skill(root, name, text):
+    (root / name).mkdir(parents=True, exist_ok=True)
+    (root / name / "SKILL.md").write_text(text, encoding="utf-8")
+
+
+def _skills(tmp_path):
+    _skill(
+        tmp_path,
+        "deploy-render",
+        "---\ndescription: Desplegar el servicio en Render\n---\n\n# Pasos\n1. git push",
+    )
+    _skill(tmp_path, "git-flow", "# Git\nRamas, merges y rebase en git.\n\nDetalles...")
+    _skill(
+        tmp_path,
+        "backup",
+        "---\ndescription: Copias de seguridad de sesiones a S3\n---\nCuerpo del backup",
+    )
+    return SkillRegistry(tmp_path, check_interval=0)
+
+
+def test_index_holds_descriptions_not_bodies(tmp_path):
+    registry = _skills(tmp_path)
+
+    assert registry.list() == [
+        {"name": "backup", "description": "Copias de seguridad de sesiones a S3"},
+        {"name": "deploy-render", "description": "Desplegar el servicio en Render"},
+        {"name": "git-flow", "description": "Ramas, merges y rebase en git."},
+    ]
+    assert registry.report()["cached_bodies"] == 0
+
+
+def test_match_is_relevance_gated_and_loads_lazily(tmp_path):
+    registry = _skills(tmp_path)
+
+    assert [name for _, name in registry.match("¿puedes desplegar en render?")] == ["deploy-render"]
+    assert registry.match("hola, ¿qué tal?") == []
+    # A single shared word is not enough
+    assert registry.match("el servicio") == []
+    assert [name for _, name in registry.match("usa backup")] == ["backup"]
+
+    assert registry.load("deploy-render") == "# Pasos\n1. git push"
+    assert registry.load("deploy-render") == "# Pasos\n1. git push"
+    assert registry.stats["loads"] == 1 and registry.stats["body_cache_hits"] == 1
+    assert registry.load("nope") is None
+
+
+def test_directory_changes_are_picked_up(tmp_path):
+    registry = _skills(tmp_path)
+    assert registry.refresh() == 3
+    assert registry.refresh() == 0
+
+    _skill(tmp_path, "backup", "---\ndescription: Restaurar sesiones desde S3\n---\nNuevo cuerpo")
+    os.utime(tmp_path / "backup" / "SKILL.md", ns=(1, 1))
+    (tmp_path / "git-flow" / "SKILL.md").unlink()
+
+    assert registry.refresh() == 2
+    assert [s["name"] for s in registry.list()] == ["backup", "deploy-render"]
+    assert registry.load("backup") == "Nuevo cuerpo"
@@ -0,0 +1,108 @@
+"""Tests for rolling session summarization"""
+
+import pytest
+
+from app.cloud.sessions import SessionManager
+from app.cloud.sessions_sqlite import SqliteSessionManager
+from app.core.context import AgentContext
+from app.core.context_builder import ContextBuilder
+from app.core.summarizer import SessionSummarizer
+
+
+class FakeProvider:
+    """Local provider that records prompts and returns a canned summary"""
+
+    def __init__(self):
+        self.prompts = []
+
+    async def call(self, messages, max_tokens=8192, temperature=0.7):
+        self.prompts.append(messages[-1]["content"])
+        return {"text": f"resumen {len(self.prompts)}", "tool_calls": []}
+
+
+def _context(n):
+    ctx = AgentContext(session_id="telegram_42", user_id="42", channel="telegram")
+    for i in range(n):
+        ctx.add_message("user" if i % 2 == 0 else "assistant", f"mensaje {i}")
+    return ctx
+
+
+@pytest.mark.asyncio
+async def test_summary_is_incremental_and_persisted(tmp_path):
+    """Each update sends the previous summary plus only the newly folded turns"""
+    manager = SessionManager(data_dir=str(tmp_path))
+    provider = FakeProvider()
+    summarizer = SessionSummarizer(provider, manager, every_turns=4, keep_recent=2)
+
+    ctx = _context(5)
+    assert summarizer.schedule(ctx) is None
+
+    ctx.add_message("assistant", "mensaje 5")
+    await summarizer.schedule(ctx)
+    assert ctx.state["summary"]["upto"] == 4
+    assert "mensaje 0" in provider.prompts[0] and "mensaje 4" not in provider.prompts[0]
+
+    for i in range(6, 10):
+        ctx.add_message("user", f"mensaje {i}")
+    await summarizer.schedule(ctx)
+    assert ctx.state["summary"]["text"] == "resumen 2"
+    assert ctx.state["summary"]["upto"] == 8
+    assert "resumen 1" in provider.prompts[1]
+    assert "mensaje 3" not in provider.prompts[1] and "mensaje 4" in provider.prompts[1]
+
+    assert (await manager.load_summary(ctx.session_id))["upto"] == 8
+    await manager.save_session(ctx)
+    loaded = await manager.load_session(ctx.session_id)
+    assert loaded.state["summary"]["text"] == "resumen 2"
+    assert summarizer.stats["runs"] == 2 and summarizer.stats["folded_messages"] == 8
+
+
+@pytest.mark.asyncio
+async def test_failed_summary_keeps_previous(tmp_path):
+    """Provider errors are counted and leave the session untouched"""
+
+    class BrokenProvider:
+        async def call(self, messages, max_tokens=8192, temperature=0.7):
+            raise RuntimeError("sin red")
+
+    manager = SessionManager(data_dir=str(tmp_path))
+    summarizer = SessionSummarizer(BrokenProvider(), manager, every_turns=2, keep_recent=2)
+    ctx = _context(6)
+
+    assert await summarizer.schedule(ctx) is None
+    assert "summary" not in ctx.state
+    assert summarizer.stats["failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_stores_summaries(tmp_path):
+    """The sqlite backend keeps the summary next to the session row"""
+    manager = SqliteSessionManager(data_dir=str(tmp_path))
+    try:
+        ctx = _context(2)
+        await manager.save_session(ctx)
+        assert await manager.save_summary(ctx.session_id, {"text": "r", "upto": 1})
+
+        loaded = await manager.load_session(ctx.session_id)
+        assert loaded.state["summary"] == {"text": "r", "upto": 1}
+    finally:
+        await manager.close()
+
+
+def test_builder_replaces_summarized_turns():
+    """Summarized messages are sent as summary text ahead of the recent window"""
+    ctx = _context(10)
+    summary = {"text": "el usuario configuró Render", "upto": 6}
+    window = ContextBuilder(max_input_tokens=4000, keep_recent=2).build(
+        "sistema", ctx.messages, summary=summary
+    )
+
+    assert window.messages[0]["content"] == "sistema"
+    assert "el usuario configuró Render" in window.messages[1]["content"]
+    assert [m["content"] for m in window.messages[2:]] == [f"mensaje {i}" for i in range(6, 10)]
+
+    # A summary covering more than the history (session reset) is ignored
+    builder = ContextBuilder(max_input_tokens=4000)
+    window = builder.build("sistema", ctx.messages[:3], summary=summary)
+    assert window.messages[0]["content"] == "sistema"
+    assert len(window.messages) == 4
@@ -0,0 +1,83 @@
+"""Tests for streamed Telegram replies"""
+
+import pytest
+from telegram.error import RetryAfter
+
+from app.cloud.telegram_bot import MAX_MESSAGE_CHARS, StreamingReply
+
+
+class FakeMessage:
+    """Stand-in for a telegram Message recording replies and edits"""
+
+    def __init__(self, chat=None):
+        self.chat = chat if chat is not None else []
+        self.text = ""
+        self.edits = 0
+        self.fail_next_edit = None
+
+    async def reply_text(self, text):
+        sent = FakeMessage(self.chat)
+        sent.text = text
+        self.chat.append(sent)
+        return sent
+
+    async def edit_text(self, text):
+        if self.fail_next_edit:
+            error, self.fail_next_edit = self.fail_next_edit, None
+            raise error
+        self.text = text
+        self.edits += 1
+        return self
+
+
+@pytest.mark.asyncio
+async def test_first_delta_is_sent_and_edits_are_throttled():
+    """The reply appears on the first token; later deltas are batched into edits"""
+    incoming = FakeMessage()
+    reply = StreamingReply(incoming, edit_interval=60)
+
+    await reply.push("Ho")
+    assert [m.text for m in incoming.chat] == ["Ho"]
+
+    for delta in ["la", " mun", "do"]:
+        await reply.push(delta)
+    assert incoming.chat[0].edits == 0
+
+    await reply.finish("Hola mundo")
+    assert [m.text for m in incoming.chat] == ["Hola mundo"]
+    assert incoming.chat[0].edits == 1
+
+
+@pytest.mark.asyncio
+async def test_long_stream_rolls_over_to_new_messages():
+    """Text past Telegram's limit continues in a new message"""
+    incoming = FakeMessage()
+    reply = StreamingReply(incoming, edit_interval=0)
+    text = "x" * (MAX_MESSAGE_CHARS * 2 + 10)
+
+    for i in range(0, len(text), 1000):
+        await reply.push(text[i:i + 1000])
+    await reply.finish(text)
+
+    assert [len(m.text) for m in incoming.chat] == [MAX_MESSAGE_CHARS, MAX_MESSAGE_CHARS, 10]
+    assert "".join(m.text for m in incoming.chat) == text
+
+
+@pytest.mark.asyncio
+async def test_flood_control_skips_edits_and_unstreamed_text_is_sent():
+    """A rate-limited edit is dropped until the final flush; errors are appended"""
+    incoming = FakeMessage()
+    reply = StreamingReply(incoming, edit_interval=0)
+
+    await reply.push("parcial")
+    incoming.chat[0].fail_next_edit = RetryAfter(0)
+    await reply.push(" más")
+    assert incoming.chat[0].text == "parcial"
+
+    await reply.finish("Disculpa, ocurrió un error")
+    assert [m.text for m in incoming.chat] == ["parcial más", "Disculpa, ocurrió un error"]
+
+    # Nothing streamed: the final text is sent as a plain reply
+    incoming = FakeMessage()
+    await StreamingReply(incoming).finish("hola")
+    assert [m.text for m in incoming.chat] == ["hola"]
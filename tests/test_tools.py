@@ -80,3 +80,20 @@ async def test_tool_not_found(tool_executor, agent_context):
         agent_context
     )
     assert "not found" in result.lower()
+
+
+@pytest.mark.asyncio
+async def test_cancel_kills_running_command():
+    """Cancelling a shell command kills its process instead of leaving it running"""
+    import asyncio
+
+    tool_executor = ToolExecutor()
+    task = asyncio.create_task(
+        tool_executor.execute({"name": "execute_shell", "args": {"command": "sleep 5"}})
+    )
+    await asyncio.sleep(0.2)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(task, 2)
+
+    assert tool_executor.stats["commands_killed"] == 1
@@ -96,7 +96,7 @@ async function loadSkills() {
         list.innerHTML = skills.map(skill => `
             <div class="bg-gray-900 p-4 rounded">
                 <h3 class="font-bold text-blue-400">${skill.name}</h3>
-                <pre class="text-xs text-gray-300 mt-2 overflow-x-auto">${skill.content.substring(0, 200)}...</pre>
+                <p class="text-xs text-gray-300 mt-2">${skill.description || ''}</p>
             </div>
         `).join('');
     } catch (error) {